@@ -0,0 +1,83 @@
+import os
+import time
+import logging
+import threading
+from app.utils import redis_client
+
+logger = logging.getLogger(__name__)
+
+ACCESS_TRACKING_ENABLED = os.getenv("ACCESS_TRACKING_ENABLED", "1") == "1"
+# Key families the prefetcher can refresh; only these are counted
+TRACKED_PREFIXES = tuple(p for p in os.getenv("PREFETCH_PREFIXES", "stock_quote_,company_profile_,market_news_").split(",") if p)
+# Counts are summed in-process and flushed in one pipeline this often
+ACCESS_FLUSH_INTERVAL = float(os.getenv("ACCESS_FLUSH_INTERVAL", 5))
+
+# Symbols always kept warm, in addition to the shared Redis set (python -m app.prefetch --watchlist ...)
+PREFETCH_WATCHLIST = [s.strip() for s in os.getenv("PREFETCH_WATCHLIST", "").split(",") if s.strip()]
+
+# cache key -> decayed request count, shared by every worker (the prefetcher halves it periodically)
+ACCESS_KEY = "prefetch:access"
+WATCHLIST_KEY = "prefetch:watchlist"
+STATS_KEY = "prefetch:stats"
+
+_counts = {}
+_counts_lock = threading.Lock()
+_flusher = None
+
+
+def record_access(cache_keys):
+    """Count requests for cache keys; costs a dict update, Redis sees one ZINCRBY per key per interval."""
+    if not ACCESS_TRACKING_ENABLED:
+        return
+    if isinstance(cache_keys, str):
+        cache_keys = (cache_keys,)
+    with _counts_lock:
+        for key in cache_keys:
+            if key.startswith(TRACKED_PREFIXES):
+                _counts[key] = _counts.get(key, 0) + 1
+    if _flusher is None:
+        _start_flusher()
+
+
+def flush():
+    global _counts
+    with _counts_lock:
+        counts, _counts = _counts, {}
+    if not counts:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for key, count in counts.items():
+        pipe.zincrby(ACCESS_KEY, count, key)
+    pipe.execute()
+
+
+def _run():
+    while True:
+        time.sleep(ACCESS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            # counts for this interval are lost; they only steer prefetch priority
+            logger.warning("Access stats flush failed: %s", e)
+
+
+def _start_flusher():
+    global _flusher
+    with _counts_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_run, name="access-stats", daemon=True)
+            _flusher.start()
+
+
+def watchlist():
+    return sorted(set(PREFETCH_WATCHLIST) | set(redis_client.smembers(WATCHLIST_KEY)))
+
+
+def prefetch_stats(top: int = 20):
+    """What the prefetcher last reported, the watchlist, and the most requested keys."""
+    stats = redis_client.hgetall(STATS_KEY)
+    return {
+        **{name: float(value) for name, value in stats.items()},
+        "watchlist": watchlist(),
+        "top": [{"key": key, "score": score} for key, score in redis_client.zrevrange(ACCESS_KEY, 0, top - 1, withscores=True)],
+    }
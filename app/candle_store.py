@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import threading
+from urllib.parse import quote
+import numpy as np
+from app.utils import fetch_finnhub_data, cache_data, get_cached_data
+
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR", os.path.join("data", "candles"))
+# A segment is archived once its last bar is this old; younger segments may still be revised upstream
+CANDLE_SETTLE_SECONDS = int(os.getenv("CANDLE_SETTLE_SECONDS", 86400))
+# Contiguous missing segments fetched per upstream request
+CANDLE_MAX_FETCH_SEGMENTS = int(os.getenv("CANDLE_MAX_FETCH_SEGMENTS", 12))
+# Most segments one request may span (and so the most archive files it can read or create):
+# 120 is about 2.3 years of 1-minute bars, 10 years of daily bars
+CANDLE_MAX_SEGMENTS = int(os.getenv("CANDLE_MAX_SEGMENTS", 120))
+
+DAY = 86400
+
+# Segment width per Finnhub resolution, aligned to the epoch so every range maps to the same files.
+# Sized so one segment holds a few thousand bars at most, and kept narrow enough that the
+# live (unsettled) segment, which is refetched on every TTL, covers only recent bars.
+SEGMENT_SECONDS = {
+    "1": 7 * DAY,
+    "5": 30 * DAY,
+    "15": 60 * DAY,
+    "30": 120 * DAY,
+    "60": 240 * DAY,
+    "D": 30 * DAY,
+    "W": 182 * DAY,
+    "M": 365 * DAY,
+}
+
+# Tickers and EXCHANGE:PAIR symbols (BRK.B, BINANCE:BTCUSDT, OANDA:EUR_USD, ^GSPC); the first character
+# rules out "." and "..", which quote() would pass through as path components
+SYMBOL_PATTERN = re.compile(r"[A-Za-z0-9^][A-Za-z0-9.:_^=-]{0,39}")
+
+# Row order of the (6, n) float64 segment arrays; each column of the response is one contiguous row
+FIELDS = ("t", "o", "h", "l", "c", "v")
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(symbol: str, resolution: str):
+    with _locks_guard:
+        return _locks.setdefault((symbol, resolution), threading.Lock())
+
+
+def _segment_path(symbol: str, resolution: str, start: int):
+    # the width is part of the name, so files written with another SEGMENT_SECONDS are never misread
+    return os.path.join(CANDLE_STORE_DIR, quote(symbol, safe=""), resolution, f"{start}_{SEGMENT_SECONDS[resolution]}.npy")
+
+
+def _segment_starts(resolution: str, start: int, end: int):
+    span = SEGMENT_SECONDS[resolution]
+    first = start - start % span
+    # checked before building the list: an unbounded range would be millions of segments
+    if (end - first) // span + 1 > CANDLE_MAX_SEGMENTS:
+        raise ValueError(f"At most {CANDLE_MAX_SEGMENTS * span // DAY} days per request at resolution {resolution}")
+    return list(range(first, end + 1, span))
+
+
+def _is_settled(resolution: str, segment_start: int, now: float):
+    return segment_start + SEGMENT_SECONDS[resolution] + CANDLE_SETTLE_SECONDS <= now
+
+
+def _empty():
+    return np.empty((len(FIELDS), 0), dtype=np.float64)
+
+
+def _to_array(data: dict):
+    if not data or data.get("s") != "ok" or not data.get("t"):
+        return _empty()
+    return np.array([data[field] for field in FIELDS], dtype=np.float64)
+
+
+def _load_segment(path: str):
+    try:
+        return np.load(path, mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+
+def _save_segment(path: str, array):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    # readers never see a partial file
+    os.replace(tmp, path)
+
+
+def _endpoint(symbol: str):
+    # exchange-qualified symbols (BINANCE:BTCUSDT) are crypto pairs
+    return "crypto/candle" if ":" in symbol else "stock/candle"
+
+
+def _runs(starts: list, span: int):
+    """Group sorted segment starts into contiguous runs of at most CANDLE_MAX_FETCH_SEGMENTS."""
+    runs = []
+    for start in starts:
+        if runs and start == runs[-1][-1] + span and len(runs[-1]) < CANDLE_MAX_FETCH_SEGMENTS:
+            runs[-1].append(start)
+        else:
+            runs.append([start])
+    return runs
+
+
+def _fetch_segments(symbol: str, resolution: str, starts: list, lane: str):
+    """One upstream request for a contiguous run of segments, split back into per-segment arrays."""
+    span = SEGMENT_SECONDS[resolution]
+    data = fetch_finnhub_data(
+        _endpoint(symbol),
+        {"symbol": symbol, "resolution": resolution, "from": starts[0], "to": starts[-1] + span - 1},
+        lane=lane
+    )
+    array = _to_array(data)
+    if array.shape[1]:
+        array = array[:, np.argsort(array[0], kind="stable")]
+    bounds = np.searchsorted(array[0], starts + [starts[-1] + span])
+    return {start: array[:, bounds[i]:bounds[i + 1]] for i, start in enumerate(starts)}
+
+
+def _live_cache_key(symbol: str, resolution: str, start: int):
+    return f"candle_segment_{symbol}_{resolution}_{start}"
+
+
+def _live_segment(symbol: str, resolution: str, start: int, lane: str):
+    """Unsettled segments are kept in Redis under the TTL policy instead of the archive."""
+    cache_key = _live_cache_key(symbol, resolution, start)
+    cached = get_cached_data(cache_key)
+    if cached is not None:
+        return np.array(cached, dtype=np.float64).reshape(len(FIELDS), -1)
+    array = _fetch_segments(symbol, resolution, [start], lane)[start]
+    cache_data(cache_key, array.tolist())
+    return array
+
+
+def get_candles(symbol: str, resolution: str, start: int, end: int, lane: str = "default"):
+    """Bars for symbol/resolution with start <= t <= end, as a Finnhub-style candle payload.
+
+    Settled segments come from memory-mapped .npy files; missing ones are fetched in
+    contiguous runs and archived, including empty ones, so a range is fetched once.
+    """
+    if not SYMBOL_PATTERN.fullmatch(symbol):
+        raise ValueError(f"Invalid symbol {symbol!r}")
+    if resolution not in SEGMENT_SECONDS:
+        raise ValueError(f"Unsupported resolution {resolution!r}; use one of {', '.join(SEGMENT_SECONDS)}")
+    if start > end:
+        raise ValueError("`from` must not be after `to`")
+
+    now = time.time()
+    span = SEGMENT_SECONDS[resolution]
+    starts = _segment_starts(resolution, start, end)
+    settled = [s for s in starts if _is_settled(resolution, s, now)]
+    segments = {s: _load_segment(_segment_path(symbol, resolution, s)) for s in settled}
+
+    missing = [s for s in settled if segments[s] is None]
+    if missing:
+        # one fetch per gap within this process; other workers at worst write identical files
+        with _lock_for(symbol, resolution):
+            for s in missing:
+                segments[s] = _load_segment(_segment_path(symbol, resolution, s))
+            missing = [s for s in missing if segments[s] is None]
+            for run in _runs(missing, span):
+                for s, array in _fetch_segments(symbol, resolution, run, lane).items():
+                    path = _segment_path(symbol, resolution, s)
+                    _save_segment(path, array)
+                    segments[s] = _load_segment(path)
+
+    for s in starts:
+        if s not in segments:
+            segments[s] = _live_segment(symbol, resolution, s, lane)
+
+    parts = []
+    for s in starts:
+        array = segments[s]
+        lo = np.searchsorted(array[0], start, side="left")
+        hi = np.searchsorted(array[0], end, side="right")
+        if hi > lo:
+            parts.append(array[:, lo:hi])
+    if not parts:
+        return {"s": "no_data"}
+
+    bars = np.concatenate(parts, axis=1)
+    payload = {field: bars[i].tolist() for i, field in enumerate(FIELDS)}
+    payload["t"] = bars[0].astype(np.int64).tolist()
+    payload["s"] = "ok"
+    return payload
+
@@ -0,0 +1,12 @@
+import os
+from dotenv import load_dotenv
+
+# The one place .env is read; modules import their settings from here (or call
+# os.getenv after importing this module) instead of loading it again.
+load_dotenv()
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+# Per-pool connection cap for each worker; unset means unbounded (redis-py's default)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 0)) or None
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+# Per-prefix L1 limits: prefix -> (max entries, max seconds an entry may live in-process).
+# The L1 TTL is further capped by the Redis TTL of the entry it was filled from.
+L1_CACHE_CONFIG = {
+    "country_list": (1, 3600),
+    "company_profile_": (5000, 600),
+    "earnings_calendar_": (5000, 300),
+    "ipo_calendar_": (5000, 300),
+    "market_news_": (2000, 30),
+    "stock_quote_": (5000, 1),
+}
+L1_CACHE_CONFIG.update({prefix: tuple(limits) for prefix, limits in json.loads(os.getenv("L1_CACHE_CONFIG", "{}")).items()})
+L1_CACHE_ENABLED = os.getenv("L1_CACHE_ENABLED", "1") == "1"
+
+INVALIDATION_CHANNEL = "cache_invalidate"
+PROCESS_ID = uuid.uuid4().hex
+
+MISSING = object()
+
+
+def key_prefix(key: str):
+    """Map a cache key to its configured family, e.g. stock_quote_AAPL -> stock_quote_."""
+    for prefix in L1_CACHE_CONFIG:
+        if key.startswith(prefix):
+            return prefix
+    return "other"
+
+
+class LocalCache:
+    """Thread-safe LRU with per-entry expiry.
+
+    With max_bytes, entries are also weighed with size_of(value) and the least recently
+    used are evicted until the total fits; a value larger than max_bytes is not kept.
+    """
+
+    def __init__(self, capacity: int, ttl: float, max_bytes: int = None, size_of=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._pop(key)
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.capacity <= 0:
+            return
+        size = self.size_of(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.capacity or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if self._pop(key) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        stats = {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+        if self.max_bytes is not None:
+            stats.update(bytes=self._bytes, max_bytes=self.max_bytes)
+        return stats
+
+
+_tiers = {prefix: LocalCache(capacity, ttl) for prefix, (capacity, ttl) in L1_CACHE_CONFIG.items()}
+
+# Redis (L2) counters per prefix, kept next to the L1 ones so both tiers report together
+_l2_stats = {}
+_l2_lock = threading.Lock()
+
+
+def tier_for(key: str):
+    if not L1_CACHE_ENABLED:
+        return None
+    return _tiers.get(key_prefix(key))
+
+
+def is_tiered(key: str):
+    """Whether workers may hold `key` in L1, even if this process runs without one (like the prefetcher)."""
+    return key_prefix(key) in L1_CACHE_CONFIG
+
+
+def record_l2(key: str, hit: bool):
+    prefix = key_prefix(key)
+    with _l2_lock:
+        stats = _l2_stats.setdefault(prefix, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+
+def invalidate_local(key: str):
+    tier = tier_for(key)
+    if tier is not None:
+        tier.delete(key)
+
+
+def clear_local():
+    for tier in _tiers.values():
+        tier.clear()
+
+
+def cache_stats():
+    with _l2_lock:
+        l2 = {prefix: dict(stats) for prefix, stats in _l2_stats.items()}
+    return {
+        "l1": {prefix: tier.stats() for prefix, tier in _tiers.items()} if L1_CACHE_ENABLED else {},
+        "l2": l2,
+    }
+
+
+# ---------------- CROSS-WORKER INVALIDATION ----------------
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def invalidation_message(key: str):
+    return f"{PROCESS_ID}|{key}"
+
+
+def _listen(redis_client):
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # anything written while we were disconnected may be stale
+            clear_local()
+            for message in pubsub.listen():
+                origin, _, key = message["data"].partition("|")
+                if origin != PROCESS_ID:
+                    invalidate_local(key)
+        except Exception:
+            time.sleep(1)
+
+
+def start_invalidation_listener(redis_client):
+    """Subscribe once per process to key invalidations published by other workers."""
+    global _listener
+    if _listener is not None or not L1_CACHE_ENABLED:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_listen, args=(redis_client,), name="l1-invalidation", daemon=True)
+            _listener.start()
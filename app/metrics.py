@@ -0,0 +1,230 @@
+import os
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds; shared by every latency histogram so buckets are allocated once per series
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# ASGI scope of the request being served; background threads have none
+_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() only bumps preallocated counters."""
+
+    __slots__ = ("counts", "sum", "count", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(LATENCY_BUCKETS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Counter:
+    """Counters keyed by a label tuple; a series is created on first use and reused after."""
+
+    __slots__ = ("values", "_lock")
+
+    def __init__(self):
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+# (endpoint, op) -> Histogram and endpoint -> Histogram, created once per series
+_op_latency = {}
+_request_latency = {}
+_series_lock = threading.Lock()
+
+upstream_responses = Counter()      # (finnhub endpoint, status)
+upstream_retries = Counter()        # (finnhub endpoint, status | "error")
+rate_limited = Counter()            # (lane,)
+db_rows_written = Counter()         # (table, "inserted" | "updated")
+stream_messages = Counter()         # (stream,)
+requests_total = Counter()          # (endpoint, status)
+cache_refreshes = Counter()         # (prefix, "refreshed" | "rate_limited" | "failed")
+
+
+def _histogram(series: dict, key):
+    histogram = series.get(key)
+    if histogram is None:
+        with _series_lock:
+            histogram = series.setdefault(key, Histogram())
+    return histogram
+
+
+def endpoint_label():
+    """Route template of the current request (e.g. /market/quote), "background" outside one."""
+    scope = _scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    if route is None:
+        # unmatched paths are unbounded; keep them out of the label space
+        return "unmatched"
+    # include_router(prefix=...) builds the route with the prefix already in its path; FastAPI
+    # releases that include routers lazily keep the original route and record the prefixed one
+    included = scope.get("fastapi")
+    if included is not None and "effective_route_context" in included:
+        return included["effective_route_context"].path
+    return route.path
+
+
+def observe(op: str, seconds: float):
+    if METRICS_ENABLED:
+        _histogram(_op_latency, (endpoint_label(), op)).observe(seconds)
+
+
+@contextmanager
+def timed(op: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(op, time.perf_counter() - start)
+
+
+# ---------------- ASGI MIDDLEWARE ----------------
+class MetricsMiddleware:
+    """Binds the request scope for endpoint labels and records request latency by route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        token = _scope.set(scope)
+        if scope["type"] == "websocket":
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                _scope.reset(token)
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = endpoint_label()
+            _histogram(_request_latency, endpoint).observe(time.perf_counter() - start)
+            requests_total.inc((endpoint, status[0]))
+            _scope.reset(token)
+
+
+def instrument_sessions(session_class):
+    """Time every Session.commit (flush included) as db_commit."""
+    from sqlalchemy import event
+
+    @event.listens_for(session_class, "before_commit")
+    def _before_commit(session):
+        session.info["metrics_commit_start"] = time.perf_counter()
+
+    @event.listens_for(session_class, "after_commit")
+    def _after_commit(session):
+        start = session.info.pop("metrics_commit_start", None)
+        if start is not None:
+            observe("db_commit", time.perf_counter() - start)
+
+
+# ---------------- PROMETHEUS EXPOSITION ----------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _render_histograms(lines: list, name: str, help_text: str, series: dict, label_names: tuple):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in list(series.items()):
+        labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        with histogram._lock:
+            counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+        cumulative = 0
+        for bound, bucket in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(**labels)} {total}")
+        lines.append(f"{name}_count{_labels(**labels)} {count}")
+
+
+def _render_values(lines: list, name: str, help_text: str, values: dict, label_names: tuple, kind: str = "counter"):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in values.items():
+        lines.append(f"{name}{_labels(**dict(zip(label_names, labels)))} {value}")
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    # imported here: these modules import this one for their hot-path hooks
+    from app.local_cache import cache_stats
+    from app.write_behind import write_behind_stats
+    from app.utils import codec_stats
+
+    lines = []
+    _render_histograms(lines, "http_request_duration_seconds", "Request latency by route.", _request_latency, ("endpoint",))
+    _render_values(lines, "http_requests_total", "Requests by route and status.", requests_total.snapshot(), ("endpoint", "status"))
+    _render_histograms(lines, "operation_duration_seconds", "Hot-path operation latency by route.", _op_latency, ("endpoint", "op"))
+    _render_values(lines, "finnhub_responses_total", "Finnhub responses by endpoint and status.", upstream_responses.snapshot(), ("path", "status"))
+    _render_values(lines, "finnhub_retries_total", "Finnhub requests retried after a transient failure, by endpoint and cause.", upstream_retries.snapshot(), ("path", "cause"))
+    _render_values(lines, "finnhub_rate_limited_total", "Requests refused or backed off by the rate limiter.", rate_limited.snapshot(), ("lane",))
+    _render_values(lines, "db_rows_written_total", "Rows written by the bulk layer.", db_rows_written.snapshot(), ("table", "kind"))
+    _render_values(lines, "stream_messages_published_total", "Messages added to Redis streams.", stream_messages.snapshot(), ("stream",))
+    _render_values(lines, "cache_refreshes_total", "Background stale refreshes by key prefix and outcome.", cache_refreshes.snapshot(), ("prefix", "outcome"))
+
+    stats = cache_stats()
+    cache = {}
+    for prefix, tier in stats["l1"].items():
+        cache[(prefix, "l1", "hit")] = tier["hits"]
+        cache[(prefix, "l1", "miss")] = tier["misses"]
+    for prefix, tier in stats["l2"].items():
+        cache[(prefix, "l2", "hit")] = tier["hits"]
+        cache[(prefix, "l2", "miss")] = tier["misses"]
+    _render_values(lines, "cache_requests_total", "Cache lookups by key prefix, tier and result.", cache, ("prefix", "tier", "result"))
+
+    codec = codec_stats()["prefixes"]
+    _render_values(lines, "cache_stored_bytes_total", "Bytes written to Redis by key prefix.",
+                    {(prefix,): s["stored_bytes"] for prefix, s in codec.items()}, ("prefix",))
+    _render_values(lines, "cache_json_bytes_total", "Plain JSON size of the same writes.",
+                    {(prefix,): s["json_bytes"] for prefix, s in codec.items()}, ("prefix",))
+
+    write_behind = write_behind_stats()
+    _render_values(lines, "write_behind_rows_total", "Write-behind rows by outcome.",
+                    {(name,): write_behind[name] for name in ("enqueued", "written", "retries", "spilled", "replayed", "dead_lettered", "dropped", "sync_fallbacks")},
+                    ("outcome",))
+    _render_values(lines, "write_behind_queue_depth", "Batches waiting for the write-behind writer.",
+                    {(): write_behind["queue_depth"]}, (), kind="gauge")
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, JSON
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Index
+from sqlalchemy.dialects.mysql import DATETIME
 from db.database import Base
 
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class StockQuote(Base):
     __tablename__ = "stock_quotes"
+    # history reads range-scan one symbol by time; ties on fetched_at are broken by id
+    __table_args__ = (Index("ix_quotes_symbol_fetched_at", "symbol", "fetched_at"),)
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String(20), nullable=False)
     current_price = Column(Float)
@@ -10,6 +17,7 @@ class StockQuote(Base):
     low_price = Column(Float)
     open_price = Column(Float)
     prev_close_price = Column(Float)
+    fetched_at = Column(DateTime().with_variant(DATETIME(fsp=3), "mysql"), nullable=False, default=utcnow)  # UTC
 
 class CompanyProfile(Base):
     __tablename__ = "company_profiles"
@@ -22,24 +30,35 @@ class CompanyProfile(Base):
     data = Column(JSON)
 
 
-from sqlalchemy import Column, Integer, String, Float, Date, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, JSON, UniqueConstraint
 from db.database import Base
 
 
 # ---------------- MARKET NEWS ----------------
 class MarketNews(Base):
     __tablename__ = "market_news"
+    __table_args__ = (
+        # the same article is filed under every symbol it mentions
+        UniqueConstraint("symbol", "url_hash", name="uq_news_symbol_url_hash"),
+        Index("ix_news_symbol_datetime", "symbol", "datetime"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String(20))
     headline = Column(String(255))
     source = Column(String(255))
     url = Column(String(255))
+    url_hash = Column(String(40))  # sha1(url); (symbol, url_hash) is the natural key for upserts
     datetime = Column(Integer)
+    data = Column(JSON)  # raw Finnhub item, served as is
     
 
 # ---------------- EARNINGS CALENDAR ----------------
 class EarningsCalendar(Base):
     __tablename__ = "earnings_calendar"
+    __table_args__ = (
+        UniqueConstraint("symbol", "date", name="uq_earnings_symbol_date"),
+        Index("ix_earnings_date", "date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String(20), nullable=False)
     date = Column(Date)
@@ -53,6 +72,10 @@ class EarningsCalendar(Base):
 # ---------------- IPO CALENDAR ----------------
 class IPOCalendar(Base):
     __tablename__ = "ipo_calendar"
+    __table_args__ = (
+        UniqueConstraint("symbol", "date", name="uq_ipo_symbol_date"),
+        Index("ix_ipo_date", "date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String(20))
     company = Column(String(255))
@@ -82,7 +105,7 @@ class EconomicEvent(Base):
 class Country(Base):
     __tablename__ = "countries"
     id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(10), nullable=False)   # e.g., "US"
+    code = Column(String(10), nullable=False, unique=True)   # e.g., "US"
     name = Column(String(100), nullable=False)  # e.g., "United States"
     currency = Column(String(100))               # e.g., "USD"
     timezone = Column(String(50)) 
@@ -0,0 +1,280 @@
+"""Keep hot cache keys warm: refresh them shortly before they go stale.
+
+    python -m app.prefetch                        # run the scheduler
+    python -m app.prefetch --watchlist AAPL MSFT  # add symbols to the shared watchlist first
+    python -m app.prefetch --once                 # one scan + refresh pass, then exit
+
+Keys come from the watchlist (PREFETCH_WATCHLIST plus the Redis set prefetch:watchlist,
+expanded to every PREFETCH_PREFIXES family) and from request counts recorded by the API
+(app.access_stats). Due keys are refreshed highest request rate first, through the same
+loaders the routers use, on the rate limiter's bulk lane and within PREFETCH_MAX_PER_MINUTE.
+"""
+import os
+import sys
+import time
+import uuid
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# the scheduler reads TTLs from Redis; a process-local copy would only hide them
+os.environ.setdefault("L1_CACHE_ENABLED", "0")
+
+import app.config  # noqa: F401  (reads .env)
+from db.database import SessionLocal
+from app.utils import redis_client, fetch_lane
+from app.ttl_policy import ttl_for
+from app.rate_limiter import RateLimitExceeded, FINNHUB_RATE_LIMIT
+from app.read_through import REFRESH_LOCK_KEY, REFRESH_LOCK_TTL
+from app.access_stats import ACCESS_KEY, WATCHLIST_KEY, STATS_KEY, TRACKED_PREFIXES, watchlist
+from app.services.stock_service import _load_stock_quotes
+from app.services.company_service import _load_company_profile
+from app.services.news_service import _load_market_news
+
+logger = logging.getLogger(__name__)
+
+# Learned keys considered per scan, most requested first, and the decayed count they need
+PREFETCH_MAX_KEYS = int(os.getenv("PREFETCH_MAX_KEYS", 5000))
+PREFETCH_MIN_SCORE = float(os.getenv("PREFETCH_MIN_SCORE", 1))
+# Upstream calls the prefetcher may make; defaults to half the Finnhub quota
+PREFETCH_MAX_PER_MINUTE = int(os.getenv("PREFETCH_MAX_PER_MINUTE", FINNHUB_RATE_LIMIT // 2 or 600))
+# Refresh this fraction of the fresh TTL (at least a second) before the entry goes stale
+PREFETCH_LEAD_FRACTION = float(os.getenv("PREFETCH_LEAD_FRACTION", 0.2))
+PREFETCH_SCAN_INTERVAL = float(os.getenv("PREFETCH_SCAN_INTERVAL", 5))
+PREFETCH_TICK = float(os.getenv("PREFETCH_TICK", 1))
+PREFETCH_BATCH_SIZE = int(os.getenv("PREFETCH_BATCH_SIZE", 50))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 4))
+# Request counts halve this often, so scores track the recent request rate
+ACCESS_HALF_LIFE = float(os.getenv("ACCESS_HALF_LIFE", 600))
+
+DECAY_LOCK_KEY = "prefetch:decay"
+
+WATCHLIST_PRIORITY = float("inf")
+
+
+# ---------------- LOADERS ----------------
+def _symbol(prefix: str, key: str):
+    return key[len(prefix):]
+
+
+def _load_quotes(keys: list, db):
+    # one concurrent fetch and one multi-row insert for the whole batch
+    _load_stock_quotes(keys, db)
+
+
+def _load_profiles(keys: list, db):
+    for key in keys:
+        _load_company_profile(_symbol("company_profile_", key), key, db)
+
+
+def _load_news(keys: list, db):
+    for key in keys:
+        _load_market_news(_symbol("market_news_", key), key, db)
+
+
+# prefix -> loader(keys, db); each reuses the router's fetch, persist, cache and publish path
+LOADERS = {
+    "stock_quote_": _load_quotes,
+    "company_profile_": _load_profiles,
+    "market_news_": _load_news,
+}
+
+
+def _prefix(key: str):
+    for prefix in LOADERS:
+        if key.startswith(prefix):
+            return prefix
+    return None
+
+
+# ---------------- SCHEDULER ----------------
+class Prefetcher:
+    def __init__(self, max_per_minute: int = PREFETCH_MAX_PER_MINUTE, workers: int = PREFETCH_WORKERS):
+        self.rate = max_per_minute / 60
+        self.allowance = 0.0
+        self.due = {}          # key -> unix time it should be refreshed
+        self.priority = {}     # key -> decayed request count (inf for the watchlist)
+        self.inflight = set()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.stats = {"refreshed": 0, "failed": 0, "rate_limited": 0, "locked": 0}
+        self.last_scan = 0.0
+        self.last_tick = time.time()
+        self.prefixes = [p for p in TRACKED_PREFIXES if p in LOADERS]
+
+    def candidates(self):
+        """key -> priority: watchlist keys first, then learned keys by request rate."""
+        keys = {f"{prefix}{symbol}": WATCHLIST_PRIORITY for symbol in watchlist() for prefix in self.prefixes}
+        learned = redis_client.zrevrangebyscore(ACCESS_KEY, "+inf", PREFETCH_MIN_SCORE, start=0, num=PREFETCH_MAX_KEYS, withscores=True)
+        for key, score in learned:
+            if _prefix(key) in self.prefixes:
+                keys.setdefault(key, score)
+        return keys
+
+    def scan(self):
+        """Recompute due times from Redis TTLs: one pipelined PTTL per key, no payloads read."""
+        keys = self.candidates()
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.pttl(key)
+        now = time.time()
+        due = {}
+        for key, pttl in zip(keys, pipe.execute()):
+            if pttl < 0:
+                # missing (or no TTL): fill it before someone asks
+                due[key] = now
+                continue
+            fresh, stale = ttl_for(key)
+            stale_at = now + pttl / 1000 - stale
+            due[key] = stale_at - max(1.0, fresh * PREFETCH_LEAD_FRACTION)
+        with self.lock:
+            self.due, self.priority = due, keys
+        self.last_scan = now
+        return len(keys)
+
+    def _take_due(self, now: float, paced: bool = True):
+        """Due keys that fit in the budget, highest priority first."""
+        # refill for the time since the last tick; a burst is capped at one scan interval's worth
+        self.allowance = min(self.allowance + (now - self.last_tick) * self.rate, max(self.rate * PREFETCH_SCAN_INTERVAL, 1))
+        self.last_tick = now
+        budget = int(self.allowance) if paced else None
+        if budget is not None and budget <= 0:
+            return []
+        with self.lock:
+            ready = [key for key, at in self.due.items() if at <= now and key not in self.inflight]
+            ready.sort(key=lambda key: (-self.priority.get(key, 0), self.due[key]))
+            taken = ready[:budget]
+            self.inflight.update(taken)
+            for key in taken:
+                # provisional: the next scan replaces it with the TTL that was actually written
+                fresh, _ = ttl_for(key)
+                self.due[key] = now + max(1.0, fresh * (1 - PREFETCH_LEAD_FRACTION))
+        if paced:
+            self.allowance -= len(taken)
+        return taken
+
+    def _lock(self, keys: list, token: str):
+        # the same per-key lock read_through takes for stale refreshes, so the two never overlap
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(REFRESH_LOCK_KEY.format(key=key), token, nx=True, ex=REFRESH_LOCK_TTL)
+        return [key for key, locked in zip(keys, pipe.execute()) if locked]
+
+    def _unlock(self, keys: list, token: str):
+        lock_keys = [REFRESH_LOCK_KEY.format(key=key) for key in keys]
+        owned = [lock_key for lock_key, value in zip(lock_keys, redis_client.mget(lock_keys)) if value == token]
+        if owned:
+            redis_client.delete(*owned)
+
+    def _refresh(self, prefix: str, keys: list):
+        fetch_lane.set("bulk")
+        token = uuid.uuid4().hex
+        locked = []
+        try:
+            locked = self._lock(keys, token)
+            self._count("locked", len(keys) - len(locked))
+            if not locked:
+                return
+            db = SessionLocal()
+            try:
+                LOADERS[prefix](locked, db)
+                self._count("refreshed", len(locked))
+            finally:
+                db.close()
+        except RateLimitExceeded:
+            # user traffic has the quota; these keys come due again on the next scan
+            self._count("rate_limited", len(locked))
+        except Exception as e:
+            self._count("failed", len(locked))
+            logger.warning("Prefetch of %d %s keys failed: %s", len(locked), prefix, e)
+        finally:
+            if locked:
+                self._unlock(locked, token)
+            with self.lock:
+                self.inflight.difference_update(keys)
+
+    def _count(self, name: str, amount: int):
+        with self.lock:
+            self.stats[name] += amount
+
+    def tick(self, now: float = None, paced: bool = True):
+        """Dispatch due keys, batched per family; returns the refresh futures."""
+        now = now or time.time()
+        if now - self.last_scan >= PREFETCH_SCAN_INTERVAL:
+            self.scan()
+        taken = self._take_due(now, paced)
+        by_prefix = {}
+        for key in taken:
+            by_prefix.setdefault(_prefix(key), []).append(key)
+        futures = []
+        for prefix, keys in by_prefix.items():
+            for start in range(0, len(keys), PREFETCH_BATCH_SIZE):
+                futures.append(self.pool.submit(self._refresh, prefix, keys[start:start + PREFETCH_BATCH_SIZE]))
+        return futures
+
+    def decay(self):
+        """Halve every request count once per half-life, across all prefetcher processes."""
+        if not redis_client.set(DECAY_LOCK_KEY, 1, nx=True, ex=max(1, int(ACCESS_HALF_LIFE))):
+            return
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zunionstore(ACCESS_KEY, {ACCESS_KEY: 0.5})
+        # forget keys nobody asks for any more, and bound the set
+        pipe.zremrangebyscore(ACCESS_KEY, "-inf", PREFETCH_MIN_SCORE / 4)
+        pipe.zremrangebyrank(ACCESS_KEY, 0, -(PREFETCH_MAX_KEYS * 2) - 1)
+        pipe.execute()
+
+    def publish_stats(self):
+        with self.lock:
+            stats = dict(self.stats, candidates=len(self.priority), inflight=len(self.inflight), last_scan=self.last_scan)
+        redis_client.hset(STATS_KEY, mapping=stats)
+
+    def run(self, stop: threading.Event):
+        last_report = time.time()
+        while not stop.is_set():
+            try:
+                self.decay()
+                self.tick()
+                if time.time() - last_report >= 30:
+                    self.publish_stats()
+                    last_report = time.time()
+            except Exception as e:
+                # Redis hiccup: try again next tick
+                logger.warning("Prefetch tick failed: %s", e)
+            stop.wait(PREFETCH_TICK)
+        self.pool.shutdown(wait=True)
+        self.publish_stats()
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Refresh watchlist and frequently requested cache keys ahead of expiry.")
+    parser.add_argument("--watchlist", nargs="*", default=[], help="symbols to add to the shared watchlist")
+    parser.add_argument("--unwatch", nargs="*", default=[], help="symbols to remove from the shared watchlist")
+    parser.add_argument("--once", action="store_true", help="scan and refresh what is due once, then exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    if args.watchlist:
+        redis_client.sadd(WATCHLIST_KEY, *args.watchlist)
+    if args.unwatch:
+        redis_client.srem(WATCHLIST_KEY, *args.unwatch)
+
+    prefetcher = Prefetcher()
+    if args.once:
+        # no pacing for a single pass beyond the rate limiter itself
+        for future in prefetcher.tick(paced=False):
+            future.result()
+        prefetcher.publish_stats()
+        logger.info("Prefetch pass: %s", prefetcher.stats)
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    logger.info("Prefetching %s at up to %d upstream calls/min", ", ".join(prefetcher.prefixes), PREFETCH_MAX_PER_MINUTE)
+    prefetcher.run(stop)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,109 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUOTE_STREAM_INTERVAL = float(os.getenv("QUOTE_STREAM_INTERVAL", 2.0))
+QUOTE_STREAM_WORKERS = int(os.getenv("QUOTE_STREAM_WORKERS", 32))
+QUOTE_STREAM_MAX_SYMBOLS = int(os.getenv("QUOTE_STREAM_MAX_SYMBOLS", 200))
+
+
+class Subscriber:
+    """Per-client mailbox that keeps only the newest quote per symbol.
+
+    A slow client never builds a backlog: updates it has not sent yet are overwritten,
+    so memory stays bounded by the number of symbols it watches.
+    """
+
+    def __init__(self):
+        self.symbols = set()
+        self._latest = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, symbol: str, quote: dict):
+        self._latest[symbol] = quote
+        self._ready.set()
+
+    async def next_batch(self):
+        await self._ready.wait()
+        self._ready.clear()
+        batch, self._latest = self._latest, {}
+        return batch
+
+
+class QuoteHub:
+    """One refresh loop per subscribed symbol, fanned out to every subscriber of that symbol.
+
+    load(symbol) is a blocking call returning the current quote (normally the cached
+    read-through path), run on a dedicated thread pool.
+    """
+
+    def __init__(self, load, interval: float = QUOTE_STREAM_INTERVAL, workers: int = QUOTE_STREAM_WORKERS):
+        self.load = load
+        self.interval = interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quote-hub")
+        self._subscribers = {}
+        self._tasks = {}
+        self._last = {}
+
+    def subscribe(self, subscriber: Subscriber, symbols):
+        for symbol in symbols:
+            if symbol in subscriber.symbols:
+                continue
+            if len(subscriber.symbols) >= QUOTE_STREAM_MAX_SYMBOLS:
+                raise ValueError(f"At most {QUOTE_STREAM_MAX_SYMBOLS} symbols per subscription")
+            subscriber.symbols.add(symbol)
+            self._subscribers.setdefault(symbol, set()).add(subscriber)
+            if symbol in self._last:
+                subscriber.offer(symbol, self._last[symbol])
+            if symbol not in self._tasks:
+                self._tasks[symbol] = asyncio.create_task(self._refresh_loop(symbol))
+
+    def unsubscribe(self, subscriber: Subscriber, symbols=None):
+        for symbol in list(subscriber.symbols if symbols is None else symbols):
+            subscriber.symbols.discard(symbol)
+            watchers = self._subscribers.get(symbol)
+            if watchers is None:
+                continue
+            watchers.discard(subscriber)
+            if not watchers:
+                # last watcher gone: stop polling the symbol
+                del self._subscribers[symbol]
+                self._last.pop(symbol, None)
+                task = self._tasks.pop(symbol, None)
+                if task is not None:
+                    task.cancel()
+
+    async def _refresh_loop(self, symbol: str):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                quote = await loop.run_in_executor(self._executor, self.load, symbol)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Quote refresh failed for %s", symbol)
+                quote = None
+            if quote is not None and quote != self._last.get(symbol):
+                self._last[symbol] = quote
+                for subscriber in self._subscribers.get(symbol, ()):
+                    subscriber.offer(symbol, quote)
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._subscribers.clear()
+        self._last.clear()
+
+    def stats(self):
+        return {
+            "symbols": len(self._tasks),
+            "subscriptions": sum(len(watchers) for watchers in self._subscribers.values()),
+            "interval": self.interval,
+        }
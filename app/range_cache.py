@@ -0,0 +1,121 @@
+import os
+import time
+from datetime import date, timedelta
+from app.utils import cache_many, get_many_raw_entries, dumps, loads
+from app.read_through import schedule_refresh, ndjson_lines
+from app.singleflight import singleflight_many
+
+# Longest window one request may assemble (and so the most buckets read per request)
+RANGE_CACHE_MAX_DAYS = int(os.getenv("RANGE_CACHE_MAX_DAYS", 3 * 366))
+# Days read (and fetched on a miss) per step of a streamed response
+RANGE_STREAM_CHUNK_DAYS = int(os.getenv("RANGE_STREAM_CHUNK_DAYS", 31))
+
+BUCKET_KEY = "{prefix}day_{day}"
+
+
+def bucket_key(prefix: str, day: date):
+    return BUCKET_KEY.format(prefix=prefix, day=day.isoformat())
+
+
+def _days(start: date, end: date):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _runs(days: list):
+    """Group sorted days into contiguous (first, last) runs."""
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def _fill(prefix: str, start: date, end: date, fetch, db):
+    """Fetch one uncovered run and cache every day in it, empty days included."""
+    items = fetch(start, end, db)
+    buckets = {bucket_key(prefix, day): [] for day in _days(start, end)}
+    for item in items:
+        key = bucket_key(prefix, date.fromisoformat(item["date"])) if item.get("date") else None
+        if key in buckets:
+            buckets[key].append(item)
+    cache_many(buckets)
+    return buckets
+
+
+def _check_range(start: date, end: date):
+    if start is None or end is None:
+        raise ValueError("Both ends of the range are required")
+    if end < start:
+        raise ValueError("`to` must not be before `_from`")
+    if (end - start).days >= RANGE_CACHE_MAX_DAYS:
+        raise ValueError(f"At most {RANGE_CACHE_MAX_DAYS} days per request")
+
+
+def _read_buckets(prefix: str, days: list, fetch, db):
+    """day key -> cached JSON array for each of `days`, fetching only the uncovered runs."""
+    keys = [bucket_key(prefix, day) for day in days]
+    entries = get_many_raw_entries(keys)
+
+    now = time.time()
+    buckets = {}
+    missing, stale = [], []
+    for day, key, entry in zip(days, keys, entries):
+        if entry is None:
+            missing.append(day)
+            continue
+        buckets[key] = entry.json_body()[0]
+        if entry.soft_deadline <= now:
+            stale.append(day)
+
+    for first, last in _runs(stale):
+        schedule_refresh(f"{prefix}{first}_{last}", lambda session, first=first, last=last: _fill(prefix, first, last, fetch, session))
+
+    if missing:
+        day_for = {bucket_key(prefix, day): day for day in missing}
+
+        def load(missing_keys):
+            loaded = {}
+            for first, last in _runs(sorted(day_for[key] for key in missing_keys)):
+                loaded.update(_fill(prefix, first, last, fetch, db))
+            return loaded
+        for key, items in singleflight_many(list(day_for), load).items():
+            buckets[key] = dumps(items or [])
+    return buckets
+
+
+def read_range_json(prefix: str, start: date, end: date, fetch, db):
+    """Assemble [start, end] as one JSON array from per-day cache buckets, fetching only the uncovered runs.
+
+    fetch(first, last, db) loads, persists and publishes one contiguous date range and
+    returns its items (each with an ISO "date"). Stale buckets are served and their runs
+    refreshed in the background; missing runs are single-flighted per day key. Cached
+    JSON buckets are spliced together as stored bytes, without parsing them.
+    """
+    _check_range(start, end)
+    days = _days(start, end)
+    buckets = _read_buckets(prefix, days, fetch, db)
+
+    # each bucket is a JSON array: drop its brackets and join the non-empty bodies
+    bodies = [body for body in (buckets[bucket_key(prefix, day)].strip()[1:-1].strip() for day in days) if body]
+    return b"[" + b",".join(bodies) + b"]"
+
+
+def stream_range_ndjson(prefix: str, start: date, end: date, fetch, db):
+    """read_range_json as NDJSON lines, RANGE_STREAM_CHUNK_DAYS buckets at a time.
+
+    Each chunk is read (and its uncovered runs fetched and cached) only when the previous
+    one has been sent, so memory is bounded by one chunk whatever the range. The range is
+    validated before the first line.
+    """
+    _check_range(start, end)
+
+    def lines():
+        days = _days(start, end)
+        for offset in range(0, len(days), RANGE_STREAM_CHUNK_DAYS):
+            chunk = days[offset:offset + RANGE_STREAM_CHUNK_DAYS]
+            buckets = _read_buckets(prefix, chunk, fetch, db)
+            for day in chunk:
+                yield from ndjson_lines(loads(buckets.pop(bucket_key(prefix, day))))
+    return lines()
@@ -0,0 +1,196 @@
+import os
+import time
+import uuid
+import asyncio
+from app.resources import redis_connection, async_redis_connection
+
+redis_client = redis_connection()
+
+# Finnhub quota shared by every worker/process that uses the same Redis
+FINNHUB_RATE_LIMIT = int(os.getenv("FINNHUB_RATE_LIMIT", 60))          # requests per minute, 0 disables
+FINNHUB_RATE_BURST = int(os.getenv("FINNHUB_RATE_BURST", FINNHUB_RATE_LIMIT))
+WAITER_HEARTBEAT_MS = 5000
+
+BUCKET_KEY = "finnhub_rate_limit:bucket"
+QUEUE_KEY = "finnhub_rate_limit:queue:{lane}"
+
+# Lanes in priority order. A lane may only take a token while no higher lane has
+# waiters and at least `reserve` of the bucket would remain for the lanes above it.
+LANES = {
+    "interactive": {"reserve": 0.0, "timeout": float(os.getenv("RATE_LIMIT_TIMEOUT_INTERACTIVE", 5))},
+    "default": {"reserve": 0.1, "timeout": float(os.getenv("RATE_LIMIT_TIMEOUT_DEFAULT", 15))},
+    "bulk": {"reserve": 0.3, "timeout": float(os.getenv("RATE_LIMIT_TIMEOUT_BULK", 30))},
+}
+LANE_ORDER = list(LANES)
+
+_ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local waiter = ARGV[5]
+local heartbeat = tonumber(ARGV[6])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+-- KEYS[2] is the caller's lane queue, KEYS[3..] the queues of higher lanes
+local blocked = false
+for i = 3, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now)
+    if redis.call('ZCARD', KEYS[i]) > 0 then
+        blocked = true
+    end
+end
+
+local granted = 0
+if not blocked and tokens - cost >= reserve then
+    tokens = tokens - cost
+    granted = 1
+    if waiter ~= '' then
+        redis.call('ZREM', KEYS[2], waiter)
+    end
+elseif waiter ~= '' then
+    redis.call('ZADD', KEYS[2], now + heartbeat, waiter)
+    redis.call('PEXPIRE', KEYS[2], heartbeat * 2)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) * 2)
+
+local wait = 0
+if granted == 0 then
+    wait = math.max(1, math.ceil((cost + reserve - tokens) / rate))
+end
+return {granted, tostring(tokens), wait}
+"""
+
+_acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, lane: str, retry_after: float):
+        self.lane = lane
+        self.retry_after = max(1, int(round(retry_after)))
+        super().__init__(f"Finnhub rate limit reached ({lane} lane), retry after {self.retry_after}s")
+
+
+def _script_call(lane: str, cost: int, waiter: str):
+    if lane not in LANES:
+        raise ValueError(f"Unknown rate limit lane: {lane}")
+    index = LANE_ORDER.index(lane)
+    keys = [BUCKET_KEY, QUEUE_KEY.format(lane=lane)] + [QUEUE_KEY.format(lane=l) for l in LANE_ORDER[:index]]
+    args = [
+        FINNHUB_RATE_LIMIT / 60000.0,
+        FINNHUB_RATE_BURST,
+        cost,
+        LANES[lane]["reserve"] * FINNHUB_RATE_BURST,
+        waiter,
+        WAITER_HEARTBEAT_MS
+    ]
+    return keys, args
+
+
+def _try(lane: str, cost: int, waiter: str = ""):
+    """Run one atomic bucket check; returns (granted, wait_seconds)."""
+    keys, args = _script_call(lane, cost, waiter)
+    granted, _, wait_ms = _acquire(keys=keys, args=args)
+    return bool(granted), int(wait_ms) / 1000.0
+
+
+async def _try_async(lane: str, cost: int, waiter: str = ""):
+    """_try on the asyncio pool, so async routers never block the event loop on Redis."""
+    keys, args = _script_call(lane, cost, waiter)
+    client = async_redis_connection()
+    granted, _, wait_ms = await client.register_script(_ACQUIRE_SCRIPT)(keys=keys, args=args)
+    return bool(granted), int(wait_ms) / 1000.0
+
+
+def try_acquire(lane: str = "default", cost: int = 1):
+    """Take a token without waiting; False means the caller should serve stale data or give up."""
+    if FINNHUB_RATE_LIMIT <= 0:
+        return True
+    granted, _ = _try(lane, cost)
+    return granted
+
+
+def acquire(lane: str = "default", cost: int = 1, timeout: float = None):
+    """Block until a token is available in `lane`, or raise RateLimitExceeded after `timeout`."""
+    if FINNHUB_RATE_LIMIT <= 0:
+        return
+    timeout = LANES[lane]["timeout"] if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    waiter = uuid.uuid4().hex
+    while True:
+        granted, wait = _try(lane, cost, waiter)
+        if granted:
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _leave_queue(lane, waiter)
+            raise RateLimitExceeded(lane, wait)
+        time.sleep(min(wait, 0.25, remaining))
+
+
+async def acquire_async(lane: str = "default", cost: int = 1, timeout: float = None):
+    if FINNHUB_RATE_LIMIT <= 0:
+        return
+    timeout = LANES[lane]["timeout"] if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    waiter = uuid.uuid4().hex
+    while True:
+        granted, wait = await _try_async(lane, cost, waiter)
+        if granted:
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            await async_redis_connection().zrem(QUEUE_KEY.format(lane=lane), waiter)
+            raise RateLimitExceeded(lane, wait)
+        await asyncio.sleep(min(wait, 0.25, remaining))
+
+
+def _leave_queue(lane: str, waiter: str):
+    redis_client.zrem(QUEUE_KEY.format(lane=lane), waiter)
+
+
+def drain_tokens():
+    """Empty the bucket after an upstream 429 so every worker backs off together."""
+    redis_client.hset(BUCKET_KEY, mapping={"tokens": 0, "ts": int(time.time() * 1000)})
+
+
+async def drain_tokens_async():
+    await async_redis_connection().hset(BUCKET_KEY, mapping={"tokens": 0, "ts": int(time.time() * 1000)})
+
+
+def limiter_stats():
+    now_ms = int(time.time() * 1000)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hmget(BUCKET_KEY, "tokens", "ts")
+    for lane in LANE_ORDER:
+        pipe.zcount(QUEUE_KEY.format(lane=lane), now_ms, "+inf")
+    (tokens, ts), *depths = pipe.execute()
+
+    # project the refill the next acquire would apply
+    if tokens is None:
+        level = float(FINNHUB_RATE_BURST)
+    else:
+        elapsed = max(0, now_ms - int(ts))
+        level = min(FINNHUB_RATE_BURST, float(tokens) + elapsed * FINNHUB_RATE_LIMIT / 60000.0)
+
+    return {
+        "enabled": FINNHUB_RATE_LIMIT > 0,
+        "rate_per_minute": FINNHUB_RATE_LIMIT,
+        "capacity": FINNHUB_RATE_BURST,
+        "tokens": round(level, 3),
+        "lanes": {
+            lane: {
+                "queue_depth": depth,
+                "available": max(0.0, round(level - LANES[lane]["reserve"] * FINNHUB_RATE_BURST, 3))
+            }
+            for lane, depth in zip(LANE_ORDER, depths)
+        }
+    }
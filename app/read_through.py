@@ -0,0 +1,160 @@
+import os
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from db.database import SessionLocal
+from app.utils import redis_client, get_cached_entry, get_cached_response, get_cached_response_async, background_fetch, fetch_lane, dumps
+from app.rate_limiter import RateLimitExceeded
+from app.singleflight import singleflight, singleflight_async
+from app.access_stats import record_access
+from app.local_cache import key_prefix
+from app.metrics import cache_refreshes
+
+CACHE_REFRESH_WORKERS = int(os.getenv("CACHE_REFRESH_WORKERS", 4))
+REFRESH_LOCK_TTL = int(os.getenv("CACHE_REFRESH_LOCK_TTL", 30))
+
+REFRESH_LOCK_KEY = "refresh:{key}"
+
+NDJSON = "application/x-ndjson"
+
+_refresh_pool = ThreadPoolExecutor(max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _refresh(cache_key: str, loader):
+    token = uuid.uuid4().hex
+    lock_key = REFRESH_LOCK_KEY.format(key=cache_key)
+    try:
+        # one refresh per key across workers; the others keep serving the stale value
+        if not redis_client.set(lock_key, token, nx=True, ex=REFRESH_LOCK_TTL):
+            return
+        background_fetch.set(True)
+        # a stale copy is already being served, so only spend quota foreground traffic leaves over
+        fetch_lane.set("bulk")
+        db = SessionLocal()
+        try:
+            loader(db)
+            outcome = "refreshed"
+        except RateLimitExceeded:
+            # quota is busy with foreground traffic; the stale copy stays until a later request
+            outcome = "rate_limited"
+        finally:
+            db.close()
+            if redis_client.get(lock_key) == token:
+                redis_client.delete(lock_key)
+    except Exception as e:
+        # nobody waits on the executor future, so report here or the failure is lost
+        outcome = "failed"
+        logger.warning("Background refresh of %s failed: %s", cache_key, e)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+    cache_refreshes.inc((key_prefix(cache_key), outcome))
+
+
+def schedule_refresh(cache_key: str, loader):
+    """Refresh `cache_key` in the background with loader(db), at most once at a time per key."""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+    _refresh_pool.submit(_refresh, cache_key, loader)
+
+
+def read_through(cache_key: str, loader, db, count_access: bool = True):
+    """Serve `cache_key` from cache, revalidating stale entries in the background.
+
+    loader(db) fetches, persists, caches and publishes the data and returns it. Fresh
+    hits return immediately; stale hits return immediately and schedule one refresh;
+    misses (past the hard TTL) block on a single-flight load. Polling callers pass
+    count_access=False so the prefetcher's access stats only see client demand.
+    """
+    if count_access:
+        record_access(cache_key)
+    entry = get_cached_entry(cache_key)
+    if entry is not None:
+        data, stale = entry
+        if stale:
+            schedule_refresh(cache_key, loader)
+        return data
+    return singleflight(cache_key, lambda: loader(db))
+
+
+def json_response(body: bytes, content_encoding: str = None):
+    """Wrap already-serialized JSON so FastAPI sends it without re-encoding."""
+    headers = {"Vary": "Accept-Encoding"}
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def read_through_response_async(cache_key: str, loader, refresh, db, accept_encoding: str = ""):
+    """read_through_response for async routers: the cache read and a miss's loader(db) are awaited.
+
+    loader(db) is a coroutine on an AsyncSession; stale hits still refresh in the background
+    through the sync refresh pool, with refresh(session) on a sync Session.
+    """
+    record_access(cache_key)
+    hit = await get_cached_response_async(cache_key, accept_gzip="gzip" in accept_encoding)
+    if hit is not None:
+        body, stale, content_encoding = hit
+        if stale:
+            schedule_refresh(cache_key, refresh)
+        return json_response(body, content_encoding)
+    return json_response(dumps(await singleflight_async(cache_key, lambda: loader(db))))
+
+
+def wants_ndjson(request, stream: bool = False):
+    """Opt-in streaming: `stream=true` or an Accept header asking for NDJSON."""
+    return stream or NDJSON in request.headers.get("accept", "")
+
+
+def ndjson_lines(items):
+    for item in items:
+        yield dumps(item) + b"\n"
+
+
+def ndjson_response(lines):
+    """Stream an iterable of NDJSON lines as they are produced.
+
+    The first line is pulled before the response starts, so validation, rate-limit and
+    upstream errors up to then still surface as the route's usual status codes. A failure
+    after that ends the stream with one {"error", "status"} line.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+
+    def body():
+        if first is None:
+            return
+        yield first
+        try:
+            yield from lines
+        except RateLimitExceeded as e:
+            yield dumps({"error": str(e), "status": 429, "retry_after": e.retry_after}) + b"\n"
+        except Exception as e:
+            yield dumps({"error": str(e), "status": 500}) + b"\n"
+
+    return StreamingResponse(body(), media_type=NDJSON, headers={"Vary": "Accept"})
+
+
+def read_through_response(cache_key: str, loader, db, accept_encoding: str = ""):
+    """read_through that answers with a ready JSON Response.
+
+    Hits send JSON-codec entries as stored, compressed or not (see get_cached_response);
+    misses serialize the loaded data once with the fast encoder.
+    """
+    record_access(cache_key)
+    hit = get_cached_response(cache_key, accept_gzip="gzip" in accept_encoding)
+    if hit is not None:
+        body, stale, content_encoding = hit
+        if stale:
+            schedule_refresh(cache_key, loader)
+        return json_response(body, content_encoding)
+    return json_response(dumps(singleflight(cache_key, lambda: loader(db))))
@@ -0,0 +1,84 @@
+import logging
+import threading
+from redis import Redis, ConnectionPool
+from redis.asyncio import Redis as AsyncRedis, ConnectionPool as AsyncConnectionPool
+from app.config import REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_MAX_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Shared per-process connection pools. Creating a pool opens no sockets; connections are
+# made on first use and reused by every client built on the pool. Text (decoded) and
+# bytes clients need separate pools because decoding is a property of the connection.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def redis_pool(decode_responses: bool = True):
+    pool = _pools.get(decode_responses)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(decode_responses)
+            if pool is None:
+                pool = _pools[decode_responses] = ConnectionPool(
+                    host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB,
+                    decode_responses=decode_responses, max_connections=REDIS_MAX_CONNECTIONS,
+                )
+    return pool
+
+
+def redis_connection(decode_responses: bool = True):
+    """A client on the shared pool; cheap, so modules may keep one at import time."""
+    return Redis(connection_pool=redis_pool(decode_responses))
+
+
+# asyncio pools for async routers; their connections belong to the worker's event loop, which
+# is the only thread that touches them (so no lock), and they are dropped at shutdown
+_async_pools = {}
+
+
+def async_redis_connection(decode_responses: bool = True):
+    """An asyncio client on the shared asyncio pool; cheap, but get one per use rather than at import."""
+    pool = _async_pools.get(decode_responses)
+    if pool is None:
+        pool = _async_pools[decode_responses] = AsyncConnectionPool(
+            host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB,
+            decode_responses=decode_responses, max_connections=REDIS_MAX_CONNECTIONS,
+        )
+    return AsyncRedis(connection_pool=pool)
+
+
+def warm_up(db_connections: int = 1):
+    """Open the first Redis and DB connections before traffic arrives; failures are logged, not fatal."""
+    from db.database import get_engine
+
+    for decode_responses in (True, False):
+        try:
+            redis_connection(decode_responses).ping()
+        except Exception as e:
+            logger.warning("Redis warm-up failed: %s", e)
+    try:
+        engine = get_engine()
+        connections = [engine.connect() for _ in range(db_connections)]
+        for connection in connections:
+            connection.close()
+    except Exception as e:
+        logger.warning("Database warm-up failed: %s", e)
+
+
+def close():
+    """Drop every pooled connection; pools are recreated on next use."""
+    from db.database import dispose_engine
+
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.disconnect()
+    dispose_engine()
+
+
+async def close_async():
+    """Drop the asyncio pools; called from the event loop at shutdown."""
+    pools = list(_async_pools.values())
+    _async_pools.clear()
+    for pool in pools:
+        await pool.disconnect()
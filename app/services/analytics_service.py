@@ -0,0 +1,241 @@
+import os
+import time
+import numpy as np
+from datetime import datetime, timezone
+from numpy.lib.stride_tricks import sliding_window_view
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db.database import get_db
+from app.models import StockQuote
+from app.local_cache import LocalCache, MISSING
+
+router = APIRouter()
+
+MAX_ANALYTICS_SYMBOLS = int(os.getenv("MAX_ANALYTICS_SYMBOLS", 500))
+MAX_ANALYTICS_POINTS = int(os.getenv("MAX_ANALYTICS_POINTS", 5000))
+# Loaded price matrices for recently requested symbol sets; one matrix can reach tens of MB,
+# so the byte budget is what normally bounds the cache
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", 256))
+ANALYTICS_CACHE_MAX_BYTES = int(os.getenv("ANALYTICS_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", 30))
+# Default grid step (seconds) that quotes are aligned to before comparing symbols
+ANALYTICS_INTERVAL = int(os.getenv("ANALYTICS_INTERVAL", 60))
+
+_history_cache = LocalCache(ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL, max_bytes=ANALYTICS_CACHE_MAX_BYTES,
+                            size_of=lambda entry: sum(array.nbytes for array in entry))
+
+
+# ---------------- HISTORY LOADING ----------------
+def _parse_symbols(symbols: str):
+    symbol_list = sorted(set(s.strip() for s in symbols.split(",") if s.strip()))
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(symbol_list) > MAX_ANALYTICS_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ANALYTICS_SYMBOLS} symbols per request")
+    return symbol_list
+
+
+def _bucket_start(bucket: int, interval: int):
+    # fetched_at is naive UTC
+    return datetime.fromtimestamp(bucket * interval, timezone.utc).replace(tzinfo=None)
+
+
+def _forward_fill(values, valid):
+    """Carry each row's last valid column forward; columns before the first valid one stay NaN."""
+    columns = np.where(valid, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(columns, axis=-1, out=columns)
+    return np.take_along_axis(values, np.broadcast_to(columns, values.shape), axis=-1)
+
+
+def _load_history(db: Session, symbols: list, points: int, interval: int):
+    """Quotes on a common time grid as ((close, high, low) matrices of shape (symbols, points), observed).
+
+    Column j is the `interval`-second step `points - 1 - j` steps before the current one.
+    Each cell holds the symbol's last quote in that step, or its previous price carried
+    forward, so every column compares the symbols at the same time whatever their sampling
+    cadence. Steps before a symbol's first quote in the window are NaN. observed counts,
+    per symbol, the steps that hold a real quote rather than a carried-forward one. One
+    range query for the whole set, served by the (symbol, fetched_at) index.
+    """
+    last_bucket = int(time.time() // interval)
+    cache_key = (tuple(symbols), points, interval, last_bucket)
+    cached = _history_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+
+    first_bucket = last_bucket - points + 1
+    rows = db.execute(
+        select(StockQuote.symbol, StockQuote.fetched_at, StockQuote.current_price, StockQuote.high_price, StockQuote.low_price)
+        .where(StockQuote.symbol.in_(symbols), StockQuote.fetched_at >= _bucket_start(first_bucket, interval))
+        .order_by(StockQuote.fetched_at, StockQuote.id)
+    ).all()
+
+    history = np.full((3, len(symbols), points), np.nan)
+    observed = np.zeros(len(symbols), dtype=np.int64)
+    if rows:
+        index = {symbol: i for i, symbol in enumerate(symbols)}
+        symbol_col, fetched_col, *value_cols = zip(*rows)
+        row_idx = np.fromiter((index[s] for s in symbol_col), dtype=np.intp, count=len(rows))
+        stamps = np.fromiter((t.replace(tzinfo=timezone.utc).timestamp() for t in fetched_col), dtype=np.float64, count=len(rows))
+        col_idx = (stamps // interval).astype(np.intp) - first_bucket
+        positions = np.flatnonzero((col_idx >= 0) & (col_idx < points))
+        cells = row_idx[positions] * points + col_idx[positions]
+        # rows are in time order: keep the last quote of each (symbol, step)
+        cells, from_end = np.unique(cells[::-1], return_index=True)
+        latest = positions[len(positions) - 1 - from_end]
+        for plane, values in enumerate(value_cols):
+            history[plane].flat[cells] = np.asarray(values, dtype=np.float64)[latest]
+        valid = ~np.isnan(history[0])
+        observed = np.count_nonzero(valid, axis=1)
+        history = _forward_fill(history, valid)
+
+    # callers get read-only views of the cached arrays
+    history.setflags(write=False)
+    observed.setflags(write=False)
+    _history_cache.set(cache_key, (history, observed))
+    return history, observed
+
+
+# ---------------- VECTORIZED METRICS ----------------
+def _log_returns(close):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.diff(np.log(close), axis=1)
+
+
+def _rolling_volatility(returns, window: int):
+    if returns.shape[1] < window:
+        return np.full((returns.shape[0], 0), np.nan)
+    windows = sliding_window_view(returns, window, axis=1)
+    with np.errstate(invalid="ignore"):
+        return np.std(windows, axis=2, ddof=1)
+
+
+def _typical_price(close, high, low):
+    # quotes carry no volume, so the VWAP-style aggregate weights every sample equally
+    return (high + low + close) / 3
+
+
+def _rolling_mean(values, window: int):
+    if values.shape[1] < window:
+        return np.full((values.shape[0], 0), np.nan)
+    return sliding_window_view(values, window, axis=1).mean(axis=2)
+
+
+def _drawdowns(close):
+    peaks = np.fmax.accumulate(close, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return close / peaks - 1
+
+
+def _last_valid(values):
+    """Last non-NaN value of each row (NaN for all-NaN rows)."""
+    valid = ~np.isnan(values)
+    last = values.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    result = values[np.arange(values.shape[0]), last] if values.shape[1] else np.full(values.shape[0], np.nan)
+    return np.where(valid.any(axis=1), result, np.nan)
+
+
+def _min_valid(values):
+    """Row minimum ignoring NaN (NaN for all-NaN rows), without nanmin's all-NaN warning."""
+    if values.shape[1] == 0:
+        return np.full(values.shape[0], np.nan)
+    lowest = np.where(np.isnan(values), np.inf, values).min(axis=1)
+    return np.where(np.isinf(lowest), np.nan, lowest)
+
+
+def _to_list(values):
+    """NaN is not valid JSON; send null instead."""
+    values = np.asarray(values, dtype=object)
+    values[np.isnan(values.astype(np.float64))] = None
+    return values.tolist()
+
+
+# ---------------- ENDPOINTS ----------------
+@router.get("/summary")
+def get_summary(
+    symbols: str = Query(..., description="Comma-separated stock symbols"),
+    points: int = Query(500, ge=2, le=MAX_ANALYTICS_POINTS, description="Grid steps, ending with the current one"),
+    interval: int = Query(ANALYTICS_INTERVAL, ge=1, description="Grid step in seconds"),
+    window: int = Query(20, ge=2, description="Rolling window in steps"),
+    db: Session = Depends(get_db)
+):
+    symbol_list = _parse_symbols(symbols)
+    try:
+        (close, high, low), observed = _load_history(db, symbol_list, points, interval)
+        returns = _log_returns(close)
+        volatility = _rolling_volatility(returns, window)
+        typical = _typical_price(close, high, low)
+        drawdowns = _drawdowns(close)
+        first = close[np.arange(len(symbol_list)), np.argmax(~np.isnan(close), axis=1)]
+        last = _last_valid(close)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            metrics = {
+                "samples": observed,
+                "last_price": last,
+                "total_return": last / first - 1,
+                "volatility": _last_valid(volatility),
+                "vwap": _last_valid(_rolling_mean(typical, window)),
+                "max_drawdown": _min_valid(drawdowns),
+                "drawdown": _last_valid(drawdowns),
+            }
+        columns = {name: _to_list(values) for name, values in metrics.items()}
+        return {
+            symbol: {name: column[i] for name, column in columns.items()}
+            for i, symbol in enumerate(symbol_list)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+SERIES = ("returns", "volatility", "vwap", "drawdown")
+
+
+@router.get("/series")
+def get_series(
+    symbols: str = Query(..., description="Comma-separated stock symbols"),
+    metric: str = Query("returns", description="returns, volatility, vwap or drawdown"),
+    points: int = Query(500, ge=2, le=MAX_ANALYTICS_POINTS, description="Grid steps, ending with the current one"),
+    interval: int = Query(ANALYTICS_INTERVAL, ge=1, description="Grid step in seconds"),
+    window: int = Query(20, ge=2, description="Rolling window in steps"),
+    db: Session = Depends(get_db)
+):
+    symbol_list = _parse_symbols(symbols)
+    if metric not in SERIES:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(SERIES)}")
+    try:
+        (close, high, low), _ = _load_history(db, symbol_list, points, interval)
+        if metric == "returns":
+            values = _log_returns(close)
+        elif metric == "volatility":
+            values = _rolling_volatility(_log_returns(close), window)
+        elif metric == "vwap":
+            values = _rolling_mean(_typical_price(close, high, low), window)
+        else:
+            values = _drawdowns(close)
+        return {symbol: _to_list(row) for symbol, row in zip(symbol_list, values)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/correlation")
+def get_correlation(
+    symbols: str = Query(..., description="Comma-separated stock symbols"),
+    points: int = Query(500, ge=3, le=MAX_ANALYTICS_POINTS, description="Grid steps, ending with the current one"),
+    interval: int = Query(ANALYTICS_INTERVAL, ge=1, description="Grid step in seconds"),
+    db: Session = Depends(get_db)
+):
+    symbol_list = _parse_symbols(symbols)
+    try:
+        (close, _, _), _ = _load_history(db, symbol_list, points, interval)
+        returns = _log_returns(close)
+        # only samples every symbol has, so the matrix stays a true correlation matrix
+        complete = returns[:, ~np.isnan(returns).any(axis=0)]
+        if complete.shape[1] < 2:
+            matrix = np.full((len(symbol_list), len(symbol_list)), np.nan)
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                matrix = np.atleast_2d(np.corrcoef(complete))
+        return {"symbols": symbol_list, "samples": int(complete.shape[1]), "matrix": _to_list(matrix)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,95 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from db.database import get_db
-from app.models import EarningsCalendar, IPOCalendar
-from app.utils import fetch_finnhub_data, cache_data, get_cached_data
+from app.utils import fetch_finnhub_data
+from app.rate_limiter import RateLimitExceeded
+from app.range_cache import read_range_json, stream_range_ndjson
+from app.read_through import json_response, ndjson_response, wants_ndjson
+from app.write_behind import persist
 from utils.redis_producer import publish_message
 from datetime import datetime
 
 router = APIRouter()
 
+def _parse_date(value: str):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def _parse_range(_from: str, to: str):
+    """Query dates for a calendar range; an empty value is a 400, not a missing bound."""
+    for name, value in (("_from", _from), ("to", to)):
+        if not value:
+            raise ValueError(f"`{name}` must be a date (YYYY-MM-DD)")
+    return _parse_date(_from), _parse_date(to)
+
+
 # ---------------- EARNINGS CALENDAR ----------------
+def _earnings_row(item: dict):
+    return {
+        "symbol": item.get("symbol"),
+        "date": _parse_date(item.get("date")),
+        "eps_estimate": item.get("epsEstimate"),
+        "eps_actual": item.get("epsActual"),
+        "revenue_estimate": item.get("revenueEstimate"),
+        "revenue_actual": item.get("revenueActual"),
+        "data": item
+    }
+
+
+def _load_earnings_calendar(first, last, db: Session):
+    """Fetch, persist and publish one uncovered date range; range_cache buckets the items by day."""
+    _from, to = first.isoformat(), last.isoformat()
+    data = fetch_finnhub_data("calendar/earnings", {"from": _from, "to": to}, lane="bulk")
+    items = data.get("earningsCalendar") or []
+
+    result = persist("earnings_calendar", [_earnings_row(item) for item in items], db)
+
+    # publish summary to Redis
+    publish_message("earnings_calendar", {
+        "from": _from,
+        "to": to,
+        "count": len(items),
+        **result
+    })
+
+    return items
+
+
 @router.get("/earnings")
 def get_earnings_calendar(
+    request: Request,
     _from: str = Query("2025-01-01", description="Start date"),
     to: str = Query("2025-12-31", description="End date"),
+    stream: bool = Query(False, description="Send NDJSON, one item per line, as the range is read"),
     db: Session = Depends(get_db)
 ):
-    cache_key = f"earnings_calendar_{_from}_{to}"
-    cached = get_cached_data(cache_key)
-    if cached:
-        return cached
-
     try:
-        data = fetch_finnhub_data("calendar/earnings", {"from": _from, "to": to})
-        items = data.get("earningsCalendar", [])
-
-        for item in items:
-            earnings = EarningsCalendar(
-                symbol=item.get("symbol"),
-                date=datetime.strptime(item.get("date"), "%Y-%m-%d").date() if item.get("date") else None,
-                eps_estimate=item.get("epsEstimate"),
-                eps_actual=item.get("epsActual"),
-                revenue_estimate=item.get("revenueEstimate"),
-                revenue_actual=item.get("revenueActual"),
-                data=item
-            )
-            db.add(earnings)
-        db.commit()
-
-        cache_data(cache_key, items)
-
-        # publish summary to Redis
-        publish_message("earnings_calendar", {
-            "from": _from,
-            "to": to,
-            "count": len(items)
-        })
-
-        return items
+        start, end = _parse_range(_from, to)
+        if wants_ndjson(request, stream):
+            return ndjson_response(stream_range_ndjson("earnings_calendar_", start, end, _load_earnings_calendar, db))
+        return json_response(read_range_json("earnings_calendar_", start, end, _load_earnings_calendar, db))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ---------------- IPO CALENDAR ----------------
+def _ipo_row(item: dict):
+    return {
+        "symbol": item.get("symbol"),
+        "company": item.get("name"),
+        "date": _parse_date(item.get("date")),
+        "exchange": item.get("exchange"),
+        "price_range": item.get("price"),
+        "shares": item.get("numberOfShares"),
+        "expected_amount": item.get("totalSharesValue"),
+        "data": item
+    }
+
+
+def _load_ipo_calendar(first, last, db: Session):
+    _from, to = first.isoformat(), last.isoformat()
+    data = fetch_finnhub_data("calendar/ipo", {"from": _from, "to": to}, lane="bulk")
+    items = data.get("ipoCalendar") or []
+
+    result = persist("ipo_calendar", [_ipo_row(item) for item in items], db)
+
+    # publish summary to Redis
+    publish_message("ipo_calendar", {
+        "from": _from,
+        "to": to,
+        "count": len(items),
+        **result
+    })
+
+    return items
+
+
 @router.get("/ipos")
 def get_ipo_calendar(
+    request: Request,
     _from: str = Query("2025-01-01", description="Start date"),
     to: str = Query("2025-12-31", description="End date"),
+    stream: bool = Query(False, description="Send NDJSON, one item per line, as the range is read"),
     db: Session = Depends(get_db)
 ):
-    cache_key = f"ipo_calendar_{_from}_{to}"
-    cached = get_cached_data(cache_key)
-    if cached:
-        return cached
-
     try:
-        data = fetch_finnhub_data("calendar/ipo", {"from": _from, "to": to})
-        items = data.get("ipoCalendar", [])
-
-        for item in items:
-            ipo = IPOCalendar(
-                symbol=item.get("symbol"),
-                company=item.get("name"),
-                date=datetime.strptime(item.get("date"), "%Y-%m-%d").date() if item.get("date") else None,
-                exchange=item.get("exchange"),
-                price_range=item.get("price"),
-                shares=item.get("numberOfShares"),
-                expected_amount=item.get("totalSharesValue"),
-                data=item
-            )
-            db.add(ipo)
-        db.commit()
-
-        cache_data(cache_key, items)
-
-        # publish summary to Redis
-        publish_message("ipo_calendar", {
-            "from": _from,
-            "to": to,
-            "count": len(items)
-        })
-
-        return items
+        start, end = _parse_range(_from, to)
+        if wants_ndjson(request, stream):
+            return ndjson_response(stream_range_ndjson("ipo_calendar_", start, end, _load_ipo_calendar, db))
+        return json_response(read_range_json("ipo_calendar_", start, end, _load_ipo_calendar, db))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,43 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from db.database import get_db
-from app.models import CompanyProfile
-from app.utils import fetch_finnhub_data, cache_data, get_cached_data
-from utils.redis_producer import publish_message
+from db.async_database import AsyncSession, get_async_db, async_db_enabled
+from app.utils import fetch_finnhub_data, fetch_finnhub_data_async, cache_data, cache_data_async
+from app.rate_limiter import RateLimitExceeded
+from app.read_through import read_through_response, read_through_response_async
+from app.write_behind import persist, persist_async
+from utils.redis_producer import publish_message, publish_message_async
 
 router = APIRouter()
 
-@router.get("/company")
-def get_company_profile(symbol: str = Query(..., description="Company symbol"), db: Session = Depends(get_db)):
-    cache_key = f"company_profile_{symbol}"
-    cached = get_cached_data(cache_key)
-    if cached:
-        return cached
-
-    try:
-        data = fetch_finnhub_data("stock/profile2", {"symbol": symbol})
-        company = CompanyProfile(
-            symbol=symbol,
-            name=data.get("name"),
-            exchange=data.get("exchange"),
-            industry=data.get("finnhubIndustry"),
-            logo=data.get("logo"),
-            data=data
-        )
-        db.add(company)
-        db.commit()
-        cache_data(cache_key, data)
-        
-        publish_message("company_profiles", {
-            "id": company.id,
-            "symbol": company.symbol,
-            "name": company.name,
-            "exchange": company.exchange,
-            "industry": company.industry,
-            "logo": company.logo,
-            "data": company.data
-        })
-                
-        return data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def _profile_row(symbol: str, data: dict):
+    return {
+        "symbol": symbol,
+        "name": data.get("name"),
+        "exchange": data.get("exchange"),
+        "industry": data.get("finnhubIndustry"),
+        "logo": data.get("logo"),
+        "data": data
+    }
+
+def _load_company_profile(symbol: str, cache_key: str, db: Session):
+    data = fetch_finnhub_data("stock/profile2", {"symbol": symbol})
+    row = _profile_row(symbol, data)
+    persist("company_profiles", [row], db)
+    cache_data(cache_key, data)
+
+    publish_message("company_profiles", row)
+
+    return data
+
+async def _load_company_profile_async(symbol: str, cache_key: str, db):
+    data = await fetch_finnhub_data_async("stock/profile2", {"symbol": symbol})
+    row = _profile_row(symbol, data)
+    await persist_async("company_profiles", [row], db)
+    await cache_data_async(cache_key, data)
+
+    await publish_message_async("company_profiles", row)
+
+    return data
+
+if async_db_enabled("market.company"):
+    @router.get("/company")
+    async def get_company_profile(request: Request, symbol: str = Query(..., description="Company symbol"), db: AsyncSession = Depends(get_async_db)):
+        cache_key = f"company_profile_{symbol}"
+        try:
+            return await read_through_response_async(
+                cache_key, lambda session: _load_company_profile_async(symbol, cache_key, session),
+                lambda session: _load_company_profile(symbol, cache_key, session), db,
+                request.headers.get("accept-encoding", "")
+            )
+        except RateLimitExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+else:
+    @router.get("/company")
+    def get_company_profile(request: Request, symbol: str = Query(..., description="Company symbol"), db: Session = Depends(get_db)):
+        cache_key = f"company_profile_{symbol}"
+        try:
+            return read_through_response(
+                cache_key, lambda session: _load_company_profile(symbol, cache_key, session), db,
+                request.headers.get("accept-encoding", "")
+            )
+        except RateLimitExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
@@ -1,52 +1,49 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlalchemy.orm import Session
 from db.database import get_db
-from app.models import Country
-from app.utils import fetch_finnhub_data, cache_data, get_cached_data
+from app.utils import fetch_finnhub_data, cache_data
+from app.rate_limiter import RateLimitExceeded
+from app.read_through import read_through_response
+from app.write_behind import persist
 from utils.redis_producer import publish_message
-from datetime import datetime
 
 router = APIRouter()
 
 # ---------------- COUNTRIES ----------------
-@router.get("/countries")
-def get_countries(db: Session = Depends(get_db)):
-    cache_key = "countries"
-    cached = get_cached_data(cache_key)
-    if cached:
-        return cached
+def _country_row(item: dict):
+    name = item.get("country") or "Unknown"
+    currency = item.get("currency") or "Unknown"
+    timezone = item.get("timezone")
+    return {
+        "code": item.get("code2"),          # natural key; rows without one are skipped
+        "name": name[:100],                 # keep name length safe
+        "currency": currency[:100],         # long currency names allowed
+        "timezone": timezone[:50] if timezone else None,
+        "data": item
+    }
+
+
+def _load_countries(cache_key: str, db: Session):
+    data = fetch_finnhub_data("country", {}, lane="bulk")
+    result = persist("countries", [_country_row(item) for item in data], db)
+
+    cache_data(cache_key, data)
+
+    publish_message("countries", {"count": len(data), **result})
 
+    return data
+
+
+@router.get("/countries")
+def get_countries(request: Request, db: Session = Depends(get_db)):
+    # not "countries": that name is the Redis stream published below
+    cache_key = "country_list"
     try:
-        data = fetch_finnhub_data("country", {})
-        for item in data:
-            
-            code = item.get("code2") or "N/A"
-            name = item.get("country") or "Unknown"
-            currency = item.get("currency") or "Unknown"
-            timezone = item.get("timezone")
-            
-            country = Country(
-                # code=item.get("code2"),      # maps to 'code' column
-                # name=item.get("country"), 
-                # currency=item.get("currency"),
-                # timezone=item.get("timezone"),
-                # data=item
-                
-                code=code,                  # no trimming
-                name=name[:100],             # keep name length safe
-                currency=currency[:100],     # long currency names allowed
-                timezone=timezone[:50] if timezone else None,
-                data=item
-            )
-            db.add(country)
-        db.commit()
-
-        cache_data(cache_key, data)
-
-        publish_message("countries", {"count": len(data)})
-
-        return data
+        return read_through_response(
+            cache_key, lambda session: _load_countries(cache_key, session), db,
+            request.headers.get("accept-encoding", "")
+        )
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
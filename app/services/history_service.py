@@ -0,0 +1,243 @@
+import os
+import json
+import base64
+from datetime import date, datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Date, DateTime
+from db.database import get_db
+from db.async_database import AsyncSession, get_async_db, async_db_enabled
+from app.models import StockQuote, MarketNews, EarningsCalendar, IPOCalendar, Country
+
+router = APIRouter()
+
+HISTORY_DEFAULT_PAGE = int(os.getenv("HISTORY_DEFAULT_PAGE", 100))
+HISTORY_MAX_PAGE = int(os.getenv("HISTORY_MAX_PAGE", 1000))
+
+
+# ---------------- KEYSET PAGINATION ----------------
+def _encode_cursor(values: list):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str, columns: list):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            raise ValueError
+        decoded = []
+        for column, value in zip(columns, values):
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(columns: list, values: list, descending: bool):
+    """Rows strictly past `values` in (columns) order, written as OR-ed prefixes so each branch is an index range."""
+    branches = []
+    for i, column in enumerate(columns):
+        bound = column < values[i] if descending else column > values[i]
+        branches.append(and_(*[columns[j] == values[j] for j in range(i)], bound))
+    return or_(*branches)
+
+
+def _projection(model, fields: str, default_exclude=("data",)):
+    allowed = {c.name: c for c in model.__table__.columns}
+    if not fields:
+        return [c for name, c in allowed.items() if name not in default_exclude]
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}; allowed: {', '.join(allowed)}")
+    return [allowed[f] for f in requested]
+
+
+def _page_statement(model, filters: list, order: list, fields: str, cursor: str, limit: int, descending: bool):
+    """WHERE filters AND past-cursor ORDER BY order LIMIT limit + 1, never OFFSET.
+
+    The order columns are always selected (the next cursor is built from them) and the
+    last one must be unique, normally the primary key.
+    """
+    order_columns = [getattr(model, name) for name in order]
+    columns = _projection(model, fields)
+    selected = columns + [c for c in order_columns if c.name not in {col.name for col in columns}]
+
+    conditions = list(filters)
+    if cursor:
+        conditions.append(_after(order_columns, _decode_cursor(cursor, order_columns), descending))
+    stmt = (
+        select(*selected)
+        .where(*conditions)
+        .order_by(*[c.desc() if descending else c.asc() for c in order_columns])
+        .limit(limit + 1)
+    )
+    return stmt, order_columns
+
+
+def _page_result(rows: list, order_columns: list, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        next_cursor = _encode_cursor([last[c.name] for c in order_columns])
+    return {"items": [dict(row._mapping) for row in rows], "next_cursor": next_cursor}
+
+
+def _page(db: Session, model, filters: list, order: list, fields: str, cursor: str, limit: int, descending: bool):
+    """One keyset page on a sync Session."""
+    stmt, order_columns = _page_statement(model, filters, order, fields, cursor, limit, descending)
+    return _page_result(db.execute(stmt).all(), order_columns, limit)
+
+
+async def _page_async(db, model, filters: list, order: list, fields: str, cursor: str, limit: int, descending: bool):
+    """One keyset page on an AsyncSession; the event loop is free while MySQL works."""
+    stmt, order_columns = _page_statement(model, filters, order, fields, cursor, limit, descending)
+    return _page_result((await db.execute(stmt)).all(), order_columns, limit)
+
+
+def _parse_datetime(value: str):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime: {value}")
+
+
+def _parse_date(value: str):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
+
+def _run(query):
+    try:
+        return query()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _run_async(query):
+    try:
+        return await query
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _endpoint(path: str, name: str, page_spec):
+    """GET `path` returning the keyset page described by the page_spec dependency.
+
+    Served on the async engine when ASYNC_DB_ENDPOINTS includes history.{name}, otherwise
+    on the sync Session in the threadpool.
+    """
+    if async_db_enabled(f"history.{name}"):
+        async def endpoint(spec: dict = Depends(page_spec), db: AsyncSession = Depends(get_async_db)):
+            return await _run_async(_page_async(db, **spec))
+    else:
+        def endpoint(spec: dict = Depends(page_spec), db: Session = Depends(get_db)):
+            return _run(lambda: _page(db, **spec))
+    endpoint.__name__ = f"get_{page_spec.__name__}"
+    endpoint.__doc__ = page_spec.__doc__
+    router.get(path)(endpoint)
+
+
+# ---------------- ENDPOINTS ----------------
+# Each spec dependency parses the query into a page description; it does no I/O.
+async def quote_history(
+    symbol: str = Query(..., description="Stock symbol"),
+    start: str = Query(None, description="ISO datetime (UTC), inclusive"),
+    end: str = Query(None, description="ISO datetime (UTC), exclusive"),
+    fields: str = Query(None, description="Comma-separated columns"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(HISTORY_DEFAULT_PAGE, ge=1, le=HISTORY_MAX_PAGE),
+    descending: bool = Query(True, description="Newest first"),
+):
+    """Stored quotes for one symbol by fetch time."""
+    filters = [StockQuote.symbol == symbol]
+    if start:
+        filters.append(StockQuote.fetched_at >= _parse_datetime(start))
+    if end:
+        filters.append(StockQuote.fetched_at < _parse_datetime(end))
+    return dict(model=StockQuote, filters=filters, order=["fetched_at", "id"], fields=fields, cursor=cursor, limit=limit, descending=descending)
+
+
+async def news_history(
+    symbol: str = Query(..., description="Stock symbol"),
+    start: int = Query(None, description="UNIX timestamp, inclusive"),
+    end: int = Query(None, description="UNIX timestamp, exclusive"),
+    fields: str = Query(None, description="Comma-separated columns"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(HISTORY_DEFAULT_PAGE, ge=1, le=HISTORY_MAX_PAGE),
+    descending: bool = Query(True, description="Newest first"),
+):
+    """Stored news for one symbol by publication time."""
+    filters = [MarketNews.symbol == symbol, MarketNews.datetime.isnot(None)]
+    if start is not None:
+        filters.append(MarketNews.datetime >= start)
+    if end is not None:
+        filters.append(MarketNews.datetime < end)
+    return dict(model=MarketNews, filters=filters, order=["datetime", "id"], fields=fields, cursor=cursor, limit=limit, descending=descending)
+
+
+def _calendar_spec(model, symbol, _from, to, fields, cursor, limit, descending):
+    # keyset comparisons cannot step over NULL dates
+    filters = [model.date.isnot(None)]
+    if symbol:
+        filters.append(model.symbol == symbol)
+    if _from:
+        filters.append(model.date >= _parse_date(_from))
+    if to:
+        filters.append(model.date <= _parse_date(to))
+    return dict(model=model, filters=filters, order=["date", "id"], fields=fields, cursor=cursor, limit=limit, descending=descending)
+
+
+async def earnings_history(
+    symbol: str = Query(None, description="Stock symbol (all symbols if omitted)"),
+    _from: str = Query(None, description="Start date, inclusive"),
+    to: str = Query(None, description="End date, inclusive"),
+    fields: str = Query(None, description="Comma-separated columns"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(HISTORY_DEFAULT_PAGE, ge=1, le=HISTORY_MAX_PAGE),
+    descending: bool = Query(False, description="Latest date first"),
+):
+    """Stored earnings calendar rows by date."""
+    return _calendar_spec(EarningsCalendar, symbol, _from, to, fields, cursor, limit, descending)
+
+
+async def ipo_history(
+    symbol: str = Query(None, description="Stock symbol (all symbols if omitted)"),
+    _from: str = Query(None, description="Start date, inclusive"),
+    to: str = Query(None, description="End date, inclusive"),
+    fields: str = Query(None, description="Comma-separated columns"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(HISTORY_DEFAULT_PAGE, ge=1, le=HISTORY_MAX_PAGE),
+    descending: bool = Query(False, description="Latest date first"),
+):
+    """Stored IPO calendar rows by date."""
+    return _calendar_spec(IPOCalendar, symbol, _from, to, fields, cursor, limit, descending)
+
+
+async def country_history(
+    fields: str = Query(None, description="Comma-separated columns"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(HISTORY_DEFAULT_PAGE, ge=1, le=HISTORY_MAX_PAGE),
+):
+    """Stored countries by code."""
+    return dict(model=Country, filters=[], order=["code"], fields=fields, cursor=cursor, limit=limit, descending=False)
+
+
+_endpoint("/quotes", "quotes", quote_history)
+_endpoint("/news", "news", news_history)
+_endpoint("/earnings", "earnings", earnings_history)
+_endpoint("/ipos", "ipos", ipo_history)
+_endpoint("/countries", "countries", country_history)
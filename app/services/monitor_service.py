@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from app.rate_limiter import limiter_stats
+from app.local_cache import cache_stats
+from app.utils import codec_stats
+from app.write_behind import write_behind_stats
+from utils.redis_consumer import stream_stats
+from app.services.stock_service import quote_hub
+from app.access_stats import prefetch_stats
+
+router = APIRouter()
+
+@router.get("/rate-limit")
+def get_rate_limit_status():
+    return limiter_stats()
+
+@router.get("/cache")
+def get_cache_status():
+    return {**cache_stats(), "codec": codec_stats()}
+
+@router.get("/write-behind")
+def get_write_behind_status():
+    return write_behind_stats()
+
+@router.get("/streams")
+def get_stream_status(group: str = None):
+    return stream_stats(group=group) if group else stream_stats()
+
+@router.get("/quote-stream")
+def get_quote_stream_status():
+    return quote_hub.stats()
+
+@router.get("/prefetch")
+def get_prefetch_status():
+    return prefetch_stats()
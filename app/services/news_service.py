@@ -1,42 +1,175 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+import os
+import heapq
+import hashlib
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 from db.database import get_db
 from app.models import MarketNews
-from app.utils import fetch_finnhub_data, cache_data, get_cached_data
-from utils.redis_producer import publish_message
+from app.utils import fetch_finnhub_data, cache_data, redis_client, dumps
+from app.rate_limiter import RateLimitExceeded
+from app.read_through import read_through, read_through_response, json_response, ndjson_response, ndjson_lines, wants_ndjson
+from app.write_behind import persist
+from utils.redis_producer import publish_messages
 
 router = APIRouter()
 
+# Window for a symbol with no stored articles yet, and for an explicit deep refetch
+NEWS_LOOKBACK_DAYS = int(os.getenv("NEWS_LOOKBACK_DAYS", 30))
+NEWS_DEEP_LOOKBACK_DAYS = int(os.getenv("NEWS_DEEP_LOOKBACK_DAYS", 365))
+# Articles returned (and cached) per symbol, newest first
+NEWS_MAX_ARTICLES = int(os.getenv("NEWS_MAX_ARTICLES", 100))
+# Days per upstream call when a deep refetch is streamed
+NEWS_STREAM_WINDOW_DAYS = int(os.getenv("NEWS_STREAM_WINDOW_DAYS", 30))
+
+# symbol -> unix time of the newest article ingested
+WATERMARK_KEY = "news_watermark"
+
+ARTICLE_FIELDS = ("symbol", "headline", "source", "url", "datetime")
+
+
+def _news_row(symbol: str, item: dict):
+    url = item.get("url")
+    return {
+        "symbol": symbol,
+        "headline": item.get("headline"),
+        "source": item.get("source"),
+        "url": url,
+        "url_hash": hashlib.sha1(url.encode()).hexdigest() if url else None,
+        "datetime": item.get("datetime"),
+        "data": item
+    }
+
+
+def _article(row):
+    # rows stored before the raw item was kept only have the columns
+    return row["data"] or {f: row[f] for f in ARTICLE_FIELDS}
+
+
+def _watermark(symbol: str, db: Session):
+    value = redis_client.hget(WATERMARK_KEY, symbol)
+    if value is not None:
+        return int(value)
+    # Redis lost it (or first run after deploy): the (symbol, datetime) index answers this directly
+    return db.execute(select(func.max(MarketNews.datetime)).where(MarketNews.symbol == symbol)).scalar()
+
+
+def _known_hashes(db: Session, symbol: str, hashes: list):
+    if not hashes:
+        return set()
+    return set(db.execute(
+        select(MarketNews.url_hash).where(MarketNews.symbol == symbol, MarketNews.url_hash.in_(hashes))
+    ).scalars())
+
+
+def _recent_articles(symbol: str, db: Session, fresh: list):
+    """Newest NEWS_MAX_ARTICLES for symbol: the rows just fetched (new ones possibly still queued for write-behind) plus stored ones."""
+    stored = db.execute(
+        select(*[getattr(MarketNews, f) for f in ARTICLE_FIELDS], MarketNews.url_hash, MarketNews.data)
+        .where(MarketNews.symbol == symbol, MarketNews.datetime.isnot(None))
+        .order_by(MarketNews.datetime.desc(), MarketNews.id.desc())
+        .limit(NEWS_MAX_ARTICLES)
+    ).all()
+    articles = {row["url_hash"]: row for row in fresh}
+    for row in stored:
+        articles.setdefault(row.url_hash, dict(row._mapping))
+    ordered = sorted(articles.values(), key=lambda row: row["datetime"] or 0, reverse=True)
+    return [_article(row) for row in ordered[:NEWS_MAX_ARTICLES]]
+
+
+def _ingest(symbol: str, start, end, watermark, db: Session):
+    """Fetch [start, end], persist and publish articles not stored for symbol yet; returns url_hash -> row for the window."""
+    data = fetch_finnhub_data("company-news", {"symbol": symbol, "from": start.isoformat(), "to": end.isoformat()})
+    rows = {}
+    for item in data or []:
+        row = _news_row(symbol, item)
+        if row["url_hash"] and (watermark is None or (row["datetime"] or 0) >= watermark):
+            rows[row["url_hash"]] = row
+
+    known = _known_hashes(db, symbol, list(rows))
+    new_rows = [row for url_hash, row in rows.items() if url_hash not in known]
+    persist("market_news", new_rows, db)
+
+    # each article is published once, when it is first ingested
+    publish_messages("market_news", [{f: row[f] for f in ARTICLE_FIELDS} for row in new_rows])
+    return rows, new_rows
+
+
+def _advance_watermark(symbol: str, watermark, rows):
+    newest = max((row["datetime"] or 0 for row in rows), default=None)
+    if newest and (watermark is None or newest > watermark):
+        redis_client.hset(WATERMARK_KEY, symbol, newest)
+
+
+def _load_market_news(symbol: str, cache_key: str, db: Session, deep: bool = False):
+    today = datetime.now(timezone.utc).date()
+    stored_watermark = _watermark(symbol, db)
+    watermark = None if deep else stored_watermark
+    if watermark is not None:
+        # whole days: the watermark day is refetched and deduplicated below
+        start = datetime.fromtimestamp(watermark, timezone.utc).date()
+    else:
+        start = today - timedelta(days=NEWS_DEEP_LOOKBACK_DAYS if deep else NEWS_LOOKBACK_DAYS)
+
+    rows, new_rows = _ingest(symbol, start, today, watermark, db)
+    # a deep refetch reads past the watermark but must not move it back
+    _advance_watermark(symbol, stored_watermark, rows.values())
+
+    articles = _recent_articles(symbol, db, list(rows.values()))
+    cache_data(cache_key, articles)
+    return articles
+
+
+def _published(row: dict):
+    return row["datetime"] or 0
+
+
+def _stream_market_news(symbol: str, cache_key: str, db: Session):
+    """Deep refetch as NDJSON lines: NEWS_STREAM_WINDOW_DAYS per upstream call, newest window first.
+
+    Every article in the lookback is sent as its window is normalized; only the newest
+    NEWS_MAX_ARTICLES rows are kept for the cache entry written at the end.
+    """
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=NEWS_DEEP_LOOKBACK_DAYS)
+    recent = []
+    last = today
+    while last >= start:
+        first = max(start, last - timedelta(days=NEWS_STREAM_WINDOW_DAYS - 1))
+        rows, _ = _ingest(symbol, first, last, None, db)
+        if last == today:
+            _advance_watermark(symbol, _watermark(symbol, db), rows.values())
+        recent = heapq.nlargest(NEWS_MAX_ARTICLES, recent + list(rows.values()), key=_published)
+        yield from ndjson_lines(_article(row) for row in sorted(rows.values(), key=_published, reverse=True))
+        last = first - timedelta(days=1)
+    cache_data(cache_key, _recent_articles(symbol, db, recent))
+
+
 @router.get("/news")
-def get_market_news(symbol: str = Query(...), db: Session = Depends(get_db)):
+def get_market_news(
+    request: Request,
+    symbol: str = Query(...),
+    refetch: bool = Query(False, description=f"Re-read the last {NEWS_DEEP_LOOKBACK_DAYS} days instead of only what is new"),
+    stream: bool = Query(False, description="Send NDJSON, one article per line; with refetch, every article in the lookback"),
+    db: Session = Depends(get_db)
+):
     cache_key = f"market_news_{symbol}"
-    cached = get_cached_data(cache_key)
-    if cached:
-        return cached
-
     try:
-        data = fetch_finnhub_data("company-news", {"symbol": symbol, "from": "2025-01-01", "to": "2025-12-31"})
-        for item in data:
-            news = MarketNews(
-                symbol=symbol,
-                headline=item.get("headline"),
-                source=item.get("source"),
-                url=item.get("url"),
-                datetime=item.get("datetime")
-            )
-            db.add(news)
-        db.commit()
-        cache_data(cache_key, data)
-        
-        publish_message("market_news", {
-                "id": news.id,
-                "symbol": news.symbol,
-                "headline": news.headline,
-                "source": news.source,
-                "url": news.url,
-                "datetime": news.datetime
-            })
-        
-        return data
+        if wants_ndjson(request, stream):
+            if refetch:
+                return ndjson_response(_stream_market_news(symbol, cache_key, db))
+            # at most NEWS_MAX_ARTICLES: the cached list is small enough to hold
+            return ndjson_response(ndjson_lines(read_through(
+                cache_key, lambda session: _load_market_news(symbol, cache_key, session), db
+            )))
+        if refetch:
+            return json_response(dumps(_load_market_news(symbol, cache_key, db, deep=True)))
+        return read_through_response(
+            cache_key, lambda session: _load_market_news(symbol, cache_key, session), db,
+            request.headers.get("accept-encoding", "")
+        )
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,41 +1,218 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import os
+import time
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
-from db.database import get_db
-from app.models import StockQuote
-from app.utils import fetch_finnhub_data, cache_data, get_cached_data
-from utils.redis_producer import publish_message
+from db.database import get_db, SessionLocal
+from db.async_database import AsyncSession, get_async_db, async_db_enabled
+from app.models import utcnow
+from app.utils import fetch_finnhub_data, fetch_finnhub_data_async, fetch_finnhub_many, cache_data, cache_data_async, cache_many, get_many_cached_entries
+from app.rate_limiter import RateLimitExceeded
+from app.read_through import read_through, read_through_response, read_through_response_async, schedule_refresh
+from app.singleflight import singleflight_many
+from app.access_stats import record_access
+from app.write_behind import persist, persist_async
+from app.quote_hub import QuoteHub, Subscriber
+from app.candle_store import get_candles
+from utils.redis_producer import publish_message, publish_message_async, publish_messages
 router = APIRouter()
 
-@router.get("/quote")
-def get_stock_quote(symbol: str = Query(..., description="Stock symbol"), db: Session = Depends(get_db)):
-    cache_key = f"stock_quote_{symbol}"
-    cached = get_cached_data(cache_key)
-    if cached:
-        return cached
+MAX_BATCH_SYMBOLS = int(os.getenv("MAX_BATCH_SYMBOLS", 500))
+
+
+def _quote_row(symbol: str, data: dict):
+    return {
+        "symbol": symbol,
+        "current_price": data.get("c"),
+        "high_price": data.get("h"),
+        "low_price": data.get("l"),
+        "open_price": data.get("o"),
+        "prev_close_price": data.get("pc"),
+        "fetched_at": utcnow()
+    }
+
+
+def _load_stock_quote(symbol: str, cache_key: str, db: Session):
+    data = fetch_finnhub_data("quote", {"symbol": symbol}, lane="interactive")
+    row = _quote_row(symbol, data)
+    persist("stock_quotes", [row], db)
+    cache_data(cache_key, data)
+
+    publish_message("stock_quotes", row)
+
+    return data
+
+
+def _load_stock_quotes(cache_keys: list, db: Session):
+    symbols = [key[len("stock_quote_"):] for key in cache_keys]
+    fetched = dict(zip(symbols, fetch_finnhub_many("quote", [{"symbol": symbol} for symbol in symbols], lane="interactive")))
+    rows = [_quote_row(symbol, data) for symbol, data in fetched.items()]
+
+    # one multi-row INSERT (or queued batch) instead of one flush per quote
+    persist("stock_quotes", rows, db)
+    cache_many({f"stock_quote_{symbol}": data for symbol, data in fetched.items()})
+
+    publish_messages("stock_quotes", rows)
+
+    return {f"stock_quote_{symbol}": data for symbol, data in fetched.items()}
+
+
+async def _load_stock_quote_async(symbol: str, cache_key: str, db):
+    data = await fetch_finnhub_data_async("quote", {"symbol": symbol}, lane="interactive")
+    row = _quote_row(symbol, data)
+    await persist_async("stock_quotes", [row], db)
+    await cache_data_async(cache_key, data)
+
+    await publish_message_async("stock_quotes", row)
+
+    return data
+
+
+if async_db_enabled("market.quote"):
+    @router.get("/quote")
+    async def get_stock_quote(request: Request, symbol: str = Query(..., description="Stock symbol"), db: AsyncSession = Depends(get_async_db)):
+        cache_key = f"stock_quote_{symbol}"
+        try:
+            return await read_through_response_async(
+                cache_key, lambda session: _load_stock_quote_async(symbol, cache_key, session),
+                lambda session: _load_stock_quote(symbol, cache_key, session), db,
+                request.headers.get("accept-encoding", "")
+            )
+        except RateLimitExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+else:
+    @router.get("/quote")
+    def get_stock_quote(request: Request, symbol: str = Query(..., description="Stock symbol"), db: Session = Depends(get_db)):
+        cache_key = f"stock_quote_{symbol}"
+        try:
+            return read_through_response(
+                cache_key, lambda session: _load_stock_quote(symbol, cache_key, session), db,
+                request.headers.get("accept-encoding", "")
+            )
+        except RateLimitExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/quotes")
+def get_stock_quotes(response: Response, symbols: str = Query(..., description="Comma-separated stock symbols"), db: Session = Depends(get_db)):
+    symbol_list = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(symbol_list) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SYMBOLS} symbols per request")
+
+    # one MGET for every cache hit; stale hits are served and refreshed in the background
+    now = time.time()
+    keys = [f"stock_quote_{symbol}" for symbol in symbol_list]
+    record_access(keys)
+    cached = get_many_cached_entries(keys)
+    quotes = {}
+    for symbol, entry in zip(symbol_list, cached):
+        if entry is None:
+            continue
+        quotes[symbol], soft_deadline = entry
+        if soft_deadline <= now:
+            cache_key = f"stock_quote_{symbol}"
+            schedule_refresh(cache_key, lambda session, symbol=symbol, cache_key=cache_key: _load_stock_quote(symbol, cache_key, session))
+    misses = [f"stock_quote_{symbol}" for symbol in symbol_list if symbol not in quotes]
+    if not misses:
+        return quotes
 
     try:
-        data = fetch_finnhub_data("quote", {"symbol": symbol})
-        stock = StockQuote(
-            symbol=symbol,
-            current_price=data.get("c"),
-            high_price=data.get("h"),
-            low_price=data.get("l"),
-            open_price=data.get("o"),
-            prev_close_price=data.get("pc")
-        )
-        db.add(stock)
-        db.commit()
-        cache_data(cache_key, data)
-        
-        publish_message("stock_quotes", {
-        "symbol": stock.symbol,
-        "current_price": stock.current_price,
-        "high_price": stock.high_price,
-        "low_price": stock.low_price,
-        "open_price": stock.open_price,
-        "prev_close_price": stock.prev_close_price
-    })
-        
-        return data
+        loaded = singleflight_many(misses, lambda keys: _load_stock_quotes(keys, db))
+        quotes.update({key[len("stock_quote_"):]: data for key, data in loaded.items() if data is not None})
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    # a loader (ours or a peer's flight) may come back without some symbols; name them instead of failing the batch
+    missing = [symbol for symbol in symbol_list if symbol not in quotes]
+    if missing:
+        response.headers["X-Missing-Symbols"] = ",".join(missing)
+    return {symbol: quotes[symbol] for symbol in symbol_list if symbol in quotes}
+
+
+
+@router.get("/candles")
+def get_stock_candles(
+    symbol: str = Query(..., description="Stock symbol, or EXCHANGE:PAIR for crypto"),
+    resolution: str = Query("D", description="1, 5, 15, 30, 60, D, W or M"),
+    from_: int = Query(..., alias="from", description="UNIX timestamp"),
+    to: int = Query(..., description="UNIX timestamp")
+):
+    try:
+        return get_candles(symbol, resolution, from_, to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------- LIVE QUOTE STREAM ----------------
+def _read_quote(symbol: str):
+    cache_key = f"stock_quote_{symbol}"
+    db = SessionLocal()
+    try:
+        # hub polls are not demand; subscriptions are counted once when they are made
+        return read_through(cache_key, lambda session: _load_stock_quote(symbol, cache_key, session), db, count_access=False)
+    finally:
+        db.close()
+
+
+quote_hub = QuoteHub(_read_quote)
+
+
+def _parse_symbols(symbols):
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    return [s.strip() for s in symbols if isinstance(s, str) and s.strip()]
+
+
+def _subscribe(subscriber: Subscriber, symbols: list):
+    record_access([f"stock_quote_{symbol}" for symbol in symbols if symbol not in subscriber.symbols])
+    quote_hub.subscribe(subscriber, symbols)
+
+
+async def _send_updates(websocket: WebSocket, subscriber: Subscriber):
+    while True:
+        batch = await subscriber.next_batch()
+        await websocket.send_json({"type": "quotes", "data": batch})
+
+
+@router.websocket("/quotes/stream")
+async def stream_stock_quotes(websocket: WebSocket, symbols: str = ""):
+    """Push quote updates for a symbol set.
+
+    Connect with ?symbols=AAPL,MSFT and/or send {"action": "subscribe" | "unsubscribe", "symbols": [...]}.
+    """
+    await websocket.accept()
+    subscriber = Subscriber()
+    sender = asyncio.create_task(_send_updates(websocket, subscriber))
+    try:
+        _subscribe(subscriber, _parse_symbols(symbols))
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict) or not isinstance(message.get("symbols", []), (str, list)):
+                await websocket.send_json({"type": "error", "detail": 'Expected {"action": ..., "symbols": [...]}'})
+                continue
+            action = message.get("action")
+            requested = _parse_symbols(message.get("symbols", []))
+            if action == "subscribe":
+                _subscribe(subscriber, requested)
+            elif action == "unsubscribe":
+                quote_hub.unsubscribe(subscriber, requested)
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown action: {action}"})
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        quote_hub.unsubscribe(subscriber)
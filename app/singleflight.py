@@ -0,0 +1,204 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import Future
+from app.utils import redis_client, get_many_cached_data, get_many_cached_data_async
+from app.resources import async_redis_connection
+
+# Leader lock lifetime; must outlast the slowest fetch + persist, including rate-limit waits
+SINGLEFLIGHT_LOCK_TTL = float(os.getenv("SINGLEFLIGHT_LOCK_TTL", 60))
+# How long a follower waits for another worker's result before loading it itself
+SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", 30))
+
+LOCK_KEY = "singleflight:{key}"
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_release = redis_client.register_script(_RELEASE_SCRIPT)
+
+# in-process followers wait on the leader's future
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _claim(keys: list):
+    """Split keys into the ones this thread leads and the futures of in-flight leaders."""
+    led, waiting = [], {}
+    with _inflight_lock:
+        for key in keys:
+            future = _inflight.get(key)
+            if future is None:
+                _inflight[key] = Future()
+                led.append(key)
+            else:
+                waiting[key] = future
+    return led, waiting
+
+
+def _settle(keys: list, results: dict = None, error: BaseException = None):
+    with _inflight_lock:
+        futures = [_inflight.pop(key) for key in keys]
+    for key, future in zip(keys, futures):
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(results.get(key))
+
+
+def _lock_many(keys: list, token: str):
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.set(LOCK_KEY.format(key=key), token, nx=True, px=int(SINGLEFLIGHT_LOCK_TTL * 1000))
+    return [key for key, locked in zip(keys, pipe.execute()) if locked]
+
+
+def _unlock_many(keys: list, token: str):
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        _release(keys=[LOCK_KEY.format(key=key)], args=[token], client=pipe)
+    pipe.execute()
+
+
+def _load_cluster(keys: list, fn):
+    """Load keys led by this process, coordinating with other workers through Redis locks."""
+    token = uuid.uuid4().hex
+    results = {}
+    pending = list(keys)
+    deadline = time.monotonic() + SINGLEFLIGHT_WAIT_TIMEOUT
+    delay = 0.01
+    while pending:
+        locked = _lock_many(pending, token)
+        if locked:
+            try:
+                # another worker may have filled the cache between our miss and the lock
+                cached = get_many_cached_data(locked)
+                results.update({key: value for key, value in zip(locked, cached) if value is not None})
+                missing = [key for key in locked if key not in results]
+                if missing:
+                    results.update(fn(missing))
+            finally:
+                _unlock_many(locked, token)
+
+        # keys locked elsewhere: wait for their leader to write the cache
+        others = [key for key in pending if key not in locked]
+        if others:
+            cached = get_many_cached_data(others)
+            results.update({key: value for key, value in zip(others, cached) if value is not None})
+        pending = [key for key in others if key not in results]
+        if not pending:
+            break
+        if time.monotonic() > deadline:
+            results.update(fn(pending))
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+    return results
+
+
+def singleflight_many(keys: list, fn):
+    """Run fn(missing_keys) -> {key: result} so each key is loaded by one caller across threads and workers.
+
+    Followers get the leader's result: in-process through a future, across workers by
+    waiting for the leader to write the cache key. Keys are cache keys by convention.
+    """
+    led, waiting = _claim(keys)
+    results = {}
+    if led:
+        try:
+            results = _load_cluster(led, fn)
+        except BaseException as e:
+            _settle(led, error=e)
+            raise
+        _settle(led, results)
+    for key, future in waiting.items():
+        results[key] = future.result(timeout=SINGLEFLIGHT_WAIT_TIMEOUT)
+    return results
+
+
+def singleflight(key: str, fn):
+    """Single-key form of singleflight_many; fn() returns the loaded value for `key`."""
+    return singleflight_many([key], lambda missing: {key: fn()})[key]
+
+
+# ---------------- ASYNC ----------------
+# Same in-process futures and Redis locks as above, so async and threaded callers coalesce with each other.
+async def _lock_many_async(client, keys: list, token: str):
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.set(LOCK_KEY.format(key=key), token, nx=True, px=int(SINGLEFLIGHT_LOCK_TTL * 1000))
+    return [key for key, locked in zip(keys, await pipe.execute()) if locked]
+
+
+async def _unlock_many_async(client, keys: list, token: str):
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.eval(_RELEASE_SCRIPT, 1, LOCK_KEY.format(key=key), token)
+    await pipe.execute()
+
+
+async def _load_cluster_async(keys: list, fn):
+    client = async_redis_connection()
+    token = uuid.uuid4().hex
+    results = {}
+    pending = list(keys)
+    deadline = time.monotonic() + SINGLEFLIGHT_WAIT_TIMEOUT
+    delay = 0.01
+    while pending:
+        locked = await _lock_many_async(client, pending, token)
+        if locked:
+            try:
+                cached = await get_many_cached_data_async(locked)
+                results.update({key: value for key, value in zip(locked, cached) if value is not None})
+                missing = [key for key in locked if key not in results]
+                if missing:
+                    results.update(await fn(missing))
+            finally:
+                await _unlock_many_async(client, locked, token)
+
+        others = [key for key in pending if key not in locked]
+        if others:
+            cached = await get_many_cached_data_async(others)
+            results.update({key: value for key, value in zip(others, cached) if value is not None})
+        pending = [key for key in others if key not in results]
+        if not pending:
+            break
+        if time.monotonic() > deadline:
+            results.update(await fn(pending))
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.2)
+    return results
+
+
+async def singleflight_many_async(keys: list, fn):
+    """singleflight_many for async routers; fn(missing_keys) is a coroutine returning {key: result}."""
+    led, waiting = _claim(keys)
+    results = {}
+    if led:
+        try:
+            results = await _load_cluster_async(led, fn)
+        except asyncio.CancelledError:
+            # this request went away; its followers must not see the cancellation as their own
+            _settle(led, error=RuntimeError("single-flight leader was cancelled"))
+            raise
+        except BaseException as e:
+            _settle(led, error=e)
+            raise
+        _settle(led, results)
+    for key, future in waiting.items():
+        # shielded: a follower timing out or going away must not cancel the leader's shared future
+        results[key] = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), SINGLEFLIGHT_WAIT_TIMEOUT)
+    return results
+
+
+async def singleflight_async(key: str, fn):
+    """Single-key form of singleflight_many_async; fn() is a coroutine returning the value for `key`."""
+    async def load(missing):
+        return {key: await fn()}
+    return (await singleflight_many_async([key], load))[key]
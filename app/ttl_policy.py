@@ -0,0 +1,97 @@
+import os
+import re
+import json
+from dataclasses import dataclass, replace
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo
+
+MARKET_TIMEZONE = ZoneInfo(os.getenv("MARKET_TIMEZONE", "America/New_York"))
+MARKET_OPEN = time.fromisoformat(os.getenv("MARKET_OPEN", "09:30"))
+MARKET_CLOSE = time.fromisoformat(os.getenv("MARKET_CLOSE", "16:00"))
+MARKET_HOLIDAYS = {date.fromisoformat(d) for d in os.getenv("MARKET_HOLIDAYS", "").split(",") if d.strip()}
+
+DEFAULT_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 300))
+IMMUTABLE_TTL = int(os.getenv("CACHE_IMMUTABLE_TTL", 30 * 86400))
+
+DAY = 86400
+
+
+@dataclass(frozen=True)
+class TTLRule:
+    prefix: str
+    open_ttl: int                       # fresh seconds while the exchange is open
+    closed_ttl: int                     # fresh seconds overnight/weekends, never past the next open
+    stale_ttl: int = DEFAULT_STALE_TTL  # extra seconds the entry may be served stale
+    immutable_past_range: bool = False  # keys ending in _{from}_{to} or _{day} in the past never change
+    session_aware: bool = True          # False for reference data that does not move with the market
+
+
+# Most specific prefix first
+RULES = [
+    TTLRule("stock_quote_", open_ttl=5, closed_ttl=6 * 3600, stale_ttl=30),
+    TTLRule("company_profile_", open_ttl=DAY, closed_ttl=DAY, stale_ttl=DAY, session_aware=False),
+    TTLRule("market_news_", open_ttl=300, closed_ttl=3600, stale_ttl=600),
+    TTLRule("earnings_calendar_", open_ttl=3600, closed_ttl=6 * 3600, immutable_past_range=True),
+    TTLRule("ipo_calendar_", open_ttl=3600, closed_ttl=6 * 3600, immutable_past_range=True),
+    TTLRule("candle_segment_", open_ttl=60, closed_ttl=6 * 3600, stale_ttl=60),
+    TTLRule("country_list", open_ttl=7 * DAY, closed_ttl=7 * DAY, stale_ttl=7 * DAY, session_aware=False),
+]
+DEFAULT_RULE = TTLRule("", open_ttl=3600, closed_ttl=3600)
+
+# Per-key overrides, e.g. {"stock_quote_AAPL": {"open_ttl": 1}}
+TTL_OVERRIDES = json.loads(os.getenv("CACHE_TTL_OVERRIDES", "{}"))
+
+_DATE_RANGE = re.compile(r"_(\d{4}-\d{2}-\d{2})(?:_(\d{4}-\d{2}-\d{2}))?$")
+
+
+def market_now():
+    return datetime.now(MARKET_TIMEZONE)
+
+
+def _is_trading_day(day: date):
+    return day.weekday() < 5 and day not in MARKET_HOLIDAYS
+
+
+def market_is_open(now: datetime = None):
+    now = now or market_now()
+    return _is_trading_day(now.date()) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def seconds_until_open(now: datetime = None):
+    """Seconds until the next session opens (0 while it is open)."""
+    now = now or market_now()
+    if market_is_open(now):
+        return 0
+    day = now.date()
+    if now.time() >= MARKET_OPEN:
+        day += timedelta(days=1)
+    while not _is_trading_day(day):
+        day += timedelta(days=1)
+    opens = datetime.combine(day, MARKET_OPEN, tzinfo=MARKET_TIMEZONE)
+    return int((opens - now).total_seconds())
+
+
+def rule_for(key: str):
+    for rule in RULES:
+        if key.startswith(rule.prefix):
+            break
+    else:
+        rule = DEFAULT_RULE
+    override = TTL_OVERRIDES.get(key)
+    return replace(rule, **override) if override else rule
+
+
+def ttl_for(key: str, now: datetime = None):
+    """Return (expire, stale_ttl) in seconds for a cache key at `now`."""
+    now = now or market_now()
+    rule = rule_for(key)
+
+    if rule.immutable_past_range:
+        match = _DATE_RANGE.search(key)
+        if match and date.fromisoformat(match.group(2) or match.group(1)) < now.date():
+            return IMMUTABLE_TTL, IMMUTABLE_TTL
+
+    if not rule.session_aware or market_is_open(now):
+        return rule.open_ttl, rule.stale_ttl
+    # data refreshed overnight must not survive into the next session
+    return max(1, min(rule.closed_ttl, seconds_until_open(now))), rule.stale_ttl
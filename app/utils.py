@@ -1,31 +1,469 @@
 import os
 import json
-from redis import Redis
-from dotenv import load_dotenv
+import gzip
+import time
+import asyncio
+import struct
+import threading
+import contextvars
+from dataclasses import dataclass
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from app.local_cache import MISSING, INVALIDATION_CHANNEL, key_prefix, tier_for, is_tiered, record_l2, invalidation_message, start_invalidation_listener
+from app.ttl_policy import ttl_for
+from app.rate_limiter import RateLimitExceeded, acquire, acquire_async, try_acquire, drain_tokens, drain_tokens_async
+from app.metrics import timed, upstream_responses, upstream_retries, rate_limited
+from app.resources import redis_connection, async_redis_connection
 
-load_dotenv()
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib encoder
+    orjson = None
 
-# Redis setup
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
+try:
+    import msgpack
+except ImportError:  # optional, only needed for CACHE_CODEC=msgpack
+    msgpack = None
 
-redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+# Redis setup: clients on the process-wide pools (no connection is opened until first use)
+redis_client = redis_connection()
+# bytes in, bytes out: cache entries are binary and JSON payloads are served without decoding
+raw_redis_client = redis_connection(decode_responses=False)
 
-def cache_data(key: str, data: dict, expire: int = 3600):
-    redis_client.setex(key, expire, json.dumps(data))
+# ---------------- SERIALIZATION ----------------
+def dumps(data) -> bytes:
+    """Serialize to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data).encode()
+
+def loads(payload):
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+# ---------------- CACHE CODECS ----------------
+@dataclass(frozen=True)
+class Codec:
+    id: int            # stored in every entry header; never reuse an id
+    name: str
+    encode: Callable   # data -> bytes
+    decode: Callable   # bytes -> data
+    is_json: bool      # payload is JSON text that can be sent to clients as-is
+
+# High bit of the codec byte: payload is gzip-compressed (gzip so JSON payloads can go out as Content-Encoding: gzip)
+COMPRESSED = 0x80
+
+CODECS = {}
+
+def register_codec(codec: Codec):
+    if not 0 <= codec.id < COMPRESSED:
+        raise ValueError(f"Codec ids must be below {COMPRESSED}")
+    CODECS[codec.id] = codec
+    CODECS[codec.name] = codec
+
+def _msgpack_encode(data):
+    if msgpack is None:
+        raise RuntimeError("CACHE_CODEC=msgpack requires the msgpack package")
+    return msgpack.packb(data)
+
+register_codec(Codec(0, "json", dumps, loads, is_json=True))
+register_codec(Codec(1, "msgpack", _msgpack_encode, lambda payload: msgpack.unpackb(payload), is_json=False))
+
+# Codec for new writes; readers accept every registered codec, so this can change with a rolling deploy
+CACHE_CODEC = os.getenv("CACHE_CODEC", "json")
+# Payloads at least this large are stored compressed; 0 disables compression
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024))
+CACHE_COMPRESS_LEVEL = int(os.getenv("CACHE_COMPRESS_LEVEL", 6))
+
+# Entry layout: magic, header version, codec byte, soft deadline (big-endian double), payload.
+# 0xc1 is never the first byte of JSON text or of the older "swr1|<deadline>|<json>" entries.
+ENTRY_MAGIC = b"\xc1"
+ENTRY_VERSION = 1
+_HEADER = struct.Struct(">cBBd")
+# Older text entries, still readable: "swr1|<soft deadline>|<json>", or bare JSON (always fresh)
+LEGACY_PREFIX = b"swr1|"
+
+_codec_stats = {}
+_codec_stats_lock = threading.Lock()
+
+class CacheEntry:
+    """A cached payload, its codec and soft deadline; the payload is decoded only if someone asks for .data."""
+
+    __slots__ = ("payload", "codec", "compressed", "soft_deadline", "_data")
+
+    def __init__(self, payload: bytes, codec: Codec, compressed: bool, soft_deadline: float, data=MISSING):
+        self.payload = payload
+        self.codec = codec
+        self.compressed = compressed
+        self.soft_deadline = soft_deadline
+        self._data = data
+
+    @property
+    def data(self):
+        if self._data is MISSING:
+            payload = gzip.decompress(self.payload) if self.compressed else self.payload
+            self._data = self.codec.decode(payload)
+        return self._data
+
+    def json_body(self, accept_gzip: bool = False):
+        """(body, content_encoding) for sending this entry as JSON, avoiding a decode whenever the codec allows."""
+        if not self.codec.is_json:
+            return dumps(self.data), None
+        if not self.compressed:
+            return self.payload, None
+        if accept_gzip:
+            return self.payload, "gzip"
+        return gzip.decompress(self.payload), None
+
+def _record_codec(key: str, json_bytes: int, stored_bytes: int):
+    prefix = key_prefix(key)
+    with _codec_stats_lock:
+        stats = _codec_stats.setdefault(prefix, {"entries": 0, "json_bytes": 0, "stored_bytes": 0})
+        stats["entries"] += 1
+        stats["json_bytes"] += json_bytes
+        stats["stored_bytes"] += stored_bytes
+
+def codec_stats():
+    """Bytes written per key prefix by this process, against what plain JSON would have taken."""
+    with _codec_stats_lock:
+        report = {prefix: dict(stats) for prefix, stats in _codec_stats.items()}
+    for stats in report.values():
+        stats["saved_bytes"] = stats["json_bytes"] - stats["stored_bytes"]
+        stats["ratio"] = round(stats["stored_bytes"] / stats["json_bytes"], 3) if stats["json_bytes"] else None
+    return {"codec": CACHE_CODEC, "compress_min_bytes": CACHE_COMPRESS_MIN_BYTES, "prefixes": report}
+
+def _encode_entry(key: str, data, soft_deadline: float):
+    codec = CODECS[CACHE_CODEC]
+    payload = codec.encode(data)
+    # the JSON size is free for the JSON codec; other codecs pay one extra encode for the report
+    json_bytes = len(payload) if codec.is_json else len(dumps(data))
+    flags = codec.id
+    if CACHE_COMPRESS_MIN_BYTES and len(payload) >= CACHE_COMPRESS_MIN_BYTES:
+        compressed = gzip.compress(payload, CACHE_COMPRESS_LEVEL)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= COMPRESSED
+    raw = _HEADER.pack(ENTRY_MAGIC, ENTRY_VERSION, flags, soft_deadline) + payload
+    _record_codec(key, json_bytes, len(raw))
+    return raw, CacheEntry(payload, codec, bool(flags & COMPRESSED), soft_deadline, data)
+
+def _decode_entry(raw):
+    if isinstance(raw, str):
+        raw = raw.encode()
+    if raw[:1] == ENTRY_MAGIC:
+        _, version, flags, soft_deadline = _HEADER.unpack_from(raw)
+        codec = CODECS.get(flags & ~COMPRESSED)
+        if version != ENTRY_VERSION or codec is None:
+            # written by a newer deploy; treat as a miss rather than misread it
+            return None
+        return CacheEntry(raw[_HEADER.size:], codec, bool(flags & COMPRESSED), soft_deadline)
+    if raw.startswith(LEGACY_PREFIX):
+        _, soft_deadline, payload = raw.split(b"|", 2)
+        return CacheEntry(payload, CODECS["json"], False, float(soft_deadline))
+    return CacheEntry(raw, CODECS["json"], False, float("inf"))
+
+def _set_many(items: dict, expire: int = None, stale_ttl: int = None):
+    with timed("cache_set"):
+        _write_many(items, expire, stale_ttl)
+
+def _queue_writes(pipe, items: dict, expire: int = None, stale_ttl: int = None):
+    """Add the SETEX (and L1 invalidation) commands for items to pipe; returns the entries for L1."""
+    now = time.time()
+    written = []
+    for key, data in items.items():
+        key_expire, key_stale_ttl = ttl_for(key)
+        key_expire = key_expire if expire is None else expire
+        key_stale_ttl = key_stale_ttl if stale_ttl is None else stale_ttl
+        soft_deadline = now + key_expire
+        hard_ttl = key_expire + key_stale_ttl
+        raw, entry = _encode_entry(key, data, soft_deadline)
+        pipe.setex(key, hard_ttl, raw)
+        # publish whenever the prefix is tiered, even from a process without L1, so API workers still drop stale copies
+        if is_tiered(key):
+            pipe.publish(INVALIDATION_CHANNEL, invalidation_message(key))
+        if tier_for(key) is not None:
+            written.append((key, entry, hard_ttl))
+    return written
+
+def _apply_writes(written: list):
+    for key, entry, hard_ttl in written:
+        tier_for(key).set(key, entry, hard_ttl)
+
+def _write_many(items: dict, expire: int = None, stale_ttl: int = None):
+    # write, then tell other workers to drop their L1 copies, in one round-trip
+    pipe = redis_client.pipeline(transaction=False)
+    written = _queue_writes(pipe, items, expire, stale_ttl)
+    pipe.execute()
+    _apply_writes(written)
+
+def cache_data(key: str, data: dict, expire: int = None, stale_ttl: int = None):
+    """Cache `data` as fresh for `expire` seconds, then servable-but-stale for `stale_ttl` more.
+
+    Both default to the TTL policy for the key (see app/ttl_policy.py).
+    """
+    _set_many({key: data}, expire, stale_ttl)
 
 def get_cached_data(key: str):
-    data = redis_client.get(key)
-    return json.loads(data) if data else None
+    return get_many_cached_data([key])[0]
+
+def get_cached_entry(key: str):
+    """Return (data, is_stale) for a cached key, or None on a miss."""
+    entry = get_many_cached_entries([key])[0]
+    if entry is None:
+        return None
+    data, soft_deadline = entry
+    return data, soft_deadline <= time.time()
+
+def cache_many(items: dict, expire: int = None, stale_ttl: int = None):
+    """Cache several keys in one pipelined round-trip."""
+    if items:
+        _set_many(items, expire, stale_ttl)
+
+def get_many_cached_data(keys: list):
+    """Look up several keys; misses come back as None."""
+    return [entry[0] if entry is not None else None for entry in get_many_cached_entries(keys)]
+
+def get_many_cached_entries(keys: list):
+    """Look up several keys as (data, soft_deadline), L1 first, then a single Redis round-trip."""
+    return [(entry.data, entry.soft_deadline) if entry is not None else None for entry in get_many_raw_entries(keys)]
+
+def get_many_raw_entries(keys: list):
+    """Look up several keys as unparsed CacheEntry objects (None on a miss), L1 first, then one Redis round-trip."""
+    with timed("cache_get"):
+        return _read_many(keys)
+
+def _read_local(keys: list):
+    """L1 lookups; returns (results with L1 hits filled in, indexes left for Redis)."""
+    results = [None] * len(keys)
+    remote = []
+    for i, key in enumerate(keys):
+        tier = tier_for(key)
+        if tier is not None:
+            start_invalidation_listener(redis_client)
+            entry = tier.get(key)
+            if entry is not MISSING:
+                results[i] = entry
+                continue
+        remote.append(i)
+    return results, remote
+
+def _queue_reads(pipe, keys: list, remote: list):
+    """Add one MGET, plus a PTTL per L1-tiered key, to pipe; returns the tiered indexes."""
+    pipe.mget([keys[i] for i in remote])
+    tiered = [i for i in remote if tier_for(keys[i]) is not None]
+    for i in tiered:
+        pipe.pttl(keys[i])
+    return tiered
+
+def _apply_reads(keys: list, results: list, remote: list, tiered: list, replies: list):
+    raw, *ttls = replies
+    for i, data in zip(remote, raw):
+        record_l2(keys[i], data is not None)
+        results[i] = _decode_entry(data) if data else None
+    for i, ttl in zip(tiered, ttls):
+        # never keep an L1 copy longer than Redis will
+        if results[i] is not None and ttl > 0:
+            tier_for(keys[i]).set(keys[i], results[i], ttl / 1000)
+    return results
+
+def _read_many(keys: list):
+    results, remote = _read_local(keys)
+    if not remote:
+        return results
+    pipe = raw_redis_client.pipeline(transaction=False)
+    tiered = _queue_reads(pipe, keys, remote)
+    return _apply_reads(keys, results, remote, tiered, pipe.execute())
+
+def get_cached_response(key: str, accept_gzip: bool = False):
+    """Return (body, is_stale, content_encoding) for serving a cached key as JSON, or None on a miss.
+
+    JSON-codec entries go out as stored: never parsed, and still gzip-compressed when the
+    client accepts gzip.
+    """
+    entry = get_many_raw_entries([key])[0]
+    if entry is None:
+        return None
+    body, content_encoding = entry.json_body(accept_gzip)
+    return body, entry.soft_deadline <= time.time(), content_encoding
+
+# ---------------- ASYNC CACHE ----------------
+# The same entries, L1 tier and round-trips as above, on the asyncio Redis pool for async routers.
+async def get_many_raw_entries_async(keys: list):
+    with timed("cache_get"):
+        results, remote = _read_local(keys)
+        if not remote:
+            return results
+        pipe = async_redis_connection(decode_responses=False).pipeline(transaction=False)
+        tiered = _queue_reads(pipe, keys, remote)
+        return _apply_reads(keys, results, remote, tiered, await pipe.execute())
+
+async def get_many_cached_data_async(keys: list):
+    return [entry.data if entry is not None else None for entry in await get_many_raw_entries_async(keys)]
+
+async def get_cached_response_async(key: str, accept_gzip: bool = False):
+    """get_cached_response for async routers."""
+    entry = (await get_many_raw_entries_async([key]))[0]
+    if entry is None:
+        return None
+    body, content_encoding = entry.json_body(accept_gzip)
+    return body, entry.soft_deadline <= time.time(), content_encoding
+
+async def cache_many_async(items: dict, expire: int = None, stale_ttl: int = None):
+    if not items:
+        return
+    with timed("cache_set"):
+        pipe = async_redis_connection(decode_responses=False).pipeline(transaction=False)
+        written = _queue_writes(pipe, items, expire, stale_ttl)
+        await pipe.execute()
+        _apply_writes(written)
+
+async def cache_data_async(key: str, data: dict, expire: int = None, stale_ttl: int = None):
+    await cache_many_async({key: data}, expire, stale_ttl)
 
 # Finnhub API key
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
 BASE_URL = os.environ.get("FINHUB_URL")
+FINNHUB_MAX_CONCURRENCY = int(os.getenv("FINNHUB_MAX_CONCURRENCY", 16))
+
+# Upstream HTTP client settings
+FINNHUB_CONNECT_TIMEOUT = float(os.getenv("FINNHUB_CONNECT_TIMEOUT", 3.05))
+FINNHUB_READ_TIMEOUT = float(os.getenv("FINNHUB_READ_TIMEOUT", 10))
+FINNHUB_POOL_SIZE = int(os.getenv("FINNHUB_POOL_SIZE", max(FINNHUB_MAX_CONCURRENCY, 10)))
+FINNHUB_ASYNC_MAX_CONNECTIONS = int(os.getenv("FINNHUB_ASYNC_MAX_CONNECTIONS", 500))
+FINNHUB_ASYNC_MAX_KEEPALIVE = int(os.getenv("FINNHUB_ASYNC_MAX_KEEPALIVE", 100))
+# Transient upstream failures (connection errors, timeouts, 502/503/504) are retried this many
+# times on the same rate-limit token, waiting FINNHUB_RETRY_BACKOFF seconds doubled per attempt
+FINNHUB_MAX_RETRIES = int(os.getenv("FINNHUB_MAX_RETRIES", 2))
+FINNHUB_RETRY_BACKOFF = float(os.getenv("FINNHUB_RETRY_BACKOFF", 0.25))
+RETRY_STATUSES = frozenset((502, 503, 504))
+
+_upstream_pool = ThreadPoolExecutor(max_workers=FINNHUB_MAX_CONCURRENCY, thread_name_prefix="finnhub")
+
+def _build_session():
+    # one keep-alive connection pool shared by every sync caller
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FINNHUB_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+finnhub_session = _build_session()
+_async_client = None
+
+def get_async_client():
+    """Shared httpx client for async routers, created on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(FINNHUB_READ_TIMEOUT, connect=FINNHUB_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=FINNHUB_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=FINNHUB_ASYNC_MAX_KEEPALIVE
+            )
+        )
+    return _async_client
 
-def fetch_finnhub_data(endpoint: str, params: dict):
-    params["token"] = FINNHUB_API_KEY
-    from requests import get
-    response = get(f"{BASE_URL}/{endpoint}", params=params)
+async def close_finnhub_clients():
+    global _async_client
+    finnhub_session.close()
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def _check_rate_limit(endpoint: str, response, lane: str):
+    upstream_responses.inc((endpoint, response.status_code))
+    if response.status_code == 429:
+        # the shared bucket drifted from Finnhub's view of the quota; back off everywhere
+        drain_tokens()
+        raise RateLimitExceeded(lane, float(response.headers.get("Retry-After", 1)))
     response.raise_for_status()
+
+# Set by background refreshes: take a rate-limit token only if one is free right now
+background_fetch = contextvars.ContextVar("background_fetch", default=False)
+# Forces the rate-limit lane of every fetch in this context (the prefetcher runs on "bulk")
+fetch_lane = contextvars.ContextVar("fetch_lane", default=None)
+
+def fetch_finnhub_data(endpoint: str, params: dict, lane: str = "default", block: bool = None):
+    lane = fetch_lane.get() or lane
+    if block is None:
+        block = not background_fetch.get()
+    try:
+        with timed("rate_limit_wait"):
+            if block:
+                acquire(lane)
+            elif not try_acquire(lane):
+                raise RateLimitExceeded(lane, 1)
+    except RateLimitExceeded:
+        rate_limited.inc((lane,))
+        raise
+    with timed("finnhub_fetch"):
+        for attempt in range(FINNHUB_MAX_RETRIES + 1):
+            try:
+                response = finnhub_session.get(
+                    f"{BASE_URL}/{endpoint}",
+                    params={**params, "token": FINNHUB_API_KEY},
+                    timeout=(FINNHUB_CONNECT_TIMEOUT, FINNHUB_READ_TIMEOUT)
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                upstream_responses.inc((endpoint, "error"))
+                if attempt == FINNHUB_MAX_RETRIES:
+                    raise
+                cause = "error"
+            except requests.RequestException:
+                upstream_responses.inc((endpoint, "error"))
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == FINNHUB_MAX_RETRIES:
+                    break
+                cause = response.status_code
+                upstream_responses.inc((endpoint, cause))
+            upstream_retries.inc((endpoint, cause))
+            time.sleep(FINNHUB_RETRY_BACKOFF * 2 ** attempt)
+    _check_rate_limit(endpoint, response, lane)
     return response.json()
+
+async def fetch_finnhub_data_async(endpoint: str, params: dict, lane: str = "default"):
+    lane = fetch_lane.get() or lane
+    try:
+        with timed("rate_limit_wait"):
+            await acquire_async(lane)
+    except RateLimitExceeded:
+        rate_limited.inc((lane,))
+        raise
+    with timed("finnhub_fetch"):
+        for attempt in range(FINNHUB_MAX_RETRIES + 1):
+            try:
+                response = await get_async_client().get(f"{BASE_URL}/{endpoint}", params={**params, "token": FINNHUB_API_KEY})
+            except httpx.TransportError:
+                upstream_responses.inc((endpoint, "error"))
+                if attempt == FINNHUB_MAX_RETRIES:
+                    raise
+                cause = "error"
+            except httpx.HTTPError:
+                upstream_responses.inc((endpoint, "error"))
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == FINNHUB_MAX_RETRIES:
+                    break
+                cause = response.status_code
+                upstream_responses.inc((endpoint, cause))
+            upstream_retries.inc((endpoint, cause))
+            await asyncio.sleep(FINNHUB_RETRY_BACKOFF * 2 ** attempt)
+    if response.status_code == 429:
+        upstream_responses.inc((endpoint, 429))
+        await drain_tokens_async()
+        raise RateLimitExceeded(lane, float(response.headers.get("Retry-After", 1)))
+    _check_rate_limit(endpoint, response, lane)
+    return response.json()
+
+def fetch_finnhub_many(endpoint: str, params_list: list, lane: str = "default"):
+    """Fetch the same endpoint for many param sets concurrently, preserving order."""
+    # each task runs in a copy of the caller's context: pool threads do not inherit it, and
+    # fetch_lane, background_fetch and the metrics endpoint label all live there
+    futures = [
+        _upstream_pool.submit(contextvars.copy_context().run, fetch_finnhub_data, endpoint, params, lane)
+        for params in params_list
+    ]
+    return [future.result() for future in futures]
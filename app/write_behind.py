@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import date, datetime
+from sqlalchemy import Date, DateTime
+from sqlalchemy.exc import DataError, IntegrityError, StatementError, DBAPIError
+from db.database import SessionLocal
+from db.bulk import bulk_upsert, bulk_insert
+from app.models import StockQuote, CompanyProfile, MarketNews, EarningsCalendar, IPOCalendar, Country
+from app.utils import redis_client
+
+# "off" writes inside the request; "memory" hands rows to a batching background writer
+WRITE_BEHIND_MODE = os.getenv("WRITE_BEHIND_MODE", "off")
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", 10000))
+WRITE_BEHIND_BATCH_ROWS = int(os.getenv("WRITE_BEHIND_BATCH_ROWS", 5000))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.5))
+WRITE_BEHIND_ENQUEUE_TIMEOUT = float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT", 0.05))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", 5))
+WRITE_BEHIND_REPLAY_INTERVAL = float(os.getenv("WRITE_BEHIND_REPLAY_INTERVAL", 30))
+# Spilled batches are replayed at most this many times before they are dead-lettered
+WRITE_BEHIND_MAX_REPLAYS = int(os.getenv("WRITE_BEHIND_MAX_REPLAYS", 10))
+WRITE_BEHIND_DEAD_LETTER_MAX = int(os.getenv("WRITE_BEHIND_DEAD_LETTER_MAX", 10000))
+
+logger = logging.getLogger(__name__)
+
+# batches that exhausted their retries wait here until the DB is back
+FAILED_KEY = "write_behind:failed"
+# rows the database rejected, or that ran out of replays; kept for inspection, newest last
+DEAD_LETTER_KEY = "write_behind:dead"
+
+# kind -> (model, natural key columns or None for append-only tables)
+TARGETS = {
+    "stock_quotes": (StockQuote, None),
+    "company_profiles": (CompanyProfile, None),
+    "market_news": (MarketNews, ["symbol", "url_hash"]),
+    "earnings_calendar": (EarningsCalendar, ["symbol", "date"]),
+    "ipo_calendar": (IPOCalendar, ["symbol", "date"]),
+    "countries": (Country, ["code"]),
+}
+
+_queue = queue.Queue(maxsize=WRITE_BEHIND_QUEUE_SIZE)
+_STOP = object()
+_writer = None
+_writer_lock = threading.Lock()
+_stats = {"enqueued": 0, "written": 0, "batches": 0, "sync_fallbacks": 0, "retries": 0, "spilled": 0, "replayed": 0, "dead_lettered": 0, "dropped": 0}
+
+
+def _write(kind: str, rows: list, db):
+    model, key_columns = TARGETS[kind]
+    if key_columns:
+        return bulk_upsert(db, model, rows, key_columns)
+    return bulk_insert(db, model, rows)
+
+
+def persist(kind: str, rows: list, db):
+    """Store normalized rows for `kind`, inline or through the write-behind queue.
+
+    Returns the bulk write report, or {"queued": n} when the write was deferred. A full
+    queue pushes back on the caller by writing synchronously on its session.
+    """
+    if not rows:
+        return {"inserted": 0, "updated": 0, "skipped": 0}
+    if WRITE_BEHIND_MODE != "memory":
+        return _write(kind, rows, db)
+
+    start_writer()
+    try:
+        _queue.put((kind, rows, 0), timeout=WRITE_BEHIND_ENQUEUE_TIMEOUT)
+    except queue.Full:
+        _stats["sync_fallbacks"] += 1
+        return _write(kind, rows, db)
+    _stats["enqueued"] += len(rows)
+    return {"queued": len(rows)}
+
+
+async def persist_async(kind: str, rows: list, db):
+    """persist() for an AsyncSession: the queue hand-off never blocks, inline writes are awaited."""
+    if not rows:
+        return {"inserted": 0, "updated": 0, "skipped": 0}
+    if WRITE_BEHIND_MODE == "memory":
+        start_writer()
+        try:
+            _queue.put_nowait((kind, rows, 0))
+            _stats["enqueued"] += len(rows)
+            return {"queued": len(rows)}
+        except queue.Full:
+            _stats["sync_fallbacks"] += 1
+    return await db.run_sync(lambda session: _write(kind, rows, session))
+
+
+# ---------------- BATCH WRITER ----------------
+def _collect():
+    """Wait for the first item, then gather more until the batch is full or the interval ends."""
+    try:
+        item = _queue.get(timeout=WRITE_BEHIND_REPLAY_INTERVAL)
+    except queue.Empty:
+        return None, False
+    if item is _STOP:
+        return None, True
+    batch = {}
+    count = 0
+    deadline = time.monotonic() + WRITE_BEHIND_FLUSH_INTERVAL
+    stop = False
+    while True:
+        kind, rows, replays = item
+        # replayed rows keep their own batches so their replay count survives
+        batch.setdefault((kind, replays), []).extend(rows)
+        count += len(rows)
+        remaining = deadline - time.monotonic()
+        if count >= WRITE_BEHIND_BATCH_ROWS or remaining <= 0:
+            break
+        try:
+            item = _queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is _STOP:
+            stop = True
+            break
+    return batch, stop
+
+
+def _is_permanent(error: Exception):
+    # the rows are bad, not the connection: the same statement can never succeed
+    if isinstance(error, (DataError, IntegrityError)):
+        return True
+    return isinstance(error, StatementError) and not isinstance(error, DBAPIError)
+
+
+def _write_with_retries(kind: str, rows: list, replays: int):
+    for attempt in range(WRITE_BEHIND_MAX_RETRIES + 1):
+        db = SessionLocal()
+        try:
+            _write(kind, rows, db)
+            _stats["written"] += len(rows)
+            return
+        except Exception as e:
+            db.rollback()
+            if _is_permanent(e):
+                _isolate(kind, rows, e, replays)
+                return
+            if attempt == WRITE_BEHIND_MAX_RETRIES:
+                _spill(kind, rows, replays)
+            else:
+                _stats["retries"] += 1
+                time.sleep(min(0.1 * 2 ** attempt, 5))
+        finally:
+            db.close()
+
+
+def _isolate(kind: str, rows: list, error: Exception, replays: int):
+    """Split a batch the database rejected until the offending rows are alone; only those are dead-lettered."""
+    if len(rows) == 1:
+        _dead_letter(kind, rows, error)
+        return
+    middle = len(rows) // 2
+    for half in (rows[:middle], rows[middle:]):
+        _write_with_retries(kind, half, replays)
+
+
+def _flush(batch: dict):
+    for (kind, replays), rows in batch.items():
+        _write_with_retries(kind, rows, replays)
+    _stats["batches"] += 1
+
+
+def _dead_letter(kind: str, rows: list, error):
+    logger.warning("Write-behind dead-lettered %d %s rows: %s", len(rows), kind, error)
+    entry = json.dumps({"kind": kind, "rows": rows, "error": str(error)[:1000], "at": time.time()}, default=str)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.rpush(DEAD_LETTER_KEY, entry)
+        pipe.ltrim(DEAD_LETTER_KEY, -WRITE_BEHIND_DEAD_LETTER_MAX, -1)
+        pipe.execute()
+        _stats["dead_lettered"] += len(rows)
+    except Exception:
+        _stats["dropped"] += len(rows)
+
+
+def _spill(kind: str, rows: list, replays: int = 0):
+    try:
+        redis_client.rpush(FAILED_KEY, json.dumps({"kind": kind, "rows": rows, "replays": replays}, default=str))
+        _stats["spilled"] += len(rows)
+    except Exception:
+        # Redis is down too; requeue in memory if there is room, otherwise the rows are lost
+        try:
+            _queue.put_nowait((kind, rows, replays))
+        except queue.Full:
+            _stats["dropped"] += len(rows)
+
+
+def _restore(kind: str, rows: list):
+    model, _ = TARGETS[kind]
+    parsers = {
+        c.name: datetime.fromisoformat if isinstance(c.type, DateTime) else date.fromisoformat
+        for c in model.__table__.columns if isinstance(c.type, (Date, DateTime))
+    }
+    for row in rows:
+        for column, parse in parsers.items():
+            if row.get(column):
+                row[column] = parse(row[column])
+    return rows
+
+
+def replay_failed(limit: int = 100):
+    """Move spilled batches back onto the write queue; ones replayed WRITE_BEHIND_MAX_REPLAYS times are dead-lettered."""
+    replayed = 0
+    for _ in range(limit):
+        raw = redis_client.lpop(FAILED_KEY)
+        if raw is None:
+            break
+        entry = json.loads(raw)
+        replays = entry.get("replays", 0) + 1
+        if replays > WRITE_BEHIND_MAX_REPLAYS:
+            _dead_letter(entry["kind"], entry["rows"], f"still failing after {WRITE_BEHIND_MAX_REPLAYS} replays")
+            continue
+        try:
+            _queue.put_nowait((entry["kind"], _restore(entry["kind"], entry["rows"]), replays))
+        except queue.Full:
+            redis_client.lpush(FAILED_KEY, raw)
+            break
+        replayed += len(entry["rows"])
+    _stats["replayed"] += replayed
+    return replayed
+
+
+def _run():
+    last_replay = 0
+    while True:
+        batch, stop = _collect()
+        if batch:
+            _flush(batch)
+        if stop:
+            break
+        if time.monotonic() - last_replay >= WRITE_BEHIND_REPLAY_INTERVAL:
+            last_replay = time.monotonic()
+            try:
+                replay_failed()
+            except Exception:
+                pass
+
+
+def start_writer():
+    global _writer
+    if _writer is not None or WRITE_BEHIND_MODE != "memory":
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="write-behind", daemon=True)
+            _writer.start()
+
+
+def stop_writer(timeout: float = 30):
+    """Drain everything queued so far, then stop the writer."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is None:
+        return
+    _queue.put(_STOP)
+    writer.join(timeout)
+
+
+def write_behind_stats():
+    return {"mode": WRITE_BEHIND_MODE, "queue_depth": _queue.qsize(), "capacity": WRITE_BEHIND_QUEUE_SIZE, **_stats}
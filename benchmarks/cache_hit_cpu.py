@@ -0,0 +1,83 @@
+"""CPU per cache hit: parse + FastAPI re-encode (before) vs. serving the stored bytes (after).
+
+    python -m benchmarks.cache_hit_cpu                 # against REDIS_HOST/REDIS_PORT
+    python -m benchmarks.cache_hit_cpu --fake          # in-process fakeredis, no server needed
+    python -m benchmarks.cache_hit_cpu --sizes 100 5000 --hits 500
+    CACHE_CODEC=msgpack python -m benchmarks.cache_hit_cpu --fake --gzip
+
+process_time() only counts this process, so Redis server time is excluded; with --fake
+the fake server's work is included in both columns alike.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+# measure the Redis path, not the in-process L1 copy (use --l1 to include it)
+if "--l1" not in sys.argv:
+    os.environ.setdefault("L1_CACHE_ENABLED", "0")
+if "--fake" in sys.argv:
+    from benchmarks.load_test import use_fake_redis
+    use_fake_redis()
+
+from fastapi.encoders import jsonable_encoder
+from app.utils import cache_data, get_cached_data, get_cached_response, orjson, CACHE_CODEC, CACHE_COMPRESS_MIN_BYTES
+from app.read_through import json_response
+
+
+def calendar_payload(size: int):
+    return [
+        {
+            "symbol": f"SYM{i}", "date": "2025-03-14", "hour": "amc", "quarter": 1, "year": 2025,
+            "epsEstimate": 1.2345 + i, "epsActual": None, "revenueEstimate": 123456789 + i, "revenueActual": None,
+        }
+        for i in range(size)
+    ]
+
+
+def before(key: str):
+    data = get_cached_data(key)
+    # what FastAPI's default JSONResponse does with a returned object
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+ACCEPT_GZIP = "--gzip" in sys.argv
+
+
+def after(key: str):
+    body, _, content_encoding = get_cached_response(key, accept_gzip=ACCEPT_GZIP)
+    return json_response(body, content_encoding).body
+
+
+def measure(fn, key: str, hits: int):
+    fn(key)
+    start = time.process_time()
+    for _ in range(hits):
+        fn(key)
+    return (time.process_time() - start) / hits * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000], help="items per payload")
+    parser.add_argument("--hits", type=int, default=200)
+    parser.add_argument("--fake", action="store_true", help="use fakeredis instead of a Redis server")
+    parser.add_argument("--l1", action="store_true", help="keep the in-process L1 cache enabled")
+    parser.add_argument("--gzip", action="store_true", help="client accepts gzip (compressed entries go out as stored)")
+    args = parser.parse_args(argv)
+
+    print(f"serializer: {'orjson' if orjson is not None else 'json'}, codec: {CACHE_CODEC}, "
+          f"compress >= {CACHE_COMPRESS_MIN_BYTES or 'off'}, accept gzip: {args.gzip}")
+    print(f"{'items':>7} {'bytes':>10} {'before us/hit':>14} {'after us/hit':>13} {'speedup':>8}")
+    for size in args.sizes:
+        key = f"earnings_calendar_bench_{size}"
+        cache_data(key, calendar_payload(size), expire=3600, stale_ttl=0)
+        body = after(key)  # bytes on the wire
+        cpu_before = measure(before, key, args.hits)
+        cpu_after = measure(after, key, args.hits)
+        print(f"{size:>7} {len(body):>10} {cpu_before:>14.1f} {cpu_after:>13.1f} {cpu_before / cpu_after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
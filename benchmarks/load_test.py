@@ -0,0 +1,294 @@
+"""Offline load test: every router in fastapi_server.py against a local Finnhub stand-in.
+
+    python -m benchmarks.load_test                                  # SQLite + fakeredis, nothing external
+    python -m benchmarks.load_test --concurrency 32 --requests 500 --symbols 50
+    python -m benchmarks.load_test --latency 0.08 --error-rate 0.02 --error-status 429
+    python -m benchmarks.load_test --redis --database-url mysql+mysqlconnector://...   # real stand-ins
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --output after.json --compare before.json
+
+The app runs under uvicorn in this process so upstream calls (counted by the stub) and DB
+rows written (from app.metrics) can be attributed to each scenario. Scenarios run one after
+another in the order below; later ones (analytics, history) read what earlier ones stored.
+Output is JSON with sorted keys so two runs diff cleanly.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import date, timedelta
+
+from benchmarks.stub_finnhub import StubFinnhub
+
+
+def _symbols(count: int):
+    return [f"SYM{i}" for i in range(count)]
+
+
+def scenarios(symbols: list, today: date):
+    """name -> (path, params(i)); i is the request number within the scenario."""
+    def symbol(i):
+        return symbols[i % len(symbols)]
+
+    def week(i):
+        # overlapping windows: later requests reuse most of the cached day buckets
+        start = today + timedelta(days=i % 28)
+        return {"_from": start.isoformat(), "to": (start + timedelta(days=6)).isoformat()}
+
+    now = int(time.time())
+    few = ",".join(symbols[:10])
+    return {
+        "market.quote": ("/market/quote", lambda i: {"symbol": symbol(i)}),
+        "market.quotes": ("/market/quotes", lambda i: {"symbols": ",".join(symbol(i + k) for k in range(20))}),
+        "market.company": ("/market/company", lambda i: {"symbol": symbol(i)}),
+        "market.news": ("/market/news", lambda i: {"symbol": symbol(i)}),
+        "market.candles": ("/market/candles", lambda i: {"symbol": symbol(i), "resolution": "D", "from": now - 400 * 86400, "to": now}),
+        "calendar.earnings": ("/calendar/earnings", week),
+        "calendar.ipos": ("/calendar/ipos", week),
+        "economic.countries": ("/economic/countries", lambda i: {}),
+        "analytics.summary": ("/analytics/summary", lambda i: {"symbols": few}),
+        "analytics.series": ("/analytics/series", lambda i: {"symbols": few, "metric": ("returns", "volatility", "vwap", "drawdown")[i % 4]}),
+        "analytics.correlation": ("/analytics/correlation", lambda i: {"symbols": few}),
+        "history.quotes": ("/history/quotes", lambda i: {"symbol": symbol(i), "limit": 50}),
+        "history.news": ("/history/news", lambda i: {"symbol": symbol(i), "limit": 50}),
+        "history.earnings": ("/history/earnings", lambda i: {**week(i), "limit": 100}),
+        "history.ipos": ("/history/ipos", lambda i: {**week(i), "limit": 100}),
+        "history.countries": ("/history/countries", lambda i: {}),
+        "monitor.rate_limit": ("/monitor/rate-limit", lambda i: {}),
+        "monitor.cache": ("/monitor/cache", lambda i: {}),
+        "monitor.write_behind": ("/monitor/write-behind", lambda i: {}),
+        "monitor.streams": ("/monitor/streams", lambda i: {}),
+        "monitor.quote_stream": ("/monitor/quote-stream", lambda i: {}),
+        "metrics": ("/metrics", lambda i: {}),
+    }
+
+
+# ---------------- ENVIRONMENT ----------------
+def use_fake_redis():
+    """Point every redis.Redis (and redis.asyncio.Redis) the app creates at one in-process fakeredis server."""
+    import redis
+    import redis.asyncio
+    import fakeredis
+    server = fakeredis.FakeServer()
+
+    def settings(connection_pool, kwargs):
+        # clients built on a shared pool (app.resources) take their settings from it
+        if connection_pool is not None:
+            kwargs = {**connection_pool.connection_kwargs, **kwargs}
+        return {k: v for k, v in kwargs.items() if k in ("db", "decode_responses")}
+
+    class FakeRedis(fakeredis.FakeRedis):
+        def __init__(self, *args, connection_pool=None, **kwargs):
+            super().__init__(server=server, **settings(connection_pool, kwargs))
+
+    class FakeAsyncRedis(fakeredis.FakeAsyncRedis):
+        def __init__(self, *args, connection_pool=None, **kwargs):
+            super().__init__(server=server, **settings(connection_pool, kwargs))
+
+    redis.Redis = redis.StrictRedis = FakeRedis
+    redis.asyncio.Redis = redis.asyncio.StrictRedis = FakeAsyncRedis
+
+
+def _configure(args, stub: StubFinnhub, workdir: str):
+    os.environ["FINHUB_URL"] = stub.url
+    os.environ.setdefault("FINNHUB_API_KEY", "benchmark")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("CANDLE_STORE_DIR", os.path.join(workdir, "candles"))
+    if not args.rate_limit:
+        os.environ["FINNHUB_RATE_LIMIT"] = "0"
+    if not args.redis:
+        use_fake_redis()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_app(port: int):
+    import uvicorn
+    import fastapi_server
+    from db.database import Base, get_engine
+    Base.metadata.create_all(get_engine())
+
+    server = uvicorn.Server(uvicorn.Config(fastapi_server.app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def _rows_written():
+    from app.metrics import db_rows_written
+    return sum(db_rows_written.snapshot().values())
+
+
+# ---------------- DRIVER ----------------
+def _percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def _run_scenario(client, path: str, params, requests: int, concurrency: int):
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params(i))
+                await response.aread()
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def _summarize(latencies: list, statuses: dict, elapsed: float, upstream: int, rows: int):
+    ordered = sorted(latencies)
+    count = len(ordered)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "requests": count,
+        "errors": sum(n for status, n in statuses.items() if not status.startswith("2")),
+        "status": statuses,
+        "requests_per_sec": round(count / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": ms(_percentile(ordered, 0.50)), "p95": ms(_percentile(ordered, 0.95)),
+            "p99": ms(_percentile(ordered, 0.99)), "mean": ms(sum(ordered) / count) if count else None,
+            "max": ms(ordered[-1]) if count else None,
+        },
+        "upstream_calls_per_request": round(upstream / count, 3) if count else None,
+        "db_rows_per_request": round(rows / count, 3) if count else None,
+    }
+
+
+async def _drive(base_url: str, stub: StubFinnhub, plan: dict, args):
+    import httpx
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        for name, (path, params) in plan.items():
+            calls_before, rows_before = stub.snapshot()["calls"], _rows_written()
+            latencies, statuses, elapsed = await _run_scenario(client, path, params, args.requests, args.concurrency)
+            # write-behind rows land after the response; give the writer a moment to catch up
+            await asyncio.sleep(args.settle)
+            results[name] = _summarize(latencies, statuses, elapsed,
+                                       stub.snapshot()["calls"] - calls_before, _rows_written() - rows_before)
+            summary = results[name]
+            print(f"{name:<24} {summary['requests_per_sec'] or 0:>9.1f} req/s  p50 {summary['latency_ms']['p50']:>8} ms  "
+                  f"p99 {summary['latency_ms']['p99']:>8} ms  upstream/req {summary['upstream_calls_per_request']:<6} "
+                  f"rows/req {summary['db_rows_per_request']:<6} errors {summary['errors']}", file=sys.stderr)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _compare(current: dict, baseline: dict):
+    """One line per scenario: throughput and p95 change against a previous report."""
+    print(f"{'scenario':<24} {'req/s':>18} {'p95 ms':>20}", file=sys.stderr)
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+
+        def change(old, new):
+            return f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+
+        rps = f"{before['requests_per_sec']}->{now['requests_per_sec']} {change(before['requests_per_sec'], now['requests_per_sec'])}"
+        p95 = f"{before['latency_ms']['p95']}->{now['latency_ms']['p95']} {change(before['latency_ms']['p95'], now['latency_ms']['p95'])}"
+        print(f"{name:<24} {rps:>18} {p95:>20}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per scenario")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--symbols", type=int, default=25, help="distinct symbols cycled through (controls the cache hit ratio)")
+    parser.add_argument("--only", nargs="+", help="scenario names or groups to run (e.g. market history.news)")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub Finnhub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random stub latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="status returned for injected failures")
+    parser.add_argument("--redis", action="store_true", help="use REDIS_HOST/REDIS_PORT instead of fakeredis")
+    parser.add_argument("--database-url", help="SQLAlchemy URL (default: a fresh SQLite file)")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the Finnhub rate limiter on (off by default)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per request in seconds")
+    parser.add_argument("--settle", type=float, default=0.0, help="seconds to wait after each scenario (e.g. for write-behind)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON report to print changes against")
+    args = parser.parse_args(argv)
+
+    stub = StubFinnhub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, error_status=args.error_status).start()
+    workdir = tempfile.mkdtemp(prefix="finnhub-bench-")
+    _configure(args, stub, workdir)
+
+    plan = scenarios(_symbols(args.symbols), date.today())
+    if args.only:
+        plan = {name: spec for name, spec in plan.items() if any(name == o or name.startswith(o + ".") for o in args.only)}
+
+    port = _free_port()
+    server, thread = _start_app(port)
+    try:
+        results = asyncio.run(_drive(f"http://127.0.0.1:{port}", stub, plan, args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        stub.stop()
+
+    report = {
+        "meta": {
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "database": "sqlite" if not args.database_url else args.database_url.split(":", 1)[0],
+            "redis": "server" if args.redis else "fakeredis",
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "symbols": args.symbols,
+            "upstream": {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate, "error_status": args.error_status},
+            "upstream_calls": stub.snapshot(),
+        },
+        "scenarios": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            _compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
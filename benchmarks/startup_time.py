@@ -0,0 +1,102 @@
+"""Cold-start cost of a worker: import fastapi_server, run the lifespan startup, serve the first request.
+
+    python -m benchmarks.startup_time                      # SQLite + fakeredis + stub Finnhub
+    python -m benchmarks.startup_time --runs 10 --output startup.json
+    python -m benchmarks.startup_time --redis --database-url mysql+mysqlconnector://...
+
+Each run is a fresh interpreter so module imports are really cold. The stub and fakeredis are
+set up before the clock starts; with --redis the redis package import is counted too.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+PHASES = ("import_ms", "startup_ms", "first_request_ms", "total_ms")
+
+
+def _child(args):
+    import tempfile
+    from benchmarks.stub_finnhub import StubFinnhub
+    from benchmarks.load_test import _configure
+
+    stub = StubFinnhub().start()
+    _configure(args, stub, tempfile.mkdtemp(prefix="finnhub-startup-"))
+
+    start = time.perf_counter()
+    import fastapi_server
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+    from db.database import Base, get_engine
+    Base.metadata.create_all(get_engine())
+    client_ready = time.perf_counter()
+    with TestClient(fastapi_server.app) as client:  # runs the lifespan startup
+        started = time.perf_counter()
+        response = client.get(args.path)
+        served = time.perf_counter()
+    response.raise_for_status()
+    # TestClient's own setup and the benchmark's create_all are not part of the app's startup
+    setup = client_ready - imported
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "startup_ms": (started - client_ready) * 1000,
+        "first_request_ms": (served - started) * 1000,
+        "total_ms": (served - start - setup) * 1000,
+    }))
+    stub.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/market/quote?symbol=AAPL", help="first request")
+    parser.add_argument("--redis", action="store_true", help="use REDIS_HOST/REDIS_PORT instead of fakeredis")
+    parser.add_argument("--database-url", help="SQLAlchemy URL (default: a fresh SQLite file)")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the Finnhub rate limiter on (off by default)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return _child(args)
+
+    child_args = ["--path", args.path]
+    if args.redis:
+        child_args.append("--redis")
+    if args.database_url:
+        child_args += ["--database-url", args.database_url]
+    if args.rate_limit:
+        child_args.append("--rate-limit")
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, "-m", "benchmarks.startup_time", "--child", *child_args],
+                                capture_output=True, text=True, cwd=os.getcwd())
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            raise SystemExit(result.returncode)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    report = {
+        phase: {
+            "median": round(statistics.median(run[phase] for run in runs), 2),
+            "min": round(min(run[phase] for run in runs), 2),
+            "max": round(max(run[phase] for run in runs), 2),
+        }
+        for phase in PHASES
+    }
+    report["runs"] = args.runs
+    report["first_request"] = args.path
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
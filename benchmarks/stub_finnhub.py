@@ -0,0 +1,219 @@
+"""Local stand-in for the Finnhub REST API with canned responses.
+
+    server = StubFinnhub(latency=0.05, error_rate=0.01).start()
+    os.environ["FINHUB_URL"] = server.url
+    ...
+    server.calls            # upstream requests served so far
+    server.stop()
+
+    python -m benchmarks.stub_finnhub --port 9100 --latency 0.05   # standalone
+
+Responses are deterministic per symbol/date so repeated runs store the same rows.
+"""
+import json
+import time
+import random
+import zlib
+import argparse
+import threading
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+PREFIX = "/api/v1/"
+
+
+def _seed(*parts):
+    return zlib.crc32("|".join(str(p) for p in parts).encode())
+
+
+def _days(params: dict):
+    start = date.fromisoformat(params.get("from", "2025-01-01"))
+    end = date.fromisoformat(params.get("to", start.isoformat()))
+    return [start + timedelta(days=i) for i in range(max((end - start).days + 1, 0))]
+
+
+def quote(params: dict):
+    base = 50 + _seed(params.get("symbol")) % 450
+    drift = (time.time() // 1) % 10 / 100
+    return {"c": base + drift, "d": drift, "dp": drift / base * 100, "h": base * 1.02, "l": base * 0.98,
+            "o": base, "pc": base - drift, "t": int(time.time())}
+
+
+def profile(params: dict):
+    symbol = params.get("symbol")
+    return {"name": f"{symbol} Inc", "ticker": symbol, "exchange": "NASDAQ", "finnhubIndustry": "Technology",
+            "logo": f"https://static.example.com/logo/{symbol}.png", "weburl": f"https://{symbol.lower()}.example.com"}
+
+
+def company_news(params: dict, per_day: int = 3):
+    symbol = params.get("symbol")
+    items = []
+    for day in _days(params):
+        midnight = int(time.mktime(day.timetuple()))
+        for i in range(per_day):
+            items.append({"category": "company", "datetime": midnight + 3600 * (i + 9), "headline": f"{symbol} headline {day} #{i}",
+                          "id": _seed(symbol, day, i), "related": symbol, "source": "Stub",
+                          "url": f"https://news.example.com/{symbol}/{day}/{i}", "summary": "..."})
+    return items
+
+
+def earnings_calendar(params: dict, per_day: int = 20):
+    rows = []
+    for day in _days(params):
+        for i in range(per_day):
+            rows.append({"symbol": f"E{_seed(day, i) % 5000:04d}", "date": day.isoformat(), "hour": "amc", "quarter": 1,
+                         "year": day.year, "epsEstimate": 1.5, "epsActual": None, "revenueEstimate": 1e9, "revenueActual": None})
+    return {"earningsCalendar": rows}
+
+
+def ipo_calendar(params: dict, per_day: int = 2):
+    rows = []
+    for day in _days(params):
+        for i in range(per_day):
+            symbol = f"I{_seed(day, i) % 5000:04d}"
+            rows.append({"symbol": symbol, "name": f"{symbol} Holdings", "date": day.isoformat(), "exchange": "NYSE",
+                         "price": "10.00-12.00", "numberOfShares": 1000000, "totalSharesValue": 11000000, "status": "expected"})
+    return {"ipoCalendar": rows}
+
+
+COUNTRIES = [
+    {"code2": code, "code3": code + "X", "country": name, "currency": currency, "currencyCode": currency, "region": region, "subRegion": region}
+    for code, name, currency, region in [
+        ("US", "United States", "USD", "Americas"), ("GB", "United Kingdom", "GBP", "Europe"),
+        ("DE", "Germany", "EUR", "Europe"), ("JP", "Japan", "JPY", "Asia"), ("BR", "Brazil", "BRL", "Americas"),
+    ]
+]
+
+
+def candles(params: dict):
+    resolution = params.get("resolution", "D")
+    step = {"D": 86400, "W": 604800, "M": 2592000}.get(resolution) or int(resolution) * 60
+    start, end = int(params["from"]), int(params["to"])
+    stamps = list(range(start - start % step + step if start % step else start, end + 1, step))
+    if not stamps:
+        return {"s": "no_data"}
+    closes = [100 + (t // step) % 17 for t in stamps]
+    return {"s": "ok", "t": stamps, "o": closes, "h": [c + 1 for c in closes], "l": [c - 1 for c in closes],
+            "c": closes, "v": [1000] * len(stamps)}
+
+
+HANDLERS = {
+    "quote": quote,
+    "stock/profile2": profile,
+    "company-news": company_news,
+    "calendar/earnings": earnings_calendar,
+    "calendar/ipo": ipo_calendar,
+    "country": lambda params: COUNTRIES,
+    "stock/candle": candles,
+    "crypto/candle": candles,
+}
+
+
+class StubFinnhub:
+    """Threaded HTTP server answering Finnhub paths with canned data.
+
+    latency: seconds added to every response (plus up to `jitter` seconds at random).
+    error_rate: fraction of requests answered with `error_status` instead (429 carries Retry-After).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.by_endpoint = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{PREFIX.rstrip('/')}"
+
+    def _record(self, endpoint: str):
+        with self._lock:
+            self.calls += 1
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0)
+        return failed, delay
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body, headers=()):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path[len(PREFIX):] if url.path.startswith(PREFIX) else url.path.lstrip("/")
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                failed, delay = stub._record(endpoint)
+                if delay:
+                    time.sleep(delay)
+                handler = HANDLERS.get(endpoint)
+                if handler is None:
+                    return self._send(404, {"error": f"unknown endpoint {endpoint}"})
+                if failed:
+                    headers = [("Retry-After", "1")] if stub.error_status == 429 else []
+                    return self._send(stub.error_status, {"error": "injected failure"}, headers)
+                self._send(200, handler(params))
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-finnhub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors, "by_endpoint": dict(self.by_endpoint)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    server = StubFinnhub(args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status)
+    print(f"FINHUB_URL={server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import asyncio
+from sqlalchemy.orm import Session
+from app.metrics import instrument_sessions
+from db.database import SQLALCHEMY_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+except ImportError:  # optional, needs sqlalchemy[asyncio] (greenlet); only used by endpoints in ASYNC_DB_ENDPOINTS
+    AsyncSession = async_sessionmaker = create_async_engine = None
+
+# Sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {
+    "mysql+mysqlconnector": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Endpoints served on the async engine, e.g. "history.quotes,history.news" or "*";
+# everything else keeps the sync Session from db.database.get_db
+ASYNC_DB_ENDPOINTS = {name.strip() for name in os.getenv("ASYNC_DB_ENDPOINTS", "").split(",") if name.strip()}
+
+
+def async_db_enabled(endpoint: str):
+    """Whether `endpoint` (e.g. history.quotes; "history" or "*" select groups) runs on the async engine."""
+    group = endpoint.split(".", 1)[0]
+    enabled = bool(ASYNC_DB_ENDPOINTS & {"*", group, endpoint})
+    if enabled and create_async_engine is None:
+        # fail at startup rather than on the first request
+        raise RuntimeError(f"ASYNC_DB_ENDPOINTS selects {endpoint}, which needs sqlalchemy[asyncio] and aiomysql")
+    return enabled
+
+
+def _async_url(url: str):
+    if os.getenv("ASYNC_DATABASE_URL"):
+        return os.getenv("ASYNC_DATABASE_URL")
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+class _SyncSession(Session):
+    """Session class behind every AsyncSession, so commits are timed like sync ones."""
+
+
+instrument_sessions(_SyncSession)
+
+_engine = None
+_sessionmaker = None
+
+
+def get_async_engine():
+    """The process-wide asyncio engine, created on first use; sized like the sync pool."""
+    global _engine, _sessionmaker
+    if create_async_engine is None:
+        raise RuntimeError("ASYNC_DB_ENDPOINTS requires sqlalchemy[asyncio] and an async driver (aiomysql)")
+    if _engine is None:
+        # one event loop per worker, so no lock: nothing awaits between the check and the assignment
+        url = _async_url(SQLALCHEMY_DATABASE_URL)
+        if url.startswith("sqlite"):
+            _engine = create_async_engine(url)
+        else:
+            _engine = create_async_engine(
+                url, pool_pre_ping=True, pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW, pool_recycle=DB_POOL_RECYCLE,
+            )
+        _sessionmaker = async_sessionmaker(_engine, sync_session_class=_SyncSession, autoflush=False, expire_on_commit=False)
+    return _engine
+
+
+async def dispose_async_engine():
+    global _engine, _sessionmaker
+    engine, _engine, _sessionmaker = _engine, None, None
+    if engine is not None:
+        await engine.dispose()
+
+
+def AsyncSessionLocal():
+    get_async_engine()
+    return _sessionmaker()
+
+
+# Dependency
+async def get_async_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        # shielded so a cancelled request still returns its connection to the pool
+        await asyncio.shield(db.close())
@@ -0,0 +1,92 @@
+import os
+from sqlalchemy import insert, select, func, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.metrics import db_rows_written
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+
+
+def _chunks(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _upsert_statement(db: Session, model, chunk: list, key_columns: list, update_columns: list):
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(model).values(chunk)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
+    if dialect == "sqlite":
+        stmt = sqlite_insert(model).values(chunk)
+        return stmt.on_conflict_do_update(index_elements=key_columns, set_={c: stmt.excluded[c] for c in update_columns})
+    raise NotImplementedError(f"bulk_upsert does not support the {dialect} dialect")
+
+
+def _count_existing(db: Session, model, key_columns: list, chunk: list):
+    columns = [getattr(model, c) for c in key_columns]
+    keys = [tuple(row[c] for c in key_columns) for row in chunk]
+    if len(columns) == 1:
+        condition = columns[0].in_([key[0] for key in keys])
+    else:
+        condition = tuple_(*columns).in_(keys)
+    return db.execute(select(func.count()).select_from(model).where(condition)).scalar()
+
+
+def bulk_upsert(db: Session, model, rows: list, key_columns: list, update_columns: list = None,
+                chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    """Batched multi-row INSERT ... ON DUPLICATE KEY UPDATE on a natural key.
+
+    Rows missing a key column, or repeating a key already in the payload (last one wins),
+    are counted as skipped. Returns {"inserted", "updated", "skipped"}; "updated" counts
+    rows whose key already existed, whether or not any value changed.
+    """
+    unique = {}
+    skipped = 0
+    for row in rows:
+        key = tuple(row.get(c) for c in key_columns)
+        if any(value is None for value in key):
+            skipped += 1
+            continue
+        if key in unique:
+            skipped += 1
+        unique[key] = row
+    rows = list(unique.values())
+
+    inserted = updated = 0
+    if rows:
+        if update_columns is None:
+            update_columns = [c for c in rows[0] if c not in key_columns]
+        for chunk in _chunks(rows, chunk_size):
+            existing = _count_existing(db, model, key_columns, chunk)
+            db.execute(_upsert_statement(db, model, chunk, key_columns, update_columns))
+            updated += existing
+            inserted += len(chunk) - existing
+        if commit:
+            db.commit()
+        db_rows_written.inc((model.__tablename__, "inserted"), inserted)
+        db_rows_written.inc((model.__tablename__, "updated"), updated)
+
+    return {"inserted": inserted, "updated": updated, "skipped": skipped}
+
+
+async def bulk_upsert_async(db, model, rows: list, key_columns: list, update_columns: list = None,
+                            chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    """bulk_upsert on an AsyncSession; the same statements, awaited on the async driver."""
+    return await db.run_sync(lambda session: bulk_upsert(session, model, rows, key_columns, update_columns, chunk_size, commit))
+
+
+def bulk_insert(db: Session, model, rows: list, chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    """Chunked multi-row INSERT for append-only history tables such as stock_quotes."""
+    for chunk in _chunks(rows, chunk_size):
+        db.execute(insert(model), chunk)
+    if commit:
+        db.commit()
+    db_rows_written.inc((model.__tablename__, "inserted"), len(rows))
+    return {"inserted": len(rows), "updated": 0, "skipped": 0}
+
+
+async def bulk_insert_async(db, model, rows: list, chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    """bulk_insert on an AsyncSession."""
+    return await db.run_sync(lambda session: bulk_insert(session, model, rows, chunk_size, commit))
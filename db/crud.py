@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from app.models import StockQuote, CompanyProfile, MarketNews, ForexRate, CryptoData
+from app.models import StockQuote, CompanyProfile, MarketNews
 
 def create_stock_quote(db: Session, quote: StockQuote):
     db.add(quote)
@@ -20,3 +20,18 @@ def create_market_news(db: Session, news: MarketNews):
     return news
 
 
+# ---------------- ASYNC (AsyncSession from db.async_database) ----------------
+async def _create_async(db, obj):
+    db.add(obj)
+    await db.commit()
+    await db.refresh(obj)
+    return obj
+
+async def create_stock_quote_async(db, quote: StockQuote):
+    return await _create_async(db, quote)
+
+async def create_company_profile_async(db, profile: CompanyProfile):
+    return await _create_async(db, profile)
+
+async def create_market_news_async(db, news: MarketNews):
+    return await _create_async(db, news)
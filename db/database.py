@@ -1,17 +1,68 @@
+import os
+import threading
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
+from sqlalchemy.orm import Session, sessionmaker
+import app.config  # noqa: F401  (reads .env)
+from app.metrics import instrument_sessions
+
+# DATABASE_URL overrides the MySQL settings (e.g. sqlite:///bench.db for the offline benchmarks)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+mysqlconnector://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}:{os.getenv('MYSQL_PORT')}/{os.getenv('MYSQL_DB')}"
+
+# Per-worker pool: DB_POOL_SIZE kept open, up to DB_MAX_OVERFLOW more under bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))   # below MySQL's wait_timeout
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine, created on first use (not at import)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+                    _engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+                else:
+                    _engine = create_engine(
+                        SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, pool_size=DB_POOL_SIZE,
+                        max_overflow=DB_MAX_OVERFLOW, pool_recycle=DB_POOL_RECYCLE,
+                    )
+    return _engine
 
-load_dotenv()
 
-SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}:{os.getenv('MYSQL_PORT')}/{os.getenv('MYSQL_DB')}"
+def dispose_engine():
+    global _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine is not None:
+        engine.dispose()
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def __getattr__(name):
+    # `from db.database import engine` keeps working, without building the engine at import
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(name)
+
+
+class _LazySession(Session):
+    """Binds to the shared engine when first used, so sessions can be made before it exists."""
+
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(*args, **kwargs)
+
+
+SessionLocal = sessionmaker(class_=_LazySession, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+instrument_sessions(SessionLocal)
+
 # Dependency
 def get_db():
     db = SessionLocal()
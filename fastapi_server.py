@@ -1,27 +1,68 @@
+import os
+from app import config  # noqa: F401  (reads .env before any other module looks at the environment)
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from app.services import stock_service, company_service, news_service, calendar_service, economic_service
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from app import resources
+from db.async_database import dispose_async_engine
+from app.utils import close_finnhub_clients
+from app.write_behind import start_writer, stop_writer
+from app.metrics import MetricsMiddleware, render_prometheus
+from app.services import stock_service, company_service, news_service, calendar_service, economic_service, monitor_service, analytics_service, history_service
 
-app = FastAPI(title="Financial Microservice Project")
-
-# Home page route
-@app.get("/", response_class=HTMLResponse, include_in_schema=False)
-def home(request: Request, ):
-    return templates.TemplateResponse("index.html", {"request": request})
-
-# Include routers
-app.include_router(stock_service.router, prefix="/market", tags=["Stock Market"])
-app.include_router(company_service.router, prefix="/market", tags=["Company"])
-app.include_router(news_service.router, prefix="/market", tags=["News"])
-app.include_router(calendar_service.router, prefix="/calendar", tags=["Calendar"])
-app.include_router(economic_service.router, prefix="/economic", tags=["Economic Data"])
+# DB connections opened at startup so the first requests do not pay for the handshake
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", 1))
 
 # Setup templates
 templates = Jinja2Templates(directory="app/templates")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(resources.warm_up, DB_POOL_WARM)
+    start_writer()
+    yield
+    await stock_service.quote_hub.close()
+    # flush queued DB writes before the connection pools go away (a blocking join, so off the loop)
+    await run_in_threadpool(stop_writer)
+    await close_finnhub_clients()
+    resources.close()
+    await resources.close_async()
+    await dispose_async_engine()
+
+
+def create_app():
+    app = FastAPI(title="Financial Microservice Project", lifespan=lifespan)
+    app.add_middleware(MetricsMiddleware)
+
+    # Home page route
+    @app.get("/", response_class=HTMLResponse, include_in_schema=False)
+    def home(request: Request, ):
+        return templates.TemplateResponse("index.html", {"request": request})
+
+    # Prometheus scrape target
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    # Include routers
+    app.include_router(stock_service.router, prefix="/market", tags=["Stock Market"])
+    app.include_router(company_service.router, prefix="/market", tags=["Company"])
+    app.include_router(news_service.router, prefix="/market", tags=["News"])
+    app.include_router(calendar_service.router, prefix="/calendar", tags=["Calendar"])
+    app.include_router(economic_service.router, prefix="/economic", tags=["Economic Data"])
+    app.include_router(analytics_service.router, prefix="/analytics", tags=["Analytics"])
+    app.include_router(history_service.router, prefix="/history", tags=["History"])
+    app.include_router(monitor_service.router, prefix="/monitor", tags=["Monitoring"])
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("fastapi_server:app", host="127.0.0.1", port=8012, reload=True)
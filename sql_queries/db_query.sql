@@ -11,7 +11,8 @@ CREATE TABLE finnhub_data.stock_quotes (
     low_price FLOAT,
     open_price FLOAT,
     prev_close_price FLOAT,
-    INDEX(symbol)
+    fetched_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX ix_quotes_symbol_fetched_at (symbol, fetched_at)
 );
 
 -- Table: finnhub_data.company_profiles
@@ -33,7 +34,11 @@ CREATE TABLE finnhub_data.market_news (
     headline VARCHAR(255),
     source VARCHAR(255),
     url VARCHAR(255),
-    datetime INT
+    url_hash CHAR(40),
+    datetime INT,
+    data JSON,
+    UNIQUE KEY uq_news_symbol_url_hash (symbol, url_hash),
+    INDEX ix_news_symbol_datetime (symbol, datetime)
 );
 
 -- Table: finnhub_data.earnings_calendar
@@ -46,7 +51,8 @@ CREATE TABLE finnhub_data.earnings_calendar (
     revenue_estimate FLOAT,
     revenue_actual FLOAT,
     data JSON,
-    INDEX(symbol)
+    UNIQUE KEY uq_earnings_symbol_date (symbol, date),
+    INDEX ix_earnings_date (date)
 );
 
 -- Table: finnhub_data.ipo_calendar
@@ -59,7 +65,9 @@ CREATE TABLE finnhub_data.ipo_calendar (
     price_range VARCHAR(50),
     shares INT,
     expected_amount FLOAT,
-    data JSON
+    data JSON,
+    UNIQUE KEY uq_ipo_symbol_date (symbol, date),
+    INDEX ix_ipo_date (date)
 );
 
 -- Table: finnhub_data.economic_events
@@ -82,5 +90,6 @@ CREATE TABLE finnhub_data.countries (
     name VARCHAR(100) NOT NULL,
     currency VARCHAR(100),
     timezone VARCHAR(50),
-    data JSON
+    data JSON,
+    UNIQUE KEY uq_country_code (code)
 );
@@ -0,0 +1,26 @@
+-- Natural keys for the bulk upsert layer (db/bulk.py).
+-- Removes the duplicates accumulated by the old insert-on-every-cache-miss
+-- behaviour (keeping the newest row) and adds the unique indexes.
+USE finnhub_data;
+
+-- earnings_calendar: symbol + date
+DELETE e1 FROM earnings_calendar e1
+JOIN earnings_calendar e2 ON e1.symbol = e2.symbol AND e1.date = e2.date AND e1.id < e2.id;
+ALTER TABLE earnings_calendar ADD UNIQUE KEY uq_earnings_symbol_date (symbol, date);
+
+-- ipo_calendar: symbol + date
+DELETE i1 FROM ipo_calendar i1
+JOIN ipo_calendar i2 ON i1.symbol = i2.symbol AND i1.date = i2.date AND i1.id < i2.id;
+ALTER TABLE ipo_calendar ADD UNIQUE KEY uq_ipo_symbol_date (symbol, date);
+
+-- countries: code
+DELETE c1 FROM countries c1
+JOIN countries c2 ON c1.code = c2.code AND c1.id < c2.id;
+ALTER TABLE countries ADD UNIQUE KEY uq_country_code (code);
+
+-- market_news: sha1(url)
+ALTER TABLE market_news ADD COLUMN url_hash CHAR(40) AFTER url;
+UPDATE market_news SET url_hash = SHA1(url) WHERE url IS NOT NULL;
+DELETE n1 FROM market_news n1
+JOIN market_news n2 ON n1.url_hash = n2.url_hash AND n1.id < n2.id;
+ALTER TABLE market_news ADD UNIQUE KEY uq_news_url_hash (url_hash);
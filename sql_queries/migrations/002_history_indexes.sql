@@ -0,0 +1,18 @@
+-- Indexes and the quote timestamp behind the /history read API.
+-- Every history query is a range scan on (symbol, time) or (date) followed by id,
+-- so pages are fetched by keyset instead of OFFSET.
+USE finnhub_data;
+
+-- stock_quotes: fetch time; rows that predate this column all get the migration time
+ALTER TABLE stock_quotes
+    ADD COLUMN fetched_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    ADD INDEX ix_quotes_symbol_fetched_at (symbol, fetched_at),
+    DROP INDEX symbol;
+
+-- market_news: per-symbol timeline
+ALTER TABLE market_news ADD INDEX ix_news_symbol_datetime (symbol, datetime);
+
+-- calendars: date ranges across all symbols (symbol + date is covered by the unique keys;
+-- the plain symbol index on earnings_calendar is a prefix of that key)
+ALTER TABLE earnings_calendar ADD INDEX ix_earnings_date (date), DROP INDEX symbol;
+ALTER TABLE ipo_calendar ADD INDEX ix_ipo_date (date);
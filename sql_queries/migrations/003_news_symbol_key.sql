@@ -0,0 +1,9 @@
+-- market_news: the natural key is (symbol, url_hash), since Finnhub files the same article
+-- under every symbol it mentions, and the raw item is kept so the API serves all its fields.
+-- Cross-symbol copies removed by 001 come back with `/market/news?symbol=...&refetch=true`.
+USE finnhub_data;
+
+ALTER TABLE market_news
+    ADD UNIQUE KEY uq_news_symbol_url_hash (symbol, url_hash),
+    DROP INDEX uq_news_url_hash,
+    ADD COLUMN data JSON;
@@ -0,0 +1,60 @@
+"""Shared fixtures: every Redis client the app builds talks to one in-process fakeredis server,
+and the database is a SQLite file created fresh for each test that asks for `db`.
+
+Run with `python -m pytest tests` after `pip install -r requirements-dev.txt`.
+"""
+import os
+import tempfile
+
+import fakeredis
+import pytest
+
+# a throwaway SQLite file instead of MySQL; set before db.database reads it
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="finnhub-tests-"), "test.db")
+
+import app.resources as resources  # noqa: E402
+
+server = fakeredis.FakeServer()
+
+
+def _settings(connection_pool, kwargs):
+    # clients built on a shared pool (app.resources) take their settings from it
+    if connection_pool is not None:
+        kwargs = {**connection_pool.connection_kwargs, **kwargs}
+    return {k: v for k, v in kwargs.items() if k in ("db", "decode_responses")}
+
+
+class FakeRedis(fakeredis.FakeRedis):
+    def __init__(self, *args, connection_pool=None, **kwargs):
+        super().__init__(server=server, **_settings(connection_pool, kwargs))
+
+
+class FakeAsyncRedis(fakeredis.FakeAsyncRedis):
+    def __init__(self, *args, connection_pool=None, **kwargs):
+        super().__init__(server=server, **_settings(connection_pool, kwargs))
+
+
+# before any app module creates its import-time clients
+resources.Redis = FakeRedis
+resources.AsyncRedis = FakeAsyncRedis
+
+
+@pytest.fixture(autouse=True)
+def redis():
+    client = FakeRedis(decode_responses=True)
+    client.flushall()
+    yield client
+    client.flushall()
+
+
+@pytest.fixture
+def db():
+    import app.models  # noqa: F401  (registers the tables)
+    from db.database import Base, SessionLocal, get_engine
+
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(engine)
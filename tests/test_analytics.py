@@ -0,0 +1,94 @@
+import math
+import time
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.models import StockQuote
+from app.services import analytics_service
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """Half way through a grid step, so quotes a few seconds apart land in the same step."""
+    now = time.time() // 60 * 60 + 30
+    monkeypatch.setattr(analytics_service, "time", SimpleNamespace(time=lambda: now))
+    return datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def client(db):
+    analytics_service._history_cache.clear()
+    api = FastAPI()
+    api.include_router(analytics_service.router, prefix="/analytics")
+    with TestClient(api) as client:
+        yield client
+
+
+def _quote(symbol, minutes_ago, price, now):
+    return StockQuote(symbol=symbol, current_price=price, high_price=price + 1, low_price=price - 1,
+                      fetched_at=now - timedelta(minutes=minutes_ago))
+
+
+@pytest.fixture
+def quotes(db, clock):
+    """AAPL every minute for 8 minutes, MSFT every 3 minutes (plus a superseded quote)."""
+    now = clock
+    rows = [_quote("AAPL", m, 100.0 + (7 - m), now) for m in range(8)]
+    rows += [_quote("MSFT", m, 200.0 + (7 - m) * 2, now) for m in (6, 3, 0)]
+    rows.append(_quote("MSFT", 6.2, 150.0, now))  # same step as the 6-minute quote, but earlier
+    db.add_all(rows)
+    db.commit()
+
+
+def test_summary_counts_real_quotes_only(client, quotes):
+    body = client.get("/analytics/summary", params={"symbols": "AAPL,MSFT", "points": 10, "window": 2}).json()
+
+    assert body["AAPL"]["samples"] == 8
+    assert body["MSFT"]["samples"] == 3  # forward-filled steps are not samples
+    assert body["AAPL"]["last_price"] == 107.0
+    assert body["MSFT"]["last_price"] == 214.0
+    assert math.isclose(body["MSFT"]["total_return"], 214.0 / 202.0 - 1)
+    assert body["AAPL"]["max_drawdown"] == 0.0
+
+
+def test_series_aligns_symbols_on_the_grid(client, quotes):
+    body = client.get("/analytics/series", params={"symbols": "AAPL,MSFT", "metric": "returns", "points": 10}).json()
+
+    assert len(body["AAPL"]) == len(body["MSFT"]) == 9
+    # before MSFT's first quote there is nothing to compare; after it, carried-forward steps return 0
+    assert body["MSFT"][:2] == [None, None]
+    assert body["MSFT"][3] == 0.0
+    assert body["AAPL"][:2] == [None, None]
+
+
+def test_correlation_across_cadences(client, quotes):
+    body = client.get("/analytics/correlation", params={"symbols": "AAPL,MSFT", "points": 10}).json()
+
+    assert body["symbols"] == ["AAPL", "MSFT"]
+    assert body["samples"] == 6
+    assert body["matrix"][0][0] == pytest.approx(1.0)
+    assert -1 <= body["matrix"][0][1] <= 1
+
+
+def test_unknown_metric_and_empty_symbols_are_400(client):
+    assert client.get("/analytics/series", params={"symbols": "AAPL", "metric": "beta"}).status_code == 400
+    assert client.get("/analytics/summary", params={"symbols": " , "}).status_code == 400
+
+
+def test_history_cache_is_bounded_by_bytes(db, monkeypatch):
+    analytics_service._history_cache.clear()
+    budget = 100_000
+    monkeypatch.setattr(analytics_service._history_cache, "max_bytes", budget)
+    # one (3, 1, points) float64 matrix plus its observed counts
+    points = 1000
+    entry_bytes = 3 * points * 8 + 8
+    for n in range(budget // entry_bytes + 5):
+        analytics_service._load_history(db, [f"S{n}"], points, 60)
+
+    stats = analytics_service._history_cache.stats()
+    assert stats["bytes"] <= budget
+    assert stats["evictions"] > 0
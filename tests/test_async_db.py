@@ -0,0 +1,43 @@
+import asyncio
+
+from sqlalchemy import select
+
+import app.write_behind as wb
+from app.models import StockQuote, CompanyProfile, utcnow
+from db.async_database import AsyncSessionLocal, dispose_async_engine
+from db.crud import create_stock_quote_async, create_company_profile_async
+
+
+def _on_async_session(work):
+    async def scenario():
+        db = AsyncSessionLocal()
+        try:
+            return await work(db)
+        finally:
+            await db.close()
+            await dispose_async_engine()
+
+    return asyncio.run(scenario())
+
+
+def test_create_helpers_commit_and_refresh(db):
+    async def work(session):
+        quote = await create_stock_quote_async(session, StockQuote(symbol="AAPL", current_price=187.3))
+        profile = await create_company_profile_async(session, CompanyProfile(symbol="AAPL", name="Apple"))
+        return quote.id, quote.fetched_at, profile.id
+
+    quote_id, fetched_at, profile_id = _on_async_session(work)
+
+    assert quote_id and profile_id
+    assert fetched_at is not None
+    assert db.scalars(select(StockQuote.symbol)).all() == ["AAPL"]
+
+
+def test_persist_async_writes_inline_when_write_behind_is_off(db, monkeypatch):
+    monkeypatch.setattr(wb, "WRITE_BEHIND_MODE", "off")
+    rows = [{"symbol": symbol, "current_price": 1.0, "fetched_at": utcnow()} for symbol in ("AAPL", "MSFT")]
+
+    report = _on_async_session(lambda session: wb.persist_async("stock_quotes", rows, session))
+
+    assert report == {"inserted": 2, "updated": 0, "skipped": 0}
+    assert sorted(db.scalars(select(StockQuote.symbol))) == ["AAPL", "MSFT"]
@@ -0,0 +1,60 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from app.models import EarningsCalendar, StockQuote, utcnow
+from app.metrics import db_rows_written
+from db.bulk import bulk_upsert, bulk_insert
+
+KEY = ["symbol", "date"]
+
+
+def _earnings(symbol, day, eps):
+    return {"symbol": symbol, "date": date(2024, 3, day), "eps_estimate": eps, "data": {"eps": eps}}
+
+
+def _stored(db):
+    return {(row.symbol, row.date.day): row.eps_estimate for row in db.scalars(select(EarningsCalendar))}
+
+
+def test_inserts_then_updates_on_the_natural_key(db):
+    first = bulk_upsert(db, EarningsCalendar, [_earnings("AAPL", 1, 1.0), _earnings("MSFT", 1, 2.0)], KEY)
+    second = bulk_upsert(db, EarningsCalendar, [_earnings("AAPL", 1, 1.5), _earnings("NVDA", 1, 3.0)], KEY)
+
+    assert first == {"inserted": 2, "updated": 0, "skipped": 0}
+    assert second == {"inserted": 1, "updated": 1, "skipped": 0}
+    assert _stored(db) == {("AAPL", 1): 1.5, ("MSFT", 1): 2.0, ("NVDA", 1): 3.0}
+
+
+def test_repeated_and_keyless_rows_are_skipped(db):
+    rows = [_earnings("AAPL", 1, 1.0), _earnings("AAPL", 1, 1.2), {"symbol": "AAPL", "date": None, "eps_estimate": 9.0}]
+
+    assert bulk_upsert(db, EarningsCalendar, rows, KEY) == {"inserted": 1, "updated": 0, "skipped": 2}
+    # the last copy of a repeated key wins
+    assert _stored(db) == {("AAPL", 1): 1.2}
+
+
+def test_only_listed_columns_are_updated(db):
+    bulk_upsert(db, EarningsCalendar, [_earnings("AAPL", 1, 1.0)], KEY)
+    bulk_upsert(db, EarningsCalendar, [{**_earnings("AAPL", 1, 5.0), "eps_actual": 4.0}], KEY, update_columns=["eps_actual"])
+
+    row = db.scalars(select(EarningsCalendar)).one()
+    assert (row.eps_estimate, row.eps_actual) == (1.0, 4.0)
+
+
+def test_rows_are_written_in_chunks(db):
+    rows = [_earnings(f"S{i}", 1 + i % 28, float(i)) for i in range(7)]
+
+    assert bulk_upsert(db, EarningsCalendar, rows, KEY, chunk_size=3)["inserted"] == 7
+    assert bulk_upsert(db, EarningsCalendar, rows, KEY, chunk_size=3)["updated"] == 7
+    assert len(_stored(db)) == 7
+
+
+def test_insert_appends_and_counts_rows(db):
+    before = db_rows_written.snapshot().get(("stock_quotes", "inserted"), 0)
+    rows = [{"symbol": "AAPL", "current_price": float(i), "fetched_at": utcnow()} for i in range(5)]
+
+    assert bulk_insert(db, StockQuote, rows, chunk_size=2) == {"inserted": 5, "updated": 0, "skipped": 0}
+    assert bulk_insert(db, StockQuote, rows)["inserted"] == 5
+    assert len(db.scalars(select(StockQuote)).all()) == 10
+    assert db_rows_written.snapshot()[("stock_quotes", "inserted")] - before == 10
@@ -0,0 +1,80 @@
+import gzip
+import json
+import time
+import struct
+import asyncio
+
+import pytest
+
+import app.utils as utils
+from app.utils import cache_data, get_cached_entry, get_many_cached_data, get_cached_response, get_many_cached_data_async
+
+QUOTE = {"c": 187.3, "h": 188.1, "l": 185.0, "o": 186.2, "pc": 185.9}
+
+
+def test_new_entries_round_trip():
+    cache_data("test_codec_new", QUOTE, 60, 60)
+
+    assert get_cached_entry("test_codec_new") == (QUOTE, False)
+
+
+def test_legacy_text_entry_keeps_its_deadline(redis):
+    redis.set("test_codec_fresh", f"swr1|{time.time() + 60}|{json.dumps(QUOTE)}")
+    redis.set("test_codec_stale", f"swr1|{time.time() - 1}|{json.dumps(QUOTE)}")
+
+    assert get_cached_entry("test_codec_fresh") == (QUOTE, False)
+    assert get_cached_entry("test_codec_stale") == (QUOTE, True)
+
+
+def test_bare_json_entry_is_always_fresh(redis):
+    redis.set("test_codec_bare", json.dumps(QUOTE))
+
+    assert get_cached_entry("test_codec_bare") == (QUOTE, False)
+
+
+def test_every_format_reads_in_one_batch(redis):
+    cache_data("test_codec_v1", {"format": "v1"}, 60, 60)
+    redis.set("test_codec_legacy", f"swr1|{time.time() + 60}|" + json.dumps({"format": "legacy"}))
+    redis.set("test_codec_plain", json.dumps({"format": "plain"}))
+    keys = ["test_codec_v1", "test_codec_legacy", "test_codec_plain", "test_codec_missing"]
+    expected = [{"format": "v1"}, {"format": "legacy"}, {"format": "plain"}, None]
+
+    assert get_many_cached_data(keys) == expected
+    assert asyncio.run(get_many_cached_data_async(keys)) == expected
+
+
+def test_entries_from_a_newer_deploy_are_misses(redis):
+    payload = json.dumps(QUOTE).encode()
+    newer_version = struct.pack(">cBBd", utils.ENTRY_MAGIC, utils.ENTRY_VERSION + 1, 0, time.time() + 60) + payload
+    unknown_codec = struct.pack(">cBBd", utils.ENTRY_MAGIC, utils.ENTRY_VERSION, 0x7f, time.time() + 60) + payload
+    redis.set("test_codec_newer", newer_version)
+    redis.set("test_codec_unknown", unknown_codec)
+
+    assert get_many_cached_data(["test_codec_newer", "test_codec_unknown"]) == [None, None]
+
+
+def test_compressed_json_is_served_as_stored(monkeypatch):
+    monkeypatch.setattr(utils, "CACHE_COMPRESS_MIN_BYTES", 64)
+    news = [{"headline": f"headline {i}", "url": f"https://example.com/{i}"} for i in range(20)]
+    cache_data("test_codec_gzip", news, 60, 60)
+
+    body, stale, encoding = get_cached_response("test_codec_gzip", accept_gzip=True)
+    assert (stale, encoding) == (False, "gzip")
+    assert json.loads(gzip.decompress(body)) == news
+
+    body, _, encoding = get_cached_response("test_codec_gzip")
+    assert encoding is None
+    assert json.loads(body) == news
+
+
+def test_codec_switch_keeps_older_entries_readable(monkeypatch):
+    pytest.importorskip("msgpack")
+    cache_data("test_codec_json", QUOTE, 60, 60)
+    monkeypatch.setattr(utils, "CACHE_CODEC", "msgpack")
+    cache_data("test_codec_msgpack", QUOTE, 60, 60)
+
+    assert get_many_cached_data(["test_codec_json", "test_codec_msgpack"]) == [QUOTE, QUOTE]
+    # non-JSON codecs are re-encoded for clients
+    body, _, encoding = get_cached_response("test_codec_msgpack", accept_gzip=True)
+    assert encoding is None
+    assert json.loads(body) == QUOTE
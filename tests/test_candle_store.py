@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+import app.candle_store as candle_store
+from app.candle_store import DAY, SEGMENT_SECONDS, get_candles
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Daily bars at midnight UTC for whatever range is asked; records each request."""
+    monkeypatch.setattr(candle_store, "CANDLE_STORE_DIR", str(tmp_path))
+    calls = []
+
+    def fetch(endpoint, params, lane="default"):
+        calls.append((endpoint, params["from"], params["to"]))
+        t = list(range(params["from"] + (-params["from"]) % DAY, params["to"] + 1, DAY))
+        if not t:
+            return {"s": "no_data"}
+        return {"s": "ok", "t": t, "o": [1.0] * len(t), "h": [2.0] * len(t), "l": [0.5] * len(t),
+                "c": [float(x // DAY) for x in t], "v": [10.0] * len(t)}
+
+    monkeypatch.setattr(candle_store, "fetch_finnhub_data", fetch)
+    return calls
+
+
+def _archived(tmp_path):
+    return sorted(name for _, _, files in os.walk(tmp_path) for name in files)
+
+
+def test_settled_range_is_fetched_once_and_archived(upstream, tmp_path):
+    start = 1_600_000_000 - 1_600_000_000 % DAY
+    end = start + 100 * DAY
+
+    first = get_candles("AAPL", "D", start, end)
+    fetched = len(upstream)
+    second = get_candles("AAPL", "D", start, end)
+
+    assert first == second
+    assert first["t"] == list(range(start, end + 1, DAY))
+    assert first["c"] == [float(t // DAY) for t in first["t"]]
+    assert fetched == 1  # contiguous missing segments share one request
+    assert len(upstream) == fetched
+    assert len(_archived(tmp_path)) == len(candle_store._segment_starts("D", start, end))
+
+
+def test_sub_range_reads_the_archive(upstream):
+    start = 1_600_000_000 - 1_600_000_000 % DAY
+    get_candles("AAPL", "D", start, start + 60 * DAY)
+    calls = len(upstream)
+
+    bars = get_candles("AAPL", "D", start + 10 * DAY, start + 12 * DAY)
+
+    assert bars["t"] == [start + 10 * DAY, start + 11 * DAY, start + 12 * DAY]
+    assert len(upstream) == calls
+
+
+def test_live_segment_is_cached_in_redis_not_archived(upstream, tmp_path):
+    now = int(time.time())
+    get_candles("AAPL", "D", now - 5 * DAY, now)
+    calls = len(upstream)
+    get_candles("AAPL", "D", now - 5 * DAY, now)
+
+    assert len(upstream) == calls
+    live_start = now - now % SEGMENT_SECONDS["D"]
+    assert not any(name.startswith(str(live_start)) for name in _archived(tmp_path))
+
+
+@pytest.mark.parametrize("symbol, resolution, start, end", [
+    ("..", "D", 0, DAY),
+    ("../etc", "D", 0, DAY),
+    ("AAPL", "2", 0, DAY),
+    ("AAPL", "D", DAY, 0),
+])
+def test_invalid_requests_are_rejected(upstream, symbol, resolution, start, end):
+    with pytest.raises(ValueError):
+        get_candles(symbol, resolution, start, end)
+    assert upstream == []
+
+
+def test_range_wider_than_the_segment_cap_is_rejected(upstream, tmp_path):
+    with pytest.raises(ValueError, match="days per request"):
+        get_candles("AAPL", "1", 0, int(time.time()))
+
+    assert upstream == []
+    assert _archived(tmp_path) == []
+    span = SEGMENT_SECONDS["1"] * candle_store.CANDLE_MAX_SEGMENTS
+    get_candles("AAPL", "1", 0, span - 1)
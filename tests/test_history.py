@@ -0,0 +1,106 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.models import StockQuote, EarningsCalendar, Country
+from app.services import history_service
+
+START = datetime(2024, 3, 13, 14, 30)
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(history_service.router, prefix="/history")
+    return TestClient(app)
+
+
+@pytest.fixture
+def quotes(db):
+    # two quotes share each fetched_at so pages have to break ties on id
+    rows = [StockQuote(symbol="AAPL", current_price=float(i), fetched_at=START + timedelta(seconds=i // 2)) for i in range(7)]
+    rows.append(StockQuote(symbol="MSFT", current_price=99.0, fetched_at=START))
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def _walk(client, path, **params):
+    """Every page of `path`, following next_cursor until it runs out."""
+    pages = []
+    cursor = None
+    while True:
+        body = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        pages.append(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_row_once_across_ties(client, quotes):
+    pages = _walk(client, "/history/quotes", symbol="AAPL", limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    prices = [item["current_price"] for page in pages for item in page]
+    assert prices == [6.0, 5.0, 4.0, 3.0, 2.0, 1.0, 0.0]
+
+
+def test_ascending_order_and_time_window(client, quotes):
+    pages = _walk(client, "/history/quotes", symbol="AAPL", limit=3, descending=False,
+                  start=(START + timedelta(seconds=1)).isoformat(), end=(START + timedelta(seconds=3)).isoformat())
+
+    assert [item["current_price"] for page in pages for item in page] == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_last_full_page_has_no_cursor(client, quotes):
+    body = client.get("/history/quotes", params={"symbol": "AAPL", "limit": 7}).json()
+
+    assert len(body["items"]) == 7
+    assert body["next_cursor"] is None
+
+
+def test_fields_project_columns_plus_the_order_keys(client, quotes):
+    body = client.get("/history/quotes", params={"symbol": "AAPL", "fields": "current_price", "limit": 1}).json()
+
+    assert set(body["items"][0]) == {"current_price", "fetched_at", "id"}
+
+
+def test_raw_payload_is_excluded_by_default(client, db):
+    db.add(EarningsCalendar(symbol="AAPL", date=date(2024, 3, 1), eps_estimate=1.0, data={"eps": 1.0}))
+    db.commit()
+
+    item = client.get("/history/earnings", params={"symbol": "AAPL"}).json()["items"][0]
+    assert "data" not in item
+    assert item["date"] == "2024-03-01"
+
+
+def test_calendar_pages_skip_undated_rows(client, db):
+    db.add_all([EarningsCalendar(symbol="AAPL", date=date(2024, 3, day)) for day in (3, 1, 2)])
+    db.add(EarningsCalendar(symbol="AAPL", date=None))
+    db.commit()
+
+    pages = _walk(client, "/history/earnings", symbol="AAPL", limit=2)
+    assert [item["date"] for page in pages for item in page] == ["2024-03-01", "2024-03-02", "2024-03-03"]
+
+
+def test_single_column_order(client, db):
+    db.add_all([Country(code=code, name=code) for code in ("US", "DE", "JP")])
+    db.commit()
+
+    pages = _walk(client, "/history/countries", limit=1)
+    assert [item["code"] for page in pages for item in page] == ["DE", "JP", "US"]
+
+
+@pytest.mark.parametrize("params, detail", [
+    ({"fields": "current_price,secret"}, "Unknown fields: secret"),
+    ({"cursor": "not-a-cursor"}, "Invalid cursor"),
+    ({"cursor": history_service._encode_cursor([1])}, "Invalid cursor"),
+    ({"start": "yesterday"}, "Invalid datetime: yesterday"),
+])
+def test_bad_requests_are_400(client, quotes, params, detail):
+    response = client.get("/history/quotes", params={"symbol": "AAPL", **params})
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(detail)
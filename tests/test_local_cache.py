@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+import app.local_cache as local_cache
+from app.local_cache import LocalCache, MISSING, INVALIDATION_CHANNEL, PROCESS_ID, clear_local, tier_for
+from app.utils import redis_client, cache_data, get_cached_data
+
+
+@pytest.fixture(scope="module", autouse=True)
+def listener():
+    # the first L1 read starts the listener, which clears L1 once subscribed; get that out of the way
+    local_cache.start_invalidation_listener(redis_client)
+    deadline = time.monotonic() + 2
+    while not redis_client.pubsub_numsub(INVALIDATION_CHANNEL)[0][1] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+@pytest.fixture(autouse=True)
+def empty_l1():
+    clear_local()
+    yield
+    clear_local()
+
+
+def _published(pubsub, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    messages = []
+    while time.monotonic() < deadline:
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.05)
+        if message is None:
+            if messages:
+                break
+            continue
+        messages.append(message["data"])
+    return messages
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = LocalCache(2, 60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_at_the_shorter_of_both_ttls():
+    cache = LocalCache(10, 60)
+    cache.set("short", 1, ttl=0.05)
+    time.sleep(0.06)
+
+    assert cache.get("short") is MISSING
+
+
+def test_byte_budget_evicts_and_skips_oversized_values():
+    cache = LocalCache(100, 60, max_bytes=10, size_of=len)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.set("c", "cccc")
+    cache.set("huge", "h" * 11)
+
+    assert cache.get("a") is MISSING
+    assert cache.get("huge") is MISSING
+    assert cache.stats()["bytes"] == 8
+
+
+def test_hits_are_served_from_l1(redis):
+    cache_data("company_profile_AAPL", {"name": "Apple"}, 60, 60)
+    redis.delete("company_profile_AAPL")
+
+    assert get_cached_data("company_profile_AAPL") == {"name": "Apple"}
+
+
+def test_writes_to_tiered_keys_publish_an_invalidation(redis):
+    pubsub = redis.pubsub()
+    pubsub.subscribe(INVALIDATION_CHANNEL)
+    cache_data("company_profile_MSFT", {"name": "Microsoft"}, 60, 60)
+    cache_data("test_untiered", {"x": 1}, 60, 60)
+
+    assert _published(pubsub) == [f"{PROCESS_ID}|company_profile_MSFT"]
+
+
+def test_writer_without_l1_still_invalidates_other_workers(redis, monkeypatch):
+    # the prefetcher runs with L1_CACHE_ENABLED=0 but refreshes the keys API workers hold
+    monkeypatch.setattr(local_cache, "L1_CACHE_ENABLED", False)
+    pubsub = redis.pubsub()
+    pubsub.subscribe(INVALIDATION_CHANNEL)
+    cache_data("stock_quote_AAPL", {"c": 1.0}, 60, 60)
+
+    assert tier_for("stock_quote_AAPL") is None
+    assert _published(pubsub) == [f"{PROCESS_ID}|stock_quote_AAPL"]
+
+
+def test_listener_drops_keys_written_by_other_workers(redis):
+    cache_data("company_profile_NVDA", {"name": "Nvidia"}, 60, 60)
+    cache_data("company_profile_AMD", {"name": "AMD"}, 60, 60)
+    redis.publish(INVALIDATION_CHANNEL, "another-worker|company_profile_NVDA")
+
+    tier = tier_for("company_profile_NVDA")
+    deadline = time.monotonic() + 2
+    while tier.get("company_profile_NVDA") is not MISSING and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert tier.get("company_profile_NVDA") is MISSING
+    # our own publishes (from cache_data above) do not evict what we just wrote
+    assert tier.get("company_profile_AMD") is not MISSING
@@ -0,0 +1,135 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import requests
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+import app.utils as utils
+from app.metrics import MetricsMiddleware, endpoint_label, requests_total, upstream_retries, render_prometheus
+from app.utils import fetch_finnhub_data, fetch_finnhub_data_async, fetch_finnhub_many
+
+
+def _response(status, body=None):
+    return SimpleNamespace(status_code=status, headers={}, json=lambda: body, raise_for_status=lambda: None)
+
+
+class Upstream:
+    """Finnhub stand-in: answers each call with the next scripted outcome and records the endpoint label it ran under."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.labels = []
+
+    def _next(self):
+        self.labels.append(endpoint_label())
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def get(self, url, params=None, timeout=None):
+        return self._next()
+
+    async def get_async(self, url, params=None):
+        return self._next()
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def install(*outcomes):
+        fake = Upstream(*outcomes)
+        monkeypatch.setattr(utils, "finnhub_session", fake)
+        monkeypatch.setattr(utils, "get_async_client", lambda: SimpleNamespace(get=fake.get_async))
+        return fake
+
+    monkeypatch.setattr(utils, "FINNHUB_RETRY_BACKOFF", 0)
+    return install
+
+
+@pytest.fixture
+def client():
+    router = APIRouter()
+
+    @router.get("/quote/{symbol}")
+    def quote(symbol: str):
+        return {"label": endpoint_label()}
+
+    @router.get("/quotes")
+    def quotes():
+        return fetch_finnhub_many("quote", [{"symbol": s} for s in ("AAPL", "MSFT", "NVDA")])
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router, prefix="/market")
+    return TestClient(app)
+
+
+def _delta(counter, before):
+    after = counter.snapshot()
+    return {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+
+
+def test_endpoint_label_is_the_route_template_with_its_prefix(client):
+    before = requests_total.snapshot()
+
+    assert client.get("/market/quote/AAPL").json() == {"label": "/market/quote/{symbol}"}
+    client.get("/nowhere/AAPL")
+
+    assert _delta(requests_total, before) == {("/market/quote/{symbol}", 200): 1, ("unmatched", 404): 1}
+
+
+def test_pooled_fetches_keep_the_request_label(client, upstream):
+    fake = upstream(_response(200, {"c": 1.0}))
+
+    assert client.get("/market/quotes").json() == [{"c": 1.0}] * 3
+    assert fake.labels == ["/market/quotes"] * 3
+
+
+def test_background_fetches_are_labeled_background(upstream):
+    fake = upstream(_response(200, {"c": 1.0}))
+
+    fetch_finnhub_data("quote", {"symbol": "AAPL"})
+
+    assert fake.labels == ["background"]
+
+
+def test_transient_failures_are_retried_and_counted(upstream):
+    before = upstream_retries.snapshot()
+    upstream(requests.ConnectionError("reset"), _response(503), _response(200, {"c": 1.0}))
+
+    assert fetch_finnhub_data("quote", {"symbol": "AAPL"}) == {"c": 1.0}
+    assert _delta(upstream_retries, before) == {("quote", "error"): 1, ("quote", 503): 1}
+    assert 'finnhub_retries_total{path="quote",cause="503"}' in render_prometheus()
+
+
+def test_retries_stop_at_the_limit(upstream, monkeypatch):
+    monkeypatch.setattr(utils, "FINNHUB_MAX_RETRIES", 2)
+    before = upstream_retries.snapshot()
+    fake = upstream(requests.ConnectionError("down"))
+
+    with pytest.raises(requests.ConnectionError):
+        fetch_finnhub_data("quote", {"symbol": "AAPL"})
+
+    assert len(fake.labels) == 3
+    assert _delta(upstream_retries, before) == {("quote", "error"): 2}
+
+
+def test_client_errors_are_not_retried(upstream):
+    before = upstream_retries.snapshot()
+    fake = upstream(_response(404, {}))
+
+    fetch_finnhub_data("quote", {"symbol": "AAPL"})
+
+    assert len(fake.labels) == 1
+    assert _delta(upstream_retries, before) == {}
+
+
+def test_async_fetch_retries_the_same_way(upstream):
+    before = upstream_retries.snapshot()
+    upstream(httpx.ConnectError("reset"), _response(502), _response(200, {"c": 1.0}))
+
+    assert asyncio.run(fetch_finnhub_data_async("quote", {"symbol": "AAPL"})) == {"c": 1.0}
+    assert _delta(upstream_retries, before) == {("quote", "error"): 1, ("quote", 502): 1}
@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.models import MarketNews
+from app.services import news_service
+from app.services.news_service import WATERMARK_KEY, _load_market_news
+
+NOW = int(datetime(2024, 3, 13, 15, tzinfo=timezone.utc).timestamp())
+
+
+def _item(n, published):
+    return {"headline": f"headline {n}", "source": "wire", "url": f"https://example.com/{n}", "datetime": published, "related": "AAPL"}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """company-news stand-in serving `upstream.items`; records each request and every published batch."""
+    def fetch(endpoint, params):
+        fetch.calls.append(params)
+        return list(fetch.items)
+
+    fetch.items = []
+    fetch.calls = []
+    fetch.published = []
+    monkeypatch.setattr(news_service, "fetch_finnhub_data", fetch)
+    monkeypatch.setattr(news_service, "publish_messages", lambda stream, messages: fetch.published.append(messages))
+    return fetch
+
+
+def _stored(db, symbol="AAPL"):
+    return sorted(db.scalars(select(MarketNews.headline).where(MarketNews.symbol == symbol)))
+
+
+def test_first_load_stores_and_publishes_every_article(db, redis, upstream):
+    upstream.items = [_item(1, NOW - 60), _item(2, NOW)]
+
+    articles = _load_market_news("AAPL", "market_news_AAPL", db)
+
+    assert [a["headline"] for a in articles] == ["headline 2", "headline 1"]
+    assert _stored(db) == ["headline 1", "headline 2"]
+    assert [len(batch) for batch in upstream.published] == [2]
+    assert int(redis.hget(WATERMARK_KEY, "AAPL")) == NOW
+
+
+def test_refresh_starts_at_the_watermark_and_skips_known_articles(db, redis, upstream):
+    upstream.items = [_item(1, NOW - 60), _item(2, NOW)]
+    _load_market_news("AAPL", "market_news_AAPL", db)
+
+    # the watermark day is refetched whole: old items come back next to the new one
+    upstream.items = [_item(0, NOW - 86400), _item(1, NOW - 60), _item(2, NOW), _item(3, NOW + 60)]
+    articles = _load_market_news("AAPL", "market_news_AAPL", db)
+
+    assert upstream.calls[-1]["from"] == "2024-03-13"
+    assert upstream.published[-1] == [{"symbol": "AAPL", "headline": "headline 3", "source": "wire", "url": "https://example.com/3", "datetime": NOW + 60}]
+    assert _stored(db) == ["headline 1", "headline 2", "headline 3"]
+    assert [a["headline"] for a in articles] == ["headline 3", "headline 2", "headline 1"]
+    assert int(redis.hget(WATERMARK_KEY, "AAPL")) == NOW + 60
+
+
+def test_lost_watermark_falls_back_to_the_newest_stored_article(db, redis, upstream):
+    upstream.items = [_item(1, NOW)]
+    _load_market_news("AAPL", "market_news_AAPL", db)
+    redis.delete(WATERMARK_KEY)
+
+    _load_market_news("AAPL", "market_news_AAPL", db)
+
+    assert upstream.calls[-1]["from"] == "2024-03-13"
+    assert upstream.published[-1] == []
+    assert _stored(db) == ["headline 1"]
+
+
+def test_the_same_url_is_stored_once_per_symbol(db, upstream):
+    upstream.items = [_item(1, NOW)]
+    _load_market_news("AAPL", "market_news_AAPL", db)
+    _load_market_news("MSFT", "market_news_MSFT", db)
+
+    assert _stored(db, "AAPL") == _stored(db, "MSFT") == ["headline 1"]
+    assert [len(batch) for batch in upstream.published] == [1, 1]
+
+
+def test_deep_refetch_ignores_the_watermark(db, redis, upstream):
+    redis.hset(WATERMARK_KEY, "AAPL", NOW)
+    upstream.items = [_item(1, NOW - 30 * 86400)]
+
+    articles = _load_market_news("AAPL", "market_news_AAPL", db, deep=True)
+
+    assert [a["headline"] for a in articles] == ["headline 1"]
+    assert int(redis.hget(WATERMARK_KEY, "AAPL")) == NOW
+
+
+def test_items_without_url_are_dropped(db, upstream):
+    upstream.items = [{"headline": "no link", "datetime": NOW}, _item(1, NOW)]
+
+    _load_market_news("AAPL", "market_news_AAPL", db)
+
+    assert _stored(db) == ["headline 1"]
+
+
+def test_raw_item_is_served_as_stored(db, upstream):
+    upstream.items = [_item(1, NOW)]
+
+    articles = _load_market_news("AAPL", "market_news_AAPL", db)
+
+    assert articles == [_item(1, NOW)]
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.access_stats as access_stats
+import app.services.stock_service as stock_service
+from app.utils import cache_data
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(stock_service.quote_hub, "interval", 0.01)
+    api = FastAPI()
+    api.include_router(stock_service.router, prefix="/market")
+    with TestClient(api) as client:
+        yield client
+
+
+def test_quotes_are_pushed_for_subscribed_symbols(client):
+    cache_data("stock_quote_AAPL", {"c": 187.3}, 60, 60)
+
+    with client.websocket_connect("/market/quotes/stream?symbols=AAPL") as ws:
+        assert ws.receive_json() == {"type": "quotes", "data": {"AAPL": {"c": 187.3}}}
+
+
+@pytest.mark.parametrize("message", [[1, 2], "subscribe", {"action": "subscribe", "symbols": 5}])
+def test_malformed_messages_get_an_error_frame(client, message):
+    cache_data("stock_quote_MSFT", {"c": 410.0}, 60, 60)
+
+    with client.websocket_connect("/market/quotes/stream") as ws:
+        ws.send_json(message)
+        assert ws.receive_json()["type"] == "error"
+        # the connection is still usable
+        ws.send_json({"action": "subscribe", "symbols": ["MSFT"]})
+        assert ws.receive_json() == {"type": "quotes", "data": {"MSFT": {"c": 410.0}}}
+
+
+def test_hub_polls_do_not_count_as_demand(client, redis):
+    cache_data("stock_quote_NVDA", {"c": 900.0}, 60, 60)
+
+    with client.websocket_connect("/market/quotes/stream?symbols=NVDA") as ws:
+        ws.receive_json()
+        time.sleep(0.1)  # several polls at the 10 ms interval
+
+    access_stats.flush()
+    assert redis.zscore(access_stats.ACCESS_KEY, "stock_quote_NVDA") == 1
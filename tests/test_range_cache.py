@@ -0,0 +1,108 @@
+import json
+from types import SimpleNamespace
+from datetime import date, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.range_cache as range_cache
+from app.range_cache import read_range_json, stream_range_ndjson
+
+PREFIX = "test_calendar_"
+
+
+def day(n):
+    return date(2024, 3, 1) + timedelta(days=n)
+
+
+@pytest.fixture
+def fetch():
+    """Upstream stand-in: one item on every even day; records each requested run."""
+    calls = []
+
+    def fetch(first, last, db):
+        calls.append((first, last))
+        days = (first + timedelta(days=i) for i in range((last - first).days + 1))
+        return [{"symbol": "AAPL", "date": d.isoformat()} for d in days if d.day % 2 == 0]
+
+    fetch.calls = calls
+    return fetch
+
+
+def _dates(body):
+    return [item["date"] for item in json.loads(body)]
+
+
+def test_only_uncovered_runs_are_fetched(fetch):
+    first = read_range_json(PREFIX, day(0), day(9), fetch, None)
+    second = read_range_json(PREFIX, day(5), day(14), fetch, None)
+
+    assert _dates(first) == [day(n).isoformat() for n in range(10) if day(n).day % 2 == 0]
+    assert _dates(second) == [day(n).isoformat() for n in range(5, 15) if day(n).day % 2 == 0]
+    assert fetch.calls == [(day(0), day(9)), (day(10), day(14))]
+
+
+def test_empty_days_are_cached_too(fetch):
+    read_range_json(PREFIX, day(0), day(0), fetch, None)  # March 1st has no items
+    read_range_json(PREFIX, day(0), day(0), fetch, None)
+
+    assert fetch.calls == [(day(0), day(0))]
+
+
+def test_gaps_between_cached_days_are_fetched_as_runs(fetch):
+    read_range_json(PREFIX, day(3), day(4), fetch, None)
+    read_range_json(PREFIX, day(8), day(8), fetch, None)
+    fetch.calls.clear()
+
+    read_range_json(PREFIX, day(0), day(9), fetch, None)
+
+    assert fetch.calls == [(day(0), day(2)), (day(5), day(7)), (day(9), day(9))]
+
+
+def test_stale_days_are_served_and_refreshed(fetch, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(range_cache, "schedule_refresh", lambda key, loader: refreshed.append(key))
+    read_range_json(PREFIX, day(0), day(3), fetch, None)
+    # far past every soft deadline, without touching the clock Redis expires keys by
+    monkeypatch.setattr(range_cache, "time", SimpleNamespace(time=lambda: 2 ** 40))
+
+    assert _dates(read_range_json(PREFIX, day(0), day(3), fetch, None)) == [day(1).isoformat(), day(3).isoformat()]
+    assert len(fetch.calls) == 1
+    assert refreshed == [f"{PREFIX}{day(0)}_{day(3)}"]
+
+
+def test_stream_reads_chunk_by_chunk(fetch, monkeypatch):
+    monkeypatch.setattr(range_cache, "RANGE_STREAM_CHUNK_DAYS", 4)
+    lines = stream_range_ndjson(PREFIX, day(0), day(9), fetch, None)
+
+    assert fetch.calls == []  # nothing is read until the first line is asked for
+    first = next(lines)
+    assert fetch.calls == [(day(0), day(3))]
+    items = [json.loads(line) for line in [first, *lines]]
+    assert [item["date"] for item in items] == [day(n).isoformat() for n in range(10) if day(n).day % 2 == 0]
+    assert fetch.calls == [(day(0), day(3)), (day(4), day(7)), (day(8), day(9))]
+
+
+@pytest.mark.parametrize("start, end", [
+    (day(5), day(4)),
+    (day(0), day(range_cache.RANGE_CACHE_MAX_DAYS)),
+    (None, day(1)),
+])
+def test_invalid_ranges_are_rejected_before_fetching(fetch, start, end):
+    with pytest.raises(ValueError):
+        read_range_json(PREFIX, start, end, fetch, None)
+    with pytest.raises(ValueError):
+        stream_range_ndjson(PREFIX, start, end, fetch, None)
+    assert fetch.calls == []
+
+
+@pytest.mark.parametrize("query", ["_from=&to=2024-03-31", "_from=2024-03-01&to=", "_from=03/01/2024&to=2024-03-31"])
+def test_calendar_endpoints_reject_bad_dates_with_400(query):
+    from app.services import calendar_service
+
+    api = FastAPI()
+    api.include_router(calendar_service.router, prefix="/calendar")
+    with TestClient(api) as client:
+        for path in ("/calendar/earnings", "/calendar/ipos"):
+            assert client.get(f"{path}?{query}").status_code == 400
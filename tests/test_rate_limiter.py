@@ -0,0 +1,104 @@
+import time
+import asyncio
+
+import pytest
+
+import app.rate_limiter as rl
+
+
+@pytest.fixture(autouse=True)
+def bucket(monkeypatch):
+    # 10 tokens refilling at 1/min: no measurable refill while a test runs
+    monkeypatch.setattr(rl, "FINNHUB_RATE_LIMIT", 1)
+    monkeypatch.setattr(rl, "FINNHUB_RATE_BURST", 10)
+
+
+def _set_tokens(redis, tokens):
+    redis.hset(rl.BUCKET_KEY, mapping={"tokens": tokens, "ts": int(time.time() * 1000)})
+
+
+def _grants(lane):
+    granted = 0
+    while rl.try_acquire(lane):
+        granted += 1
+    return granted
+
+
+def test_interactive_lane_can_empty_the_bucket():
+    assert _grants("interactive") == 10
+
+
+@pytest.mark.parametrize("lane, granted", [("default", 9), ("bulk", 7)])
+def test_lower_lanes_leave_their_reserve(lane, granted):
+    assert _grants(lane) == granted
+    # what is left over still serves the lanes above
+    assert _grants("interactive") == 10 - granted
+
+
+def test_waiter_in_a_higher_lane_blocks_lower_lanes(redis):
+    _set_tokens(redis, 0)
+    granted, wait = rl._try("interactive", 1, "waiter-1")
+    assert not granted and wait > 0
+    assert redis.zscore(rl.QUEUE_KEY.format(lane="interactive"), "waiter-1") is not None
+
+    _set_tokens(redis, 10)
+    assert not rl.try_acquire("default")
+    assert not rl.try_acquire("bulk")
+
+    # the waiter takes its token and leaves the queue, unblocking the lanes below
+    assert rl._try("interactive", 1, "waiter-1")[0]
+    assert redis.zcard(rl.QUEUE_KEY.format(lane="interactive")) == 0
+    assert rl.try_acquire("default")
+
+
+def test_lower_lane_waiters_do_not_block_higher_lanes(redis):
+    _set_tokens(redis, 0)
+    assert not rl._try("bulk", 1, "bulk-waiter")[0]
+    _set_tokens(redis, 10)
+
+    assert rl.try_acquire("interactive")
+
+
+def test_waiter_without_heartbeat_stops_blocking(redis):
+    # a crashed worker's queue entry whose heartbeat deadline has passed
+    redis.zadd(rl.QUEUE_KEY.format(lane="interactive"), {"gone": int(time.time() * 1000) - 1})
+
+    assert rl.try_acquire("default")
+    assert redis.zcard(rl.QUEUE_KEY.format(lane="interactive")) == 0
+
+
+def test_acquire_times_out_and_leaves_the_queue(redis):
+    _set_tokens(redis, 0)
+
+    with pytest.raises(rl.RateLimitExceeded) as exc:
+        rl.acquire("interactive", timeout=0.05)
+
+    assert exc.value.lane == "interactive"
+    assert exc.value.retry_after >= 1
+    assert redis.zcard(rl.QUEUE_KEY.format(lane="interactive")) == 0
+
+
+def test_drain_tokens_refuses_every_lane():
+    rl.drain_tokens()
+
+    assert not any(rl.try_acquire(lane) for lane in rl.LANE_ORDER)
+
+
+def test_unknown_lane_is_rejected():
+    with pytest.raises(ValueError):
+        rl.try_acquire("urgent")
+
+
+def test_async_acquire_shares_the_bucket_and_lane_rules(redis):
+    async def scenario():
+        await rl.acquire_async("bulk", timeout=0)
+        _set_tokens(redis, 0)
+        granted, _ = await rl._try_async("interactive", 1, "async-waiter")
+        assert not granted
+        _set_tokens(redis, 10)
+        with pytest.raises(rl.RateLimitExceeded):
+            await rl.acquire_async("default", timeout=0.05)
+
+    asyncio.run(scenario())
+    assert redis.zcard(rl.QUEUE_KEY.format(lane="default")) == 0
+    assert redis.zscore(rl.QUEUE_KEY.format(lane="interactive"), "async-waiter") is not None
@@ -0,0 +1,103 @@
+import json
+import threading
+
+import pytest
+
+import utils.redis_consumer as rc
+from conftest import FakeRedis
+
+STREAM = "test_stream"
+
+
+@pytest.fixture
+def client():
+    return FakeRedis(decode_responses=False)
+
+
+@pytest.fixture
+def consumer(client, monkeypatch):
+    # reclaim on every poll, and count anything pending as idle
+    monkeypatch.setattr(rc, "CONSUMER_CLAIM_INTERVAL", 0)
+    handled = []
+
+    def handler(stream_name, messages):
+        if any(message.get("poison") for _, message in messages):
+            raise ValueError("cannot handle this")
+        handled.extend(message["n"] for _, message in messages)
+
+    consumer = rc.StreamConsumer(STREAM, handler, group="test", name="c1", block_ms=1,
+                                 claim_idle_ms=0, max_deliveries=3, client=client)
+    consumer.handled = handled
+    consumer.ensure_group()
+    return consumer
+
+
+def _add(client, message):
+    return client.xadd(STREAM, {"data": json.dumps(message)})
+
+
+def _pending(client):
+    return client.xpending(STREAM, "test")["pending"]
+
+
+def test_batches_are_handled_and_acknowledged(client, consumer):
+    for n in range(3):
+        _add(client, {"n": n})
+
+    assert consumer.poll() == 3
+    assert consumer.handled == [0, 1, 2]
+    assert _pending(client) == 0
+
+
+def test_undecodable_entries_are_dead_lettered(client, consumer):
+    _add(client, {"n": 1})
+    bad = client.xadd(STREAM, {"data": b"{not json"})
+    _add(client, {"n": 2})
+
+    consumer.poll()
+
+    assert consumer.handled == [1, 2]
+    assert _pending(client) == 0
+    (_, fields), = client.xrange(consumer.dead_letter_stream)
+    assert fields[b"entry_id"] == bad
+    assert fields[b"data"] == b"{not json"
+    assert fields[b"error"].startswith(b"undecodable")
+
+
+def test_poison_entry_is_isolated_then_dead_lettered(client, consumer):
+    _add(client, {"n": 1})
+    poison = _add(client, {"n": 2, "poison": True})
+    _add(client, {"n": 3})
+
+    consumer.poll()  # the whole batch fails and stays pending
+    assert consumer.handled == []
+    assert _pending(client) == 3
+
+    consumer.poll()  # reclaimed one at a time: only the poison entry fails again
+    assert consumer.handled == [1, 3]
+    assert _pending(client) == 1
+
+    for _ in range(3):
+        consumer.poll()
+    assert _pending(client) == 0
+    (_, fields), = client.xrange(consumer.dead_letter_stream)
+    assert fields[b"entry_id"] == poison
+    assert b"3 deliveries" in fields[b"error"]
+    assert rc.stream_stats([STREAM], group="test", client=client)[STREAM]["dead_lettered"] == 1
+
+
+def test_run_survives_unexpected_errors(consumer, monkeypatch):
+    monkeypatch.setattr(rc, "CONSUMER_MAX_BACKOFF", 0.01)
+    stop = threading.Event()
+    calls = []
+
+    def poll():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("unexpected reply")
+        stop.set()
+
+    monkeypatch.setattr(consumer, "poll", poll)
+    consumer.run(stop)
+
+    assert len(calls) == 2
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pytest
+
+import app.singleflight as sf
+from app.utils import cache_data
+
+
+def _wait_for_leader(key):
+    """Block until some caller has claimed `key`, so the next caller is a follower."""
+    for _ in range(500):
+        if key in sf._inflight:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"no leader for {key}")
+
+
+def test_followers_get_the_leaders_result():
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return {"value": 42}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(sf.singleflight, "test_sf_shared", load)
+        _wait_for_leader("test_sf_shared")
+        followers = [pool.submit(sf.singleflight, "test_sf_shared", load) for _ in range(4)]
+        release.set()
+        results = [leader.result(5)] + [f.result(5) for f in followers]
+
+    assert calls == [1]
+    assert results == [{"value": 42}] * 5
+    assert not sf._inflight
+
+
+def test_leader_error_reaches_followers_and_is_not_cached():
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(sf.singleflight, "test_sf_error", fail)
+        _wait_for_leader("test_sf_error")
+        follower = pool.submit(sf.singleflight, "test_sf_error", fail)
+        release.set()
+        with pytest.raises(ValueError):
+            leader.result(5)
+        with pytest.raises(ValueError):
+            follower.result(5)
+
+    # settled and unlocked: the next caller loads again
+    assert not sf._inflight
+    assert sf.singleflight("test_sf_error", lambda: "ok") == "ok"
+
+
+def test_follower_times_out_without_disturbing_the_leader(monkeypatch):
+    monkeypatch.setattr(sf, "SINGLEFLIGHT_WAIT_TIMEOUT", 0.1)
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return "late"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(sf.singleflight, "test_sf_timeout", slow)
+        _wait_for_leader("test_sf_timeout")
+        with pytest.raises(FutureTimeout):
+            sf.singleflight("test_sf_timeout", slow)
+        release.set()
+        assert leader.result(5) == "late"
+
+
+def test_many_loads_only_keys_nobody_else_leads():
+    release = threading.Event()
+    loaded = []
+
+    def load(keys):
+        loaded.append(sorted(keys))
+        release.wait(5)
+        return {key: key.upper() for key in keys}
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(sf.singleflight_many, ["test_sf_a"], load)
+        _wait_for_leader("test_sf_a")
+        both = pool.submit(sf.singleflight_many, ["test_sf_a", "test_sf_b"], load)
+        _wait_for_leader("test_sf_b")
+        release.set()
+        results = both.result(5)
+        leader.result(5)
+
+    assert results == {"test_sf_a": "TEST_SF_A", "test_sf_b": "TEST_SF_B"}
+    assert loaded == [["test_sf_a"], ["test_sf_b"]]
+
+
+def test_lock_is_released_after_loading(redis):
+    sf.singleflight("test_sf_lock", lambda: 1)
+    assert redis.get(sf.LOCK_KEY.format(key="test_sf_lock")) is None
+
+
+def test_other_worker_result_is_read_from_cache(redis):
+    # another worker leads the key and writes the cache shortly after
+    redis.set(sf.LOCK_KEY.format(key="test_sf_remote"), "other-worker", px=5000)
+    threading.Timer(0.05, cache_data, args=("test_sf_remote", {"from": "cache"}, 60, 60)).start()
+
+    result = sf.singleflight("test_sf_remote", lambda: pytest.fail("loaded a key another worker leads"))
+
+    assert result == {"from": "cache"}
+    # the other worker's lock is not ours to release
+    assert redis.get(sf.LOCK_KEY.format(key="test_sf_remote")) == "other-worker"
+
+
+def test_gives_up_on_a_silent_remote_leader(redis, monkeypatch):
+    monkeypatch.setattr(sf, "SINGLEFLIGHT_WAIT_TIMEOUT", 0.1)
+    redis.set(sf.LOCK_KEY.format(key="test_sf_stuck"), "other-worker", px=5000)
+
+    assert sf.singleflight("test_sf_stuck", lambda: "self-loaded") == "self-loaded"
+
+
+def test_async_and_threaded_callers_share_a_flight():
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return "shared"
+
+    async def fetch():
+        return "async-loaded"
+
+    async def follow():
+        return await sf.singleflight_async("test_sf_mixed", fetch)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(sf.singleflight, "test_sf_mixed", load)
+        _wait_for_leader("test_sf_mixed")
+        threading.Timer(0.05, release.set).start()
+        assert asyncio.run(follow()) == "shared"
+        assert leader.result(5) == "shared"
+    assert calls == [1]
+
+
+def test_cancelled_async_leader_fails_followers_with_runtime_error(redis):
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+
+        leader = asyncio.create_task(sf.singleflight_async("test_sf_cancel", hang))
+        await started.wait()
+        follower = asyncio.create_task(sf.singleflight_async("test_sf_cancel", hang))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(RuntimeError):
+            await follower
+
+    asyncio.run(scenario())
+    assert not sf._inflight
+    assert redis.get(sf.LOCK_KEY.format(key="test_sf_cancel")) is None
+
+
+def test_async_follower_timeout_does_not_cancel_the_leader(monkeypatch):
+    monkeypatch.setattr(sf, "SINGLEFLIGHT_WAIT_TIMEOUT", 0.1)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(0.3)
+            return "done"
+
+        leader = asyncio.create_task(sf.singleflight_async("test_sf_shield", slow))
+        await started.wait()
+        with pytest.raises(asyncio.TimeoutError):
+            await sf.singleflight_async("test_sf_shield", slow)
+        return await leader
+
+    assert asyncio.run(scenario()) == "done"
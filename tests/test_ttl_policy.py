@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+
+import app.ttl_policy as ttl_policy
+from app.ttl_policy import MARKET_TIMEZONE, IMMUTABLE_TTL, market_is_open, seconds_until_open, ttl_for
+
+
+def at(text):
+    return datetime.fromisoformat(text).replace(tzinfo=MARKET_TIMEZONE)
+
+
+# 2024-03-13 is a Wednesday, 2024-03-15 a Friday
+@pytest.mark.parametrize("now, is_open", [
+    ("2024-03-13 09:29", False),
+    ("2024-03-13 09:30", True),
+    ("2024-03-13 15:59", True),
+    ("2024-03-13 16:00", False),
+    ("2024-03-16 12:00", False),
+])
+def test_market_session(now, is_open):
+    assert market_is_open(at(now)) is is_open
+
+
+def test_seconds_until_open_skips_weekends_and_holidays(monkeypatch):
+    assert seconds_until_open(at("2024-03-13 10:00")) == 0
+    assert seconds_until_open(at("2024-03-13 09:00")) == 30 * 60
+    # Friday after the close -> Monday open
+    assert seconds_until_open(at("2024-03-15 16:00")) == (2 * 24 + 17) * 3600 + 30 * 60
+
+    monkeypatch.setattr(ttl_policy, "MARKET_HOLIDAYS", {datetime(2024, 3, 18).date()})
+    assert seconds_until_open(at("2024-03-15 16:00")) == (3 * 24 + 17) * 3600 + 30 * 60
+
+
+def test_quotes_are_short_lived_while_open():
+    assert ttl_for("stock_quote_AAPL", at("2024-03-13 11:00")) == (5, 30)
+
+
+def test_closed_ttl_never_outlives_the_next_open():
+    expire, _ = ttl_for("stock_quote_AAPL", at("2024-03-13 08:00"))
+    assert expire == 90 * 60
+    expire, _ = ttl_for("stock_quote_AAPL", at("2024-03-13 20:00"))
+    assert expire == 6 * 3600
+
+
+def test_reference_data_ignores_the_session():
+    assert ttl_for("company_profile_AAPL", at("2024-03-13 11:00")) == ttl_for("company_profile_AAPL", at("2024-03-16 03:00"))
+
+
+def test_past_calendar_ranges_are_immutable():
+    now = at("2024-03-13 11:00")
+    assert ttl_for("earnings_calendar_2024-03-01_2024-03-12", now) == (IMMUTABLE_TTL, IMMUTABLE_TTL)
+    assert ttl_for("earnings_calendar_2024-03-12", now) == (IMMUTABLE_TTL, IMMUTABLE_TTL)
+    # a range that reaches today can still change
+    assert ttl_for("earnings_calendar_2024-03-01_2024-03-13", now)[0] == 3600
+
+
+def test_unknown_prefixes_use_the_default_rule():
+    assert ttl_for("something_else", at("2024-03-13 11:00")) == (3600, ttl_policy.DEFAULT_STALE_TTL)
+
+
+def test_per_key_overrides(monkeypatch):
+    monkeypatch.setattr(ttl_policy, "TTL_OVERRIDES", {"stock_quote_AAPL": {"open_ttl": 1}})
+
+    assert ttl_for("stock_quote_AAPL", at("2024-03-13 11:00"))[0] == 1
+    assert ttl_for("stock_quote_MSFT", at("2024-03-13 11:00"))[0] == 5
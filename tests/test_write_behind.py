@@ -0,0 +1,101 @@
+import json
+import queue
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+import app.write_behind as wb
+from app.models import StockQuote, utcnow
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(wb.time, "sleep", lambda seconds: None)
+    yield
+    while True:
+        try:
+            wb._queue.get_nowait()
+        except queue.Empty:
+            break
+
+
+def _quotes(symbols):
+    return [{"symbol": symbol, "current_price": 1.0, "fetched_at": utcnow()} for symbol in symbols]
+
+
+def _stored(db):
+    return sorted(db.scalars(select(StockQuote.symbol)))
+
+
+def _delta(before):
+    return {name: wb._stats[name] - before[name] for name in before}
+
+
+def test_rejected_rows_are_isolated_and_dead_lettered(db, redis):
+    before = dict(wb._stats)
+    rows = _quotes(["A", "B", None, "C", "D"])  # symbol is NOT NULL
+
+    wb._write_with_retries("stock_quotes", rows, 0)
+
+    assert _stored(db) == ["A", "B", "C", "D"]
+    dead = [json.loads(entry) for entry in redis.lrange(wb.DEAD_LETTER_KEY, 0, -1)]
+    assert [entry["rows"][0]["symbol"] for entry in dead] == [None]
+    assert _delta(before)["written"] == 4
+    assert _delta(before)["dead_lettered"] == 1
+    assert _delta(before)["retries"] == 0
+
+
+def test_transient_errors_are_retried(db, monkeypatch):
+    before = dict(wb._stats)
+    write = wb._write
+    failures = iter([True, True])
+
+    def flaky(kind, rows, session):
+        if next(failures, False):
+            raise OperationalError("INSERT", {}, Exception("server has gone away"))
+        return write(kind, rows, session)
+
+    monkeypatch.setattr(wb, "_write", flaky)
+    wb._write_with_retries("stock_quotes", _quotes(["AAPL"]), 0)
+
+    assert _stored(db) == ["AAPL"]
+    assert _delta(before)["retries"] == 2
+
+
+def test_exhausted_retries_spill_to_redis(db, redis, monkeypatch):
+    def down(kind, rows, session):
+        raise OperationalError("INSERT", {}, Exception("connection refused"))
+
+    monkeypatch.setattr(wb, "_write", down)
+    wb._write_with_retries("stock_quotes", _quotes(["AAPL"]), 3)
+
+    spilled = [json.loads(entry) for entry in redis.lrange(wb.FAILED_KEY, 0, -1)]
+    assert [(entry["kind"], entry["replays"]) for entry in spilled] == [("stock_quotes", 3)]
+    assert redis.llen(wb.DEAD_LETTER_KEY) == 0
+
+
+def test_replay_requeues_until_the_cap(redis, monkeypatch):
+    monkeypatch.setattr(wb, "WRITE_BEHIND_MAX_REPLAYS", 2)
+    wb._spill("stock_quotes", json.loads(json.dumps(_quotes(["AAPL"]), default=str)), replays=1)
+    wb._spill("stock_quotes", _quotes(["MSFT"]), replays=2)
+
+    assert wb.replay_failed() == 1
+
+    kind, rows, replays = wb._queue.get_nowait()
+    assert (kind, rows[0]["symbol"], replays) == ("stock_quotes", "AAPL", 2)
+    # timestamps come back as datetimes, not the strings they were spilled as
+    assert not isinstance(rows[0]["fetched_at"], str)
+    dead = [json.loads(entry) for entry in redis.lrange(wb.DEAD_LETTER_KEY, 0, -1)]
+    assert [entry["rows"][0]["symbol"] for entry in dead] == ["MSFT"]
+    assert redis.llen(wb.FAILED_KEY) == 0
+
+
+def test_memory_mode_writes_in_the_background(db, monkeypatch):
+    monkeypatch.setattr(wb, "WRITE_BEHIND_MODE", "memory")
+    monkeypatch.setattr(wb, "WRITE_BEHIND_FLUSH_INTERVAL", 0.01)
+
+    assert wb.persist("stock_quotes", _quotes(["AAPL", "MSFT"]), db) == {"queued": 2}
+    wb.stop_writer(timeout=5)
+
+    assert _stored(db) == ["AAPL", "MSFT"]
@@ -0,0 +1,306 @@
+# utils/redis_consumer.py
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import argparse
+import importlib
+import multiprocessing
+import redis
+from app.resources import redis_connection
+from utils.redis_producer import msgpack
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_GROUP = os.getenv("STREAM_CONSUMER_GROUP", "market_data")
+CONSUMER_BATCH_SIZE = int(os.getenv("STREAM_CONSUMER_BATCH_SIZE", 200))
+CONSUMER_BLOCK_MS = int(os.getenv("STREAM_CONSUMER_BLOCK_MS", 2000))
+# entries pending this long on a consumer are considered abandoned and reclaimed
+CONSUMER_CLAIM_IDLE_MS = int(os.getenv("STREAM_CONSUMER_CLAIM_IDLE_MS", 60000))
+CONSUMER_CLAIM_INTERVAL = float(os.getenv("STREAM_CONSUMER_CLAIM_INTERVAL", 30))
+# entries handed out this many times without being acknowledged go to the dead-letter stream
+CONSUMER_MAX_DELIVERIES = int(os.getenv("STREAM_CONSUMER_MAX_DELIVERIES", 5))
+DEAD_LETTER_MAXLEN = int(os.getenv("STREAM_DEAD_LETTER_MAXLEN", 10000))
+# longest pause after repeated unexpected errors in a consumer loop
+CONSUMER_MAX_BACKOFF = float(os.getenv("STREAM_CONSUMER_MAX_BACKOFF", 30))
+# how often the runner checks for (and replaces) consumer processes that died
+CONSUMER_RESTART_INTERVAL = float(os.getenv("STREAM_CONSUMER_RESTART_INTERVAL", 5))
+
+STATS_KEY = "stream_consumer_stats:{group}:{stream}"
+DEAD_LETTER_STREAM = "{stream}:dead"
+
+MARKET_STREAMS = ["stock_quotes", "market_news", "company_profiles", "earnings_calendar", "ipo_calendar", "countries"]
+
+
+def connect():
+    # binary-safe: msgpack payloads are not valid UTF-8; the pool is per process (redis-py resets it after fork)
+    return redis_connection(decode_responses=False)
+
+
+def decode_message(fields: dict):
+    """Decode a stream entry written by utils.redis_producer (JSON or msgpack)."""
+    if b"msgpack" in fields:
+        return msgpack.unpackb(fields[b"msgpack"])
+    return json.loads(fields[b"data"])
+
+
+def log_handler(stream_name: str, messages: list):
+    """Default handler: log what arrived. messages is a list of (entry_id, message)."""
+    logger.info("%s: %d messages, last=%s", stream_name, len(messages), messages[-1][1])
+
+
+def load_handler(path: str):
+    """Resolve "package.module:function"."""
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+class StreamConsumer:
+    """One member of a consumer group: batched XREADGROUP, batch XACK and XAUTOCLAIM of stuck entries.
+
+    handler(stream_name, [(entry_id, message), ...]) processes a batch; if it raises, the
+    batch stays pending and is retried once reclaimed, one entry at a time. Entries that
+    cannot be decoded, or were delivered CONSUMER_MAX_DELIVERIES times without being
+    acknowledged, are moved to the "<stream>:dead" stream.
+    """
+
+    def __init__(self, stream_name: str, handler, group: str = CONSUMER_GROUP, name: str = None,
+                 count: int = CONSUMER_BATCH_SIZE, block_ms: int = CONSUMER_BLOCK_MS,
+                 claim_idle_ms: int = CONSUMER_CLAIM_IDLE_MS, max_deliveries: int = CONSUMER_MAX_DELIVERIES,
+                 client=None):
+        self.stream_name = stream_name
+        self.handler = handler
+        self.group = group
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.client = client or connect()
+        self.stats_key = STATS_KEY.format(group=group, stream=stream_name)
+        self.dead_letter_stream = DEAD_LETTER_STREAM.format(stream=stream_name)
+        self._last_claim = 0
+        self._rate = 0.0
+        self._rate_at = time.monotonic()
+
+    def ensure_group(self):
+        try:
+            self.client.xgroup_create(self.stream_name, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _deliveries(self, ids: list):
+        pipe = self.client.pipeline(transaction=False)
+        for entry_id in ids:
+            pipe.xpending_range(self.stream_name, self.group, min=entry_id, max=entry_id, count=1)
+        return [pending[0]["times_delivered"] if pending else 0 for pending in pipe.execute()]
+
+    def _reclaim(self):
+        """Take over entries a crashed or stuck consumer left pending; dead-letter those out of deliveries."""
+        claimed = []
+        start = "0-0"
+        while True:
+            start, entries, *_ = self.client.xautoclaim(
+                self.stream_name, self.group, self.name, self.claim_idle_ms, start_id=start, count=self.count
+            )
+            claimed.extend(entry for entry in entries if entry[1] is not None)
+            if start in (b"0-0", "0-0") or len(claimed) >= self.count:
+                break
+        if not claimed:
+            return claimed
+        # XAUTOCLAIM counts as a delivery, so more than max_deliveries means the handler had them that often
+        deliveries = self._deliveries([entry_id for entry_id, _ in claimed])
+        exhausted = [entry for entry, count in zip(claimed, deliveries) if count > self.max_deliveries]
+        if exhausted:
+            self._dead_letter(exhausted, f"not acknowledged after {self.max_deliveries} deliveries")
+        return [entry for entry, count in zip(claimed, deliveries) if count <= self.max_deliveries]
+
+    def _read(self):
+        """Return (entries, reclaimed)."""
+        if time.monotonic() - self._last_claim >= CONSUMER_CLAIM_INTERVAL:
+            self._last_claim = time.monotonic()
+            claimed = self._reclaim()
+            if claimed:
+                return claimed, True
+        response = self.client.xreadgroup(
+            self.group, self.name, {self.stream_name: ">"}, count=self.count, block=self.block_ms
+        )
+        return (response[0][1] if response else []), False
+
+    def _dead_letter(self, entries: list, reason: str):
+        """Copy entries to the dead-letter stream with the reason, and acknowledge them here."""
+        logger.warning("Dead-lettering %d entries from %s: %s", len(entries), self.stream_name, reason)
+        pipe = self.client.pipeline(transaction=False)
+        for entry_id, fields in entries:
+            pipe.xadd(self.dead_letter_stream, {**fields, "entry_id": entry_id, "error": reason[:1000]},
+                      maxlen=DEAD_LETTER_MAXLEN, approximate=True)
+        pipe.xack(self.stream_name, self.group, *[entry_id for entry_id, _ in entries])
+        pipe.hincrby(self.stats_key, "dead_lettered", len(entries))
+        pipe.execute()
+
+    def _record(self, processed: int, failed: int):
+        now = time.monotonic()
+        elapsed = max(now - self._rate_at, 1e-6)
+        # exponentially weighted messages/second for this consumer
+        self._rate = 0.8 * self._rate + 0.2 * (processed / elapsed)
+        self._rate_at = now
+        return {"processed": processed, "failed": failed}
+
+    def poll(self):
+        """Read, handle and acknowledge one batch; returns the number of entries handled."""
+        entries, reclaimed = self._read()
+        if not entries:
+            self._record(0, 0)
+            self.client.hset(self.stats_key, f"rate:{self.name}", round(self._rate, 3))
+            return 0
+        if reclaimed:
+            # retried entries go one at a time, so a poison entry does not keep failing the rest of its batch
+            return sum(self._handle([entry]) for entry in entries)
+        return self._handle(entries)
+
+    def _handle(self, entries: list):
+        messages, undecodable = [], []
+        for entry_id, fields in entries:
+            try:
+                messages.append((entry_id.decode(), decode_message(fields)))
+            except Exception as e:
+                undecodable.append(((entry_id, fields), e))
+        if undecodable:
+            # no retry can fix these
+            self._dead_letter([entry for entry, _ in undecodable], f"undecodable: {undecodable[0][1]}")
+        if not messages:
+            return len(entries)
+        ids = [entry_id for entry_id, _ in messages]
+        pipe = self.client.pipeline(transaction=False)
+        try:
+            self.handler(self.stream_name, messages)
+        except Exception:
+            logger.exception("Handler failed on %d entries from %s; leaving them pending", len(ids), self.stream_name)
+            self._record(0, len(ids))
+            pipe.hincrby(self.stats_key, "failed", len(ids))
+        else:
+            self._record(len(ids), 0)
+            pipe.xack(self.stream_name, self.group, *ids)
+            pipe.hincrby(self.stats_key, "processed", len(ids))
+        pipe.hset(self.stats_key, f"rate:{self.name}", round(self._rate, 3))
+        pipe.execute()
+        return len(entries)
+
+    def run(self, stop_event=None):
+        logger.info("Consumer %s reading %s as group %s", self.name, self.stream_name, self.group)
+        ready = False
+        backoff = 0
+        while stop_event is None or not stop_event.is_set():
+            try:
+                if not ready:
+                    self.ensure_group()
+                    ready = True
+                self.poll()
+                backoff = 0
+                continue
+            except redis.ConnectionError:
+                logger.warning("Lost Redis connection; retrying")
+            except Exception:
+                logger.exception("Consumer %s failed on %s; backing off", self.name, self.stream_name)
+            # re-create the group too: a Redis restart or a deleted stream drops it
+            ready = False
+            backoff = min(max(backoff * 2, 1), CONSUMER_MAX_BACKOFF)
+            if stop_event is not None:
+                stop_event.wait(backoff)
+            else:
+                time.sleep(backoff)
+        self.client.hdel(self.stats_key, f"rate:{self.name}")
+
+
+# ---------------- MONITORING ----------------
+def stream_stats(streams: list = None, group: str = CONSUMER_GROUP, client=None):
+    """Per-stream length, group lag/pending and consumer throughput."""
+    client = client or connect()
+    stats = {}
+    for stream_name in streams or MARKET_STREAMS:
+        entry = {"length": 0, "lag": None, "pending": 0, "processed": 0, "failed": 0, "dead_lettered": 0, "rate": 0.0, "consumers": 0}
+        try:
+            entry["length"] = client.xlen(stream_name)
+            for info in client.xinfo_groups(stream_name):
+                if info["name"] in (group, group.encode()):
+                    entry["lag"] = info.get("lag")
+                    entry["pending"] = info["pending"]
+                    entry["consumers"] = info["consumers"]
+        except redis.ResponseError:
+            pass  # stream does not exist yet
+        for field, value in client.hgetall(STATS_KEY.format(group=group, stream=stream_name)).items():
+            field = field.decode()
+            if field.startswith("rate:"):
+                entry["rate"] += float(value)
+            else:
+                entry[field] = int(value)
+        entry["rate"] = round(entry["rate"], 3)
+        stats[stream_name] = entry
+    return stats
+
+
+# ---------------- PROCESS POOL RUNNER ----------------
+def _consume(stream_name: str, handler_path: str, group: str, index: int, stop_event):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent coordinates shutdown
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    consumer = StreamConsumer(stream_name, load_handler(handler_path), group=group,
+                              name=f"{socket.gethostname()}-{os.getpid()}-{index}")
+    consumer.run(stop_event)
+
+
+def _start_worker(stream_name: str, handler_path: str, group: str, index: int, stop_event):
+    worker = multiprocessing.Process(
+        target=_consume, args=(stream_name, handler_path, group, index, stop_event),
+        name=f"consumer-{stream_name}-{index}"
+    )
+    worker.start()
+    return worker
+
+
+def run_consumers(handlers: dict, group: str = CONSUMER_GROUP, processes: int = None):
+    """Run `processes` consumer processes per stream, replacing any that die; handlers maps stream -> "module:function"."""
+    processes = processes or os.cpu_count() or 1
+    stop_event = multiprocessing.Event()
+    workers = {
+        (stream_name, handler_path, index): _start_worker(stream_name, handler_path, group, index, stop_event)
+        for stream_name, handler_path in handlers.items()
+        for index in range(processes)
+    }
+
+    def _stop(*_):
+        stop_event.set()
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    # the pending entries of a dead worker are reclaimed by its replacement (or its peers)
+    while not stop_event.wait(CONSUMER_RESTART_INTERVAL):
+        for (stream_name, handler_path, index), worker in list(workers.items()):
+            if not worker.is_alive():
+                logger.warning("Consumer %s exited with %s; restarting", worker.name, worker.exitcode)
+                workers[(stream_name, handler_path, index)] = _start_worker(stream_name, handler_path, group, index, stop_event)
+
+    for worker in workers.values():
+        worker.join()
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Consume market data Redis Streams with consumer groups.")
+    parser.add_argument("handlers", nargs="*",
+                        help="stream=module:function pairs (default: log every market stream)")
+    parser.add_argument("--group", default=CONSUMER_GROUP)
+    parser.add_argument("--processes", type=int, default=None, help="consumer processes per stream")
+    args = parser.parse_args(argv)
+
+    handlers = dict(pair.split("=", 1) for pair in args.handlers) or {
+        stream_name: "utils.redis_consumer:log_handler" for stream_name in MARKET_STREAMS
+    }
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    run_consumers(handlers, group=args.group, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,19 +1,134 @@
 # utils/redis_producer.py
-import redis
 import json
 import os
-from dotenv import load_dotenv
+import time
+import logging
+import threading
+from app.metrics import timed, stream_messages
+from app.resources import redis_connection, async_redis_connection
 
-load_dotenv()
+try:
+    import msgpack
+except ImportError:  # optional, only needed for STREAM_ENCODING=msgpack
+    msgpack = None
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
+logger = logging.getLogger(__name__)
+
+# "json" writes a `data` field (what existing consumers read); "msgpack" writes a binary `msgpack` field
+STREAM_ENCODING = os.getenv("STREAM_ENCODING", "json")
+# XADDs per pipelined round-trip
+PUBLISH_BATCH_SIZE = int(os.getenv("PUBLISH_BATCH_SIZE", 500))
+# Approximate per-stream cap applied on every XADD; 0 leaves a stream unbounded
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", 100000))
+# Per-stream trimming, e.g. {"stock_quotes": {"maxlen": 1000000}, "market_news": {"minid_age": 604800}}
+STREAM_TRIM = json.loads(os.getenv("STREAM_TRIM", "{}"))
+PUBLISH_LOG_INTERVAL = float(os.getenv("PUBLISH_LOG_INTERVAL", 10))
+
+redis_client = redis_connection()
+
+
+def encode_message(message: dict, encoding: str = None):
+    encoding = encoding or STREAM_ENCODING
+    if encoding == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("STREAM_ENCODING=msgpack requires the msgpack package")
+        return {"msgpack": msgpack.packb(message, default=str)}
+    return {"data": json.dumps(message, default=str)}
+
+
+def _trim_args(stream_name: str):
+    trim = STREAM_TRIM.get(stream_name, {"maxlen": STREAM_MAXLEN})
+    if trim.get("minid_age"):
+        # drop entries older than the age; stream IDs start with a millisecond timestamp
+        return {"minid": f"{int((time.time() - trim['minid_age']) * 1000)}-0", "approximate": True}
+    if trim.get("maxlen"):
+        return {"maxlen": trim["maxlen"], "approximate": True}
+    return {}
+
+
+# ---------------- RATE-LIMITED LOGGING ----------------
+_published = {}
+_last_logged = {}
+_log_lock = threading.Lock()
+
+
+def _log_published(stream_name: str, count: int):
+    stream_messages.inc((stream_name,), count)
+    logger.debug("Published %d messages to %s", count, stream_name)
+    now = time.monotonic()
+    with _log_lock:
+        _published[stream_name] = _published.get(stream_name, 0) + count
+        if now - _last_logged.get(stream_name, 0) < PUBLISH_LOG_INTERVAL:
+            return
+        total, _published[stream_name] = _published[stream_name], 0
+        _last_logged[stream_name] = now
+    logger.info("Published %d messages to %s", total, stream_name)
+
+
+# ---------------- PUBLISHING ----------------
+class StreamBatch:
+    """Collect messages for any number of streams and XADD them in pipelined chunks.
+
+        with StreamBatch() as batch:
+            for item in items:
+                batch.add("earnings_calendar", item)
+    """
+
+    def __init__(self, batch_size: int = PUBLISH_BATCH_SIZE, encoding: str = None):
+        self.batch_size = batch_size
+        self.encoding = encoding
+        self._pending = []
+
+    def add(self, stream_name: str, message: dict):
+        self._pending.append((stream_name, message))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def extend(self, stream_name: str, messages: list):
+        for message in messages:
+            self.add(stream_name, message)
+
+    def flush(self):
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, []
+        trims = {}
+        counts = {}
+        pipe = redis_client.pipeline(transaction=False)
+        for stream_name, message in pending:
+            if stream_name not in trims:
+                trims[stream_name] = _trim_args(stream_name)
+            pipe.xadd(stream_name, encode_message(message, self.encoding), **trims[stream_name])
+            counts[stream_name] = counts.get(stream_name, 0) + 1
+        with timed("stream_publish"):
+            ids = pipe.execute()
+        for stream_name, count in counts.items():
+            _log_published(stream_name, count)
+        return ids
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
 
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
 
 def publish_message(stream_name: str, message: dict):
     """Publish a message to a Redis stream."""
-    message_json = json.dumps(message)
-    redis_client.xadd(stream_name, {"data": message_json})
-    print(f"Published to {stream_name}: {message}")
+    with timed("stream_publish"):
+        redis_client.xadd(stream_name, encode_message(message), **_trim_args(stream_name))
+    _log_published(stream_name, 1)
+
+
+async def publish_message_async(stream_name: str, message: dict):
+    """publish_message on the asyncio pool, for async routers."""
+    with timed("stream_publish"):
+        await async_redis_connection().xadd(stream_name, encode_message(message), **_trim_args(stream_name))
+    _log_published(stream_name, 1)
+
+
+def publish_messages(stream_name: str, messages: list):
+    """Publish a batch of messages to a Redis stream, PUBLISH_BATCH_SIZE XADDs per round-trip."""
+    with StreamBatch() as batch:
+        batch.extend(stream_name, messages)